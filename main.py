@@ -1,12 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.routers.video import router as video_router
-from src.config import Base, engine
+from src.routers.analysis import router as analysis_router
+from src.routers.health import router as health_router
+from src.routers.metrics import router as metrics_router
+from src.services.readiness import start_warmup
+from src.services.storage_gc import start_storage_gc
 from fastapi.middleware.cors import CORSMiddleware
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables, connect to storage and load models in the background
+    # so the API starts serving light requests immediately
+    stop_warmup = start_warmup()
+    # Remove orphaned objects and stale local artifacts periodically
+    stop_gc = start_storage_gc()
+    yield
+    stop_warmup.set()
+    stop_gc.set()
+
 app = FastAPI(
     title="SwingVision API",
     description="An AI-powered golf swing analysis application that helps golfers improve their game through detailed video analysis and personalized feedback.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -18,12 +35,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-Base.metadata.create_all(bind=engine)
-
 # Include routers with API versioning
+app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(video_router, prefix="/api/v1")
+app.include_router(analysis_router, prefix="/api/v1")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,257 @@
+"""
+Bulk re-analysis of stored swing videos.
+
+Lists videos under a MinIO bucket/prefix or from a query against the videos
+table, streams each one to local scratch space and runs the default pipeline
+on it across a pool of worker processes that keep their models loaded.
+Progress is checkpointed to a JSON lines file so an interrupted run can be
+resumed with the same command.
+
+Usage:
+    python -m src.cli.backfill --prefix 2024/ --workers 4
+    python -m src.cli.backfill --where "created_at < '2025-01-01'" --checkpoint backfill.jsonl
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Set
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import uuid
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v")
+
+# Objects written next to the originals that must not be re-analysed
+DERIVED_NAMES = ("thumbnail.", "proxy.")
+DERIVED_PREFIXES = ("analyses/",)
+
+def is_original_video(object_name: str) -> bool:
+    """Whether an object is an original video rather than media derived from one."""
+    if not object_name.lower().endswith(VIDEO_EXTENSIONS):
+        return False
+    return not (object_name.startswith(DERIVED_PREFIXES) or Path(object_name).name.startswith(DERIVED_NAMES))
+
+@dataclass
+class BackfillJob:
+    bucket: str
+    object_name: str
+    video_id: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.bucket}/{self.object_name}"
+
+def list_bucket_jobs(bucket: str, prefix: str = "") -> Iterator[BackfillJob]:
+    """List original video objects under a bucket prefix."""
+    from src.config import get_minio_client
+
+    for obj in get_minio_client().list_objects(bucket, prefix=prefix, recursive=True):
+        name = obj.object_name
+        if not is_original_video(name):
+            continue
+        # Uploads are stored as <video_id>/<filename>
+        video_id = name.split("/", 1)[0] if "/" in name else None
+        yield BackfillJob(bucket=bucket, object_name=name, video_id=video_id)
+
+def list_query_jobs(where: str) -> Iterator[BackfillJob]:
+    """List videos matching a SQL condition on the videos table."""
+    from sqlalchemy import text
+    from src.config import get_session
+    from src.models.video import Video
+
+    db = get_session()
+    try:
+        rows = (db.query(Video.id, Video.bucket, Video.object_name)
+                .filter(text(where))
+                .order_by(Video.created_at)
+                .all())
+    finally:
+        db.close()
+    for row in rows:
+        yield BackfillJob(bucket=row.bucket, object_name=row.object_name, video_id=row.id)
+
+def load_checkpoint(path: Path, retry_failed: bool = True) -> Set[str]:
+    """Return the keys of jobs that do not need to run again."""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open() as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A partially written last line from an interrupted run
+            if entry.get("status") == "ok" or not retry_failed:
+                done.add(entry["key"])
+    return done
+
+# Per-process pipeline, created once by the pool initializer
+_pipeline = None
+# Why the initializer failed, reported by every job of the worker instead of breaking the pool
+_init_error = None
+
+def check_configuration() -> None:
+    """
+    Build the pipeline once in the parent, without loading models, so
+    configuration errors such as a missing HF_TOKEN stop the run before any
+    worker starts.
+    """
+    from src.pipeline.swing_pipeline import create_default_pipeline
+    create_default_pipeline()
+
+def _init_worker() -> None:
+    """Build the pipeline and load the models once per worker process."""
+    global _pipeline, _init_error
+    try:
+        from src.pipeline.swing_pipeline import create_default_pipeline
+        from src.utils.pose_processor import get_pose_processor
+        from src.utils.golf_swing_detection import get_clip_model
+
+        _pipeline = create_default_pipeline()
+        get_pose_processor()
+        get_clip_model()
+    except Exception as e:
+        _init_error = f"Worker initialization failed: {type(e).__name__}: {str(e)[:400]}"
+
+def _analyze(job: BackfillJob, scratch_dir: str) -> dict:
+    """Download one video to scratch space and run the pipeline on it."""
+    from src.config import get_minio_client
+
+    start = time.perf_counter()
+    work_dir = Path(scratch_dir) / str(uuid.uuid4())
+    analysis_id = str(uuid.uuid4())
+    result = {"key": job.key, "video_id": job.video_id, "analysis_id": analysis_id}
+    if _init_error is not None:
+        return {**result, "status": "failed", "error": _init_error, "fatal": True, "seconds": 0.0}
+    try:
+        work_dir.mkdir(parents=True)
+        video_path = work_dir / Path(job.object_name).name
+        get_minio_client().fget_object(job.bucket, job.object_name, str(video_path))
+
+        metadata = {"analysis_id": analysis_id}
+        if job.video_id:
+            metadata["video_id"] = job.video_id
+        _pipeline.process(str(video_path), metadata=metadata)
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)[:500]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+def run_backfill(jobs: List[BackfillJob], workers: int, scratch_dir: str, checkpoint: Path) -> dict:
+    """
+    Run jobs across a process pool, appending each result to the checkpoint file.
+    If the workers cannot run at all, because their initialization failed or the
+    pool broke, the jobs that had not finished are recorded as failed and the cause is
+    returned under "aborted".
+    """
+    total = len(jobs)
+    counts = {"ok": 0, "failed": 0, "aborted": None}
+    if total == 0:
+        return counts
+
+    os.makedirs(scratch_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    # Spawned workers avoid forking a parent that may already hold torch threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor, \
+            checkpoint.open("a") as checkpoint_file:
+        futures = {executor.submit(_analyze, job, scratch_dir): job for job in jobs}
+        recorded = set()
+
+        def record(result):
+            counts[result["status"]] += 1
+            recorded.add(result["key"])
+            checkpoint_file.write(json.dumps(result) + "\n")
+            checkpoint_file.flush()
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                counts["aborted"] = f"Worker pool broke: {str(e) or type(e).__name__}"
+            else:
+                record(result)
+                if result.get("fatal"):
+                    counts["aborted"] = result["error"]
+            if counts["aborted"]:
+                executor.shutdown(wait=False, cancel_futures=True)
+                for pending, job in futures.items():
+                    if job.key in recorded:
+                        continue
+                    # Jobs that finished before the abort keep their own result
+                    if pending.done() and not pending.cancelled() and pending.exception() is None:
+                        record(pending.result())
+                    else:
+                        record({"key": job.key, "video_id": job.video_id, "status": "failed",
+                                "error": counts["aborted"]})
+                break
+
+            elapsed = time.perf_counter() - start
+            rate = done / elapsed
+            eta = (total - done) / rate if rate > 0 else 0.0
+            status = "" if result["status"] == "ok" else f" FAILED: {result.get('error', '')[:80]}"
+            logging.info(
+                f"[{done}/{total}] {result['key']} in {result['seconds']:.1f}s{status} | "
+                f"{rate * 60:.1f} videos/min, ETA {_format_duration(eta)}"
+            )
+
+    return counts
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from src.config import MINIO_BUCKET
+
+    parser = argparse.ArgumentParser(description="Re-analyse stored swing videos in bulk.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--prefix", default="", help="Object prefix to list in the bucket")
+    source.add_argument("--where", help="SQL condition selecting rows of the videos table")
+    parser.add_argument("--bucket", default=MINIO_BUCKET, help="Bucket to list with --prefix")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Number of worker processes, each holding its own models")
+    parser.add_argument("--scratch-dir", default="media/backfill", help="Local directory for downloads")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.jsonl", help="Progress file used to resume")
+    parser.add_argument("--no-retry-failed", action="store_true", help="Skip jobs that failed in a previous run")
+    parser.add_argument("--limit", type=int, help="Process at most this many videos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+
+    jobs = list(list_query_jobs(args.where) if args.where else list_bucket_jobs(args.bucket, args.prefix))
+    checkpoint = Path(args.checkpoint)
+    done = load_checkpoint(checkpoint, retry_failed=not args.no_retry_failed)
+    pending = [job for job in jobs if job.key not in done]
+    if args.limit is not None:
+        pending = pending[:args.limit]
+    logging.info(f"{len(jobs)} videos found, {len(jobs) - len(pending)} already done, {len(pending)} to process")
+
+    if pending:
+        try:
+            check_configuration()
+        except Exception as e:
+            logging.error(f"Not starting the backfill: {type(e).__name__}: {str(e)}")
+            return 2
+
+    counts = run_backfill(pending, args.workers, args.scratch_dir, checkpoint)
+    if counts["aborted"]:
+        logging.error(f"Aborted: {counts['aborted']}")
+    logging.info(f"Finished: {counts['ok']} succeeded, {counts['failed']} failed")
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+HTTP load test for the upload, listing and analysis endpoints.
+
+A fixed number of client threads issue a weighted mix of requests for a
+given duration:
+    upload   POST /api/v1/videos/ with a synthetic MP4 of one of the payload sizes
+    list     GET  /api/v1/videos/
+    get      GET  /api/v1/videos/{id}
+    analyze  POST /api/v1/videos/{id}/analysis/jobs
+The random choices are seeded, so the same arguments replay the same
+request sequence. Server memory is sampled from /metrics/process while the
+test runs. The report gives p50/p95/p99 latency and the error rate per
+request type, plus the RSS series, and is printed and optionally written
+as JSON.
+
+Pair it with src.cli.loadtest_server, which serves the API with stubbed
+model backends, to measure the service without GPUs or remote APIs.
+
+Usage:
+    python -m src.cli.loadtest --url http://127.0.0.1:8001 --concurrency 16 --duration 60
+    python -m src.cli.loadtest --serve --mix upload=1,list=5,get=5,analyze=1 --payload-mb 1,10 --report load.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import json
+import logging
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCENARIOS = ("upload", "list", "get", "analyze")
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse "upload=1,list=4" into scenario weights."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def make_payload(path: Path, target_bytes: int, width: int = 640, height: int = 360, fps: int = 30) -> int:
+    """
+    Write a synthetic MP4 of roughly `target_bytes`: a moving figure over
+    noise, which compresses poorly enough that size follows frame count.
+    Returns the actual size.
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+
+    def write(num_frames):
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        try:
+            for i in range(num_frames):
+                frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+                x = int(width / 2 + width / 4 * np.sin(i / fps * np.pi))
+                cv2.rectangle(frame, (x - 20, height // 4), (x + 20, height * 3 // 4), (255, 255, 255), -1)
+                writer.write(frame)
+        finally:
+            writer.release()
+        return path.stat().st_size
+
+    # Measure the size per frame, then write the full clip
+    probe_frames = fps
+    per_frame = max(1, write(probe_frames) / probe_frames)
+    return write(max(probe_frames, int(target_bytes / per_frame)))
+
+class LoadTest:
+    def __init__(self, base_url: str, mix: Dict[str, float], payloads: List[Path], concurrency: int,
+                 duration: float, timeout: float, rss_interval: float, seed: int):
+        from src.utils.metrics import Histogram, LATENCY_BUCKETS_MS
+
+        self.base_url = base_url.rstrip("/")
+        self.api = self.base_url + "/api/v1"
+        self.mix = mix
+        self.payloads = payloads
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.rss_interval = rss_interval
+        self.seed = seed
+        # The window holds every observation, so percentiles cover the whole run
+        self.latency = {name: Histogram(LATENCY_BUCKETS_MS, window=1_000_000) for name in SCENARIOS}
+        self.errors = {name: {} for name in SCENARIOS}
+        self.rss: List[dict] = []
+        self.video_ids: List[str] = []
+        self.job_ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def _record(self, scenario: str, started: float, status) -> None:
+        self.latency[scenario].observe((time.perf_counter() - started) * 1000)
+        ok = isinstance(status, int) and status < 400
+        if not ok:
+            with self._lock:
+                self.errors[scenario][str(status)] = self.errors[scenario].get(str(status), 0) + 1
+
+    def _request(self, session, scenario: str, rng: random.Random):
+        if scenario == "upload":
+            payload = rng.choice(self.payloads)
+            with open(payload, "rb") as f:
+                response = session.post(f"{self.api}/videos/", files={"file": (payload.name, f, "video/mp4")},
+                                        timeout=self.timeout)
+            if response.status_code < 400:
+                with self._lock:
+                    self.video_ids.append(response.json()["id"])
+            return response
+        if scenario == "list":
+            return session.get(f"{self.api}/videos/", params={"limit": 50}, timeout=self.timeout)
+
+        with self._lock:
+            video_id = rng.choice(self.video_ids) if self.video_ids else None
+        if video_id is None:
+            return None
+        if scenario == "get":
+            return session.get(f"{self.api}/videos/{video_id}", timeout=self.timeout)
+        response = session.post(f"{self.api}/videos/{video_id}/analysis/jobs", timeout=self.timeout)
+        if response.status_code < 400:
+            with self._lock:
+                self.job_ids.append(response.json()["id"])
+        return response
+
+    def _client(self, index: int, deadline: float) -> None:
+        import requests
+
+        rng = random.Random(self.seed * 1000 + index)
+        names, weights = zip(*self.mix.items())
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                scenario = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = self._request(session, scenario, rng)
+                except requests.RequestException as e:
+                    self._record(scenario, started, type(e).__name__)
+                    continue
+                if response is not None:
+                    self._record(scenario, started, response.status_code)
+
+    def _sample_rss(self, stop: threading.Event, started: float) -> None:
+        import requests
+
+        while not stop.is_set():
+            try:
+                data = requests.get(f"{self.base_url}/metrics/process", timeout=5).json()
+                self.rss.append({"t": round(time.monotonic() - started, 1), "rss_bytes": data.get("rss_bytes"),
+                                 "threads": data.get("threads")})
+            except (requests.RequestException, ValueError):
+                pass
+            stop.wait(self.rss_interval)
+
+    def seed_videos(self, count: int) -> None:
+        """Upload videos up front so get and analyze have something to hit."""
+        import requests
+
+        with requests.Session() as session:
+            # Not recorded, seeding is not part of the measurement
+            for i in range(count):
+                self._request(session, "upload", random.Random(self.seed + i))
+
+    def run(self) -> dict:
+        started = time.monotonic()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample_rss, args=(stop, started), daemon=True)
+        sampler.start()
+        deadline = started + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for future in [executor.submit(self._client, i, deadline) for i in range(self.concurrency)]:
+                future.result()
+        elapsed = time.monotonic() - started
+        stop.set()
+        sampler.join()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        scenarios = {}
+        for name in SCENARIOS:
+            snapshot = self.latency[name].snapshot()
+            if not snapshot["count"]:
+                continue
+            errors = sum(self.errors[name].values())
+            scenarios[name] = {
+                "requests": snapshot["count"],
+                "throughput_rps": round(snapshot["count"] / elapsed, 2),
+                "p50_ms": snapshot["p50"],
+                "p95_ms": snapshot["p95"],
+                "p99_ms": snapshot["p99"],
+                "errors": errors,
+                "error_rate": round(errors / snapshot["count"], 4),
+                "error_statuses": self.errors[name],
+            }
+        rss = [sample["rss_bytes"] for sample in self.rss if sample["rss_bytes"]]
+        return {
+            "duration_s": round(elapsed, 1),
+            "concurrency": self.concurrency,
+            "mix": self.mix,
+            "payload_bytes": [path.stat().st_size for path in self.payloads],
+            "analysis_jobs_submitted": len(self.job_ids),
+            "scenarios": scenarios,
+            "rss": {
+                "start_bytes": rss[0] if rss else None,
+                "peak_bytes": max(rss) if rss else None,
+                "end_bytes": rss[-1] if rss else None,
+                "samples": self.rss,
+            },
+        }
+
+def print_report(report: dict) -> None:
+    print(f"{report['duration_s']}s at concurrency {report['concurrency']}, payloads {report['payload_bytes']} bytes")
+    print(f"{'scenario':<10}{'requests':>10}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for name, s in report["scenarios"].items():
+        print(f"{name:<10}{s['requests']:>10}{s['throughput_rps']:>9}{s['p50_ms']:>10}{s['p95_ms']:>10}"
+              f"{s['p99_ms']:>10}{s['error_rate']:>9.2%}")
+    rss = report["rss"]
+    if rss["peak_bytes"]:
+        mb = 1024 * 1024
+        print(f"server RSS: start {rss['start_bytes'] / mb:.0f} MB, peak {rss['peak_bytes'] / mb:.0f} MB, "
+              f"end {rss['end_bytes'] / mb:.0f} MB over {len(rss['samples'])} samples")
+
+def wait_until_up(url: str, timeout: float) -> None:
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/metrics/process", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the upload, listing and analysis endpoints.")
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="Base URL of the server under test")
+    parser.add_argument("--serve", action="store_true",
+                        help="Start src.cli.loadtest_server with stubbed models at --url for the run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("upload=1,list=4,get=4,analyze=1"),
+                        help="Weights of the request types, e.g. upload=1,list=4,get=4,analyze=1")
+    parser.add_argument("--payload-mb", default="2", help="Comma separated upload sizes in megabytes")
+    parser.add_argument("--seed-videos", type=int, default=3, help="Videos uploaded before the measurement")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--rss-interval", type=float, default=1.0, help="Seconds between server RSS samples")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the request sequence")
+    parser.add_argument("--report", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+
+    server = None
+    if args.serve:
+        from urllib.parse import urlparse
+        address = urlparse(args.url)
+        server = subprocess.Popen([sys.executable, "-m", "src.cli.loadtest_server",
+                                   "--host", address.hostname, "--port", str(address.port or 80)])
+    try:
+        wait_until_up(args.url.rstrip("/"), timeout=60.0)
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as scratch:
+            payloads = []
+            for size in args.payload_mb.split(","):
+                path = Path(scratch) / f"swing_{size.strip()}mb.mp4"
+                actual = make_payload(path, int(float(size) * 1024 * 1024))
+                logging.info(f"Generated {path.name}: {actual} bytes")
+                payloads.append(path)
+
+            test = LoadTest(args.url, args.mix, payloads, args.concurrency, args.duration,
+                            args.timeout, args.rss_interval, args.seed)
+            logging.info(f"Seeding {args.seed_videos} videos")
+            test.seed_videos(args.seed_videos)
+            logging.info(f"Running {args.concurrency} clients for {args.duration}s")
+            report = test.run()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+    failed = sum(s["errors"] for s in report["scenarios"].values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
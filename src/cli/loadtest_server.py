@@ -0,0 +1,128 @@
+"""
+Run the API with stubbed model backends for load testing.
+
+Uploads, probing, media derivation, frame decoding, visualization, metrics,
+embeddings, rule-based feedback and persistence all run for real. The swing
+validator, pose model and CLIP phase classifier are replaced by stubs that
+return synthetic results after a fixed latency, so results measure the
+service itself and not model hardware or remote API quotas.
+
+Storage and database are throwaway local instances at the addresses in
+src/config.py, for example:
+    docker run --rm -d -p 4200:4200 crate -Cdiscovery.type=single-node
+    docker run --rm -d -p 9000:9000 minio/minio server /data
+
+Usage:
+    python -m src.cli.loadtest_server --port 8001 --pose-latency-ms 40 --clip-latency-ms 15
+"""
+from typing import List, Optional
+import argparse
+import hashlib
+import sys
+import time
+import numpy as np
+
+NUM_STUB_KEYPOINTS = 52  # Same layout as the SynthPose model, COCO keypoints first
+
+def stub_pose(frame_index: int, num_frames: int, width: int, height: int) -> np.ndarray:
+    """Keypoints of a synthetic golfer whose hands travel up and back down over the clip."""
+    progress = frame_index / max(1, num_frames - 1)
+    cx, cy, unit = width / 2, height / 2, min(width, height) / 8
+    hands_angle = np.pi * np.sin(np.pi * progress)  # 0 at address, pi at the top, back to 0
+    hands = (cx - unit * 2 * np.sin(hands_angle), cy + unit * 2 * np.cos(hands_angle))
+    coco = np.array([
+        (cx, cy - 2.6 * unit),  # nose
+        (cx + 0.1 * unit, cy - 2.7 * unit), (cx - 0.1 * unit, cy - 2.7 * unit),  # eyes
+        (cx + 0.2 * unit, cy - 2.6 * unit), (cx - 0.2 * unit, cy - 2.6 * unit),  # ears
+        (cx + 0.8 * unit, cy - 2.0 * unit), (cx - 0.8 * unit, cy - 2.0 * unit),  # shoulders
+        ((cx + 0.8 * unit + hands[0]) / 2, (cy - 2.0 * unit + hands[1]) / 2),  # left elbow
+        ((cx - 0.8 * unit + hands[0]) / 2, (cy - 2.0 * unit + hands[1]) / 2),  # right elbow
+        hands, hands,  # wrists
+        (cx + 0.5 * unit, cy), (cx - 0.5 * unit, cy),  # hips
+        (cx + 0.6 * unit, cy + 1.5 * unit), (cx - 0.6 * unit, cy + 1.5 * unit),  # knees
+        (cx + 0.6 * unit, cy + 3.0 * unit), (cx - 0.6 * unit, cy + 3.0 * unit),  # ankles
+    ])
+    # Anatomical markers placed around the COCO keypoints
+    extra = coco[np.arange(NUM_STUB_KEYPOINTS - len(coco)) % len(coco)] + unit * 0.05
+    return np.concatenate([coco, extra])
+
+def build_stub_pipeline(pose_latency_ms: float, clip_latency_ms: float):
+    """The default pipeline with the model-backed stages swapped for stubs."""
+    from src.config import POSE_BATCH_SIZE
+    from src.models.frame_data import SwingSequence
+    from src.models.pose_sequence import PoseSequence
+    from src.pipeline.swing_pipeline import SwingPipeline, PipelineStage, FrameExtractionStage, \
+        VisualizationStage, CLIPAnalysisStage, MetricsStage, SwingEmbeddingStage, \
+        FeedbackGenerationStage, PersistenceStage
+
+    class StubValidationStage(PipelineStage):
+        def process(self, sequence: SwingSequence) -> SwingSequence:
+            time.sleep(clip_latency_ms / 1000)
+            return sequence
+
+    class StubPoseStage(PipelineStage):
+        def process(self, sequence: SwingSequence) -> SwingSequence:
+            num_frames = len(sequence.frames)
+            poses = PoseSequence.empty(num_frames, NUM_STUB_KEYPOINTS)
+            for i, frame in enumerate(sequence.frames):
+                if i % POSE_BATCH_SIZE == 0:
+                    # One model call per batch
+                    time.sleep(pose_latency_ms / 1000)
+                height, width = frame.frame.shape[:2]
+                poses.set_frame(i, stub_pose(i, num_frames, width, height), np.full(NUM_STUB_KEYPOINTS, 0.9),
+                                [width / 4, height / 8, width / 2, height * 3 / 4], score=0.95)
+                sequence.emit("pose", {"frame_index": i, "done": i + 1, "total": num_frames, "pose": None})
+            sequence.poses = poses
+            return sequence
+
+    class StubCLIPAnalysisStage(CLIPAnalysisStage):
+        def __init__(self):
+            from src.utils.swing_phases import SwingPhase, PHASE_DESCRIPTIONS
+            self.swing_phases = SwingPhase
+            self.phase_descriptions = PHASE_DESCRIPTIONS
+
+        def _call_clip_api(self, image, descriptions: list, max_retries: int = 3,
+                           retry_delay: float = 1.0) -> dict:
+            time.sleep(clip_latency_ms / 1000)
+            # Stable pseudo-random scores per description
+            return {
+                description: int(hashlib.md5(description.encode()).hexdigest()[:4], 16) / 0xFFFF
+                for description in descriptions
+            }
+
+    return (SwingPipeline()
+            .add_stage(StubValidationStage())
+            .add_stage(FrameExtractionStage())
+            .add_stage(StubPoseStage())
+            .add_stage(VisualizationStage())
+            .add_stage(StubCLIPAnalysisStage())
+            .add_stage(MetricsStage())
+            .add_stage(SwingEmbeddingStage())
+            .add_stage(FeedbackGenerationStage(mode="rules"))
+            .add_stage(PersistenceStage()))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API with stubbed model backends for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--pose-latency-ms", type=float, default=40.0, help="Simulated time per pose model batch")
+    parser.add_argument("--clip-latency-ms", type=float, default=15.0, help="Simulated time per CLIP call")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    from src.routers import analysis as analysis_router
+    from src.services import readiness
+
+    pipeline = build_stub_pipeline(args.pose_latency_ms, args.clip_latency_ms)
+    # _run_analysis looks the pipeline up at call time
+    analysis_router.get_pipeline = lambda: pipeline
+    # Nothing to preload, but keep the component so /health/ready reports the same shape
+    readiness.WARMUP_STEPS[:] = [(name, (lambda: None) if name == "models" else step)
+                                 for name, step in readiness.WARMUP_STEPS]
+
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,11 +19,66 @@ CRATE_HOST = "localhost"
 CRATE_PORT = 4200
 DATABASE_URL = f"crate://{CRATE_HOST}:{CRATE_PORT}"
 
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool. Each pooled connection is a CrateDB HTTP client with its
+# own keep-alive connections to the server
+DB_POOL_SIZE = 10  # Connections kept open
+DB_MAX_OVERFLOW = 10  # Extra connections allowed under load
+DB_POOL_TIMEOUT = 10  # Seconds to wait for a free connection before failing
+DB_POOL_RECYCLE = 1800  # Seconds before a connection is replaced
+DB_HTTP_TIMEOUT = 30  # Seconds per HTTP request to CrateDB
+DB_HTTP_POOL_SIZE = 2  # HTTP connections per pooled connection
+
+# Sessions are bound to the engine when they are created, see get_session().
+# Objects stay usable after commit, so writes need no refresh round trip
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+# Pool events counted since start, see pool_metrics()
+_pool_counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+
+@lru_cache
+def get_engine():
+    """Create the SQLAlchemy engine on first use rather than at import time"""
+    from sqlalchemy import event
+    
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args={"timeout": DB_HTTP_TIMEOUT, "pool_size": DB_HTTP_POOL_SIZE}
+    )
+    for name, counter in (("connect", "connects"), ("checkout", "checkouts"),
+                          ("checkin", "checkins"), ("invalidate", "invalidations")):
+        event.listen(engine.pool, name, lambda *args, counter=counter: _count_pool_event(counter))
+    return engine
+
+def _count_pool_event(counter: str) -> None:
+    _pool_counters[counter] += 1
+
+def pool_metrics() -> dict:
+    """Utilization of the database connection pool"""
+    if get_engine.cache_info().currsize == 0:
+        return {"started": False}
+    pool = get_engine().pool
+    checked_out = pool.checkedout()
+    capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    return {
+        "started": True,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": max(0, pool.overflow()),
+        "capacity": capacity,
+        "utilization": round(checked_out / capacity, 3),
+        **_pool_counters
+    }
+
+def get_session():
+    """Create a new database session bound to the engine"""
+    return SessionLocal(bind=get_engine())
+
 # MinIO configuration
 MINIO_HOST = "localhost:9000"
 MINIO_ACCESS_KEY = "minioadmin"  # Change in production
@@ -31,6 +86,124 @@ MINIO_SECRET_KEY = "minioadmin"  # Change in production
 MINIO_BUCKET = "swingvision-videos"
 MINIO_SECURE = False  # Set to True for HTTPS
 
+# Annotated output configuration
+ANNOTATED_OUTPUT_MODE = "video"  # "video" encodes one clip, "frames" writes per-frame JPEGs
+ANNOTATED_VIDEO_FPS = 10
+ANNOTATED_SPRITE_SHEET = True  # Also upload a keyframe sprite sheet in video mode
+SPRITE_SHEET_FRAMES = 10
+SPRITE_SHEET_COLUMNS = 5
+SPRITE_SHEET_THUMB_WIDTH = 160
+ANALYSIS_FRAME_MAX_AGE = 86400  # Cache lifetime in seconds for served annotated frames
+
+# Startup warm-up
+WARMUP_MODELS = True  # Preload pose and CLIP models in the background at startup
+WARMUP_RETRY_SECONDS = 5.0  # Initial delay before retrying a failed warm-up step
+
+# Frame sampling
+FRAME_SAMPLING = "adaptive"  # "adaptive" follows motion, "uniform" samples at a fixed rate
+FRAME_BUDGET = 10  # Frames analysed per swing in adaptive mode: what uniform sampling takes of a typical 10 s clip,
+# and one per swing phase. Every frame goes through the detector, the pose model and a remote CLIP call
+UNIFORM_SAMPLING_FPS = 1
+MOTION_SCALE_WIDTH = 160  # Width of the downscaled frames used for motion energy
+IDLE_SAMPLE_FRACTION = 0.15  # Share of the frame budget spread uniformly over idle segments
+FRAME_CACHE_ENABLED = True  # Keep decoded, sampled frames on disk for re-analysis
+FRAME_CACHE_DIR = "media/frame_cache"
+FRAME_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# Local disk cache of source videos fetched from MinIO
+OBJECT_CACHE_DIR = "media/object_cache"
+OBJECT_CACHE_MAX_BYTES = 8 * 1024 * 1024 * 1024
+OBJECT_CACHE_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per ranged GET
+OBJECT_CACHE_WORKERS = 8  # Chunks downloaded in parallel, shared by all objects
+
+# Background storage garbage collection
+GC_ENABLED = True
+GC_INTERVAL_SECONDS = 3600
+GC_LOCAL_RETENTION = 24 * 3600  # Seconds interrupted downloads are kept
+GC_ORPHAN_MIN_AGE = 3600  # Seconds before an object without a database row counts as orphaned
+GC_MAX_DELETES_PER_SECOND = 200
+GC_BUSY_DELETES_PER_SECOND = 20  # Deletion rate while analysis jobs are running
+GC_BATCH_SIZE = 500  # Objects per multi-object delete request (MinIO allows up to 1000)
+
+# Swing segmentation for range-session videos
+SEGMENT_THRESHOLD = 4.0  # Motion threshold in median absolute deviations above the median
+SEGMENT_MIN_DURATION = 0.8  # Seconds
+SEGMENT_MAX_DURATION = 4.0  # Seconds, longer motion is walking or teeing up
+SEGMENT_PADDING = 0.75  # Seconds of context around each swing
+SEGMENT_MERGE_GAP = 0.5  # Seconds
+SEGMENT_WORKERS = 4  # Swings processed in parallel
+SESSION_MIN_DURATION = 30.0  # Seconds, longer videos are analysed as range sessions of many swings by default
+
+# Background analysis jobs
+ANALYSIS_JOB_WORKERS = 2  # Analyses run concurrently
+ANALYSIS_JOB_MAX_QUEUED = 16  # Jobs waiting for a worker before new ones are rejected
+ANALYSIS_JOB_RETENTION = 3600  # Seconds a finished job and its events are kept
+SSE_HEARTBEAT_SECONDS = 15.0
+SSE_STREAM_THREADS = 16  # Threads running blocking event streams, apart from the pool sync endpoints run on
+
+# Admission control, budgets are shared by the analyses running in this process
+ADMISSION_ENABLED = True
+ADMISSION_MAX_CONCURRENT = 2  # Analyses running at once
+ADMISSION_MEMORY_BUDGET_BYTES = 4 * 1024 * 1024 * 1024  # Estimated working memory of running analyses
+ADMISSION_CPU_BUDGET_SECONDS = 600.0  # Estimated CPU seconds of decoding and local inference in flight
+ADMISSION_MAX_QUEUED = 16  # Analyses waiting for budget before new ones are rejected
+ADMISSION_QUEUE_TIMEOUT = 300.0  # Seconds an analysis waits for budget
+ADMISSION_DOWNGRADE = True  # Run analyses at the reduced tier when only that fits the remaining budget
+ADMISSION_DOWNGRADE_FRAME_BUDGET = 10  # Frame budget of the reduced tier in adaptive mode; fewer leaves late swing phases
+# unsampled, so the reduced tier saves through pose keyframes instead
+ADMISSION_DOWNGRADE_SAMPLING_FPS = 0.5  # Sampling rate of the reduced tier in uniform mode
+ADMISSION_DOWNGRADE_KEYFRAME_INTERVAL = 4  # Pose model on every Nth frame of the reduced tier, optical flow between
+ADMISSION_BASE_MEMORY_BYTES = 256 * 1024 * 1024  # Working memory of an analysis besides its frames
+ADMISSION_DECODE_SECONDS_PER_MEGAPIXEL = 0.004  # CPU seconds to decode one megapixel of a source frame
+ADMISSION_MODEL_SECONDS_PER_FRAME = 0.5  # CPU seconds of detector and pose model per frame they run on
+
+# Multi-angle sessions
+MULTI_ANGLE_MAX_OFFSET = 5.0  # Seconds, largest time offset searched between angles
+SYNC_SAMPLE_RATE = 30.0  # Samples per second used to cross-correlate motion signals
+
+# Upload limits enforced by the ingest probe
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024
+MAX_VIDEO_DURATION = 15 * 60  # Seconds, long enough for range sessions
+MAX_VIDEO_DIMENSION = 4096  # Pixels on the longest side
+ALLOWED_VIDEO_CODECS = ["avc1", "avc3", "hvc1", "hev1", "mp4v"]
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Derived media generated after upload
+THUMBNAIL_WIDTH = 320
+PROXY_WIDTH = 480
+PROXY_FPS = 15
+
+# Model inference
+WORKING_SHORT_SIDE = 800  # Frames are downsampled on decode to DETR's input size: at most this on the short side
+WORKING_LONG_SIDE = 1333  # and this on the long side
+SHARED_PREPROCESSING = True  # Normalize each frame once into a buffer shared by the detector and the pose model
+POSE_BATCH_SIZE = 8  # Frames per detector/pose model call
+POSE_KEYFRAME_INTERVAL = 1  # Run the pose model on every Nth frame and track keypoints in between; 1 disables tracking
+POSE_KEYFRAME_MOTION_QUANTILE = 0.9  # Frames with motion above this quantile are always keyframes
+POSE_FLOW_DECAY = 0.9  # Keypoint confidence multiplier per optical-flow step
+POSE_FLOW_MAX_ERROR = 2.0  # Pixels of median forward-backward flow error before re-running the pose model
+POSE_FLOW_MIN_TRACKED = 0.6  # Share of keypoints that must be tracked before re-running the pose model
+INFERENCE_SERVER_ENABLED = True  # Share micro-batched models across concurrent analyses
+INFERENCE_MAX_BATCH_SIZE = 16  # Largest batch the shared server runs at once
+INFERENCE_MAX_WAIT_MS = 10  # How long a batch waits to fill up after its first item
+
+# Swing metrics
+METRICS_LEAD_SIDE = "left"  # Lead side of the golfer, "left" for right-handed players
+
+# Swing similarity search
+SIMILARITY_CANDIDATES = 50  # Nearest embeddings re-ranked with DTW per query
+SIMILARITY_DTW_WINDOW = 0.1  # DTW band as a share of the sequence length
+SIMILARITY_REFRESH_SECONDS = 30  # How often the in-memory index picks up swings embedded by other processes
+
+# LLM feedback
+FEEDBACK_MODEL = "mistralai/Mistral-7B-Instruct-v0.3"
+FEEDBACK_MODE = "auto"  # "rules", "llm", or "auto" (LLM with rule-based fallback)
+FEEDBACK_DEFERRED = True  # Generate uncached LLM feedback when the client streams it, not in the pipeline;
+# "auto" mode stores rule-based feedback meanwhile
+FEEDBACK_LLM_TIMEOUT = 8.0  # Seconds the LLM gets in "auto" mode without deferral before rule-based feedback is used
+FEEDBACK_CACHE_SIZE = 512  # Swing profiles kept in the feedback cache
+FEEDBACK_CACHE_TTL = 7 * 24 * 3600  # Seconds
+
 @lru_cache
 def get_minio_client():
     """Get MinIO client instance"""
@@ -49,7 +222,7 @@ def get_minio_client():
 
 # Dependency to get database session
 def get_db():
-    db = SessionLocal()
+    db = get_session()
     try:
         yield db
     finally:
@@ -0,0 +1,156 @@
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from src.models.analysis import Analysis, PoseFrame, SwingEmbedding
+from src.models.frame_data import SwingSequence
+from src.models.pose_sequence import PoseSequence
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+def create_analysis(db: Session, analysis_id: str, video_id: str, sequence: SwingSequence) -> Analysis:
+    """
+    Store an analysis and all of its pose frames. The frames are written with
+    a single executemany, which the CrateDB driver sends as one bulk request.
+    """
+    db_analysis = Analysis(
+        id=analysis_id,
+        video_id=video_id,
+        video_hash=sequence.video_hash,
+        num_frames=len(sequence.frames),
+        analysis_results=sequence.analysis_results,
+        feedback=sequence.feedback,
+        annotated_video_object=sequence.metadata.get("annotated_video_object"),
+        sprite_sheet_object=sequence.metadata.get("sprite_sheet_object")
+    )
+    db.add(db_analysis)
+    
+    rows = pose_frame_rows(analysis_id, video_id, sequence)
+    if rows:
+        db.execute(insert(PoseFrame), rows)
+    
+    embedding = sequence.metadata.get("swing_embedding")
+    if embedding is not None:
+        vector, normalized = embedding
+        db.add(SwingEmbedding(
+            analysis_id=analysis_id,
+            video_id=video_id,
+            embedding=vector.tolist(),
+            sequence=normalized.ravel().tolist()
+        ))
+    db.commit()
+    
+    # Make the new rows visible to non primary key queries right away
+    db.execute(text(
+        f"REFRESH TABLE {Analysis.__tablename__}, {PoseFrame.__tablename__}, {SwingEmbedding.__tablename__}"
+    ))
+    return db_analysis
+
+def pose_frame_rows(analysis_id: str, video_id: str, sequence: SwingSequence) -> List[dict]:
+    """Build the bulk insert parameters for the pose frames of a sequence."""
+    poses = sequence.poses
+    if poses is None or len(poses) == 0:
+        return []
+    
+    # Convert whole arrays to Python lists once rather than per element
+    keypoints = poses.keypoints.reshape(len(poses), -1).tolist()
+    bboxes = poses.bboxes.tolist()
+    scores = poses.scores.tolist()
+    valid = poses.valid.tolist()
+    phases = [getattr(frame.swing_phase, "value", frame.swing_phase) for frame in sequence.frames]
+    
+    return [
+        {
+            "video_id": video_id,
+            "analysis_id": analysis_id,
+            "frame_index": i,
+            "phase": phases[i] if i < len(phases) else None,
+            "valid": valid[i],
+            "score": scores[i],
+            "bbox": bboxes[i],
+            "keypoints": keypoints[i]
+        }
+        for i in range(len(poses))
+    ]
+
+def update_analysis_feedback(db: Session, analysis_id: str, feedback: str,
+                             source: Optional[str] = None) -> Optional[Analysis]:
+    """Store feedback that was generated after the analysis itself, no longer pending."""
+    db_analysis = get_analysis(db, analysis_id)
+    if db_analysis:
+        db_analysis.feedback = feedback
+        if source is not None:
+            # Assign a new dict so the change to the object column is detected
+            db_analysis.analysis_results = {**(db_analysis.analysis_results or {}),
+                                            "feedback_source": source, "feedback_pending": False}
+        db.commit()
+    return db_analysis
+
+def get_analysis(db: Session, analysis_id: str) -> Optional[Analysis]:
+    return db.query(Analysis).filter(Analysis.id == analysis_id).first()
+
+def get_latest_analysis(db: Session, video_id: str) -> Optional[Analysis]:
+    return (db.query(Analysis)
+            .filter(Analysis.video_id == video_id)
+            .order_by(Analysis.created_at.desc())
+            .first())
+
+def list_analyses(db: Session, video_id: str, skip: int = 0, limit: int = 100) -> List[Analysis]:
+    return (db.query(Analysis)
+            .filter(Analysis.video_id == video_id)
+            .order_by(Analysis.created_at.desc())
+            .offset(skip).limit(limit).all())
+
+def get_pose_sequence(db: Session, video_id: str, analysis_id: str) -> Tuple[PoseSequence, List[Optional[str]]]:
+    """
+    Load the stored pose frames of an analysis back into a PoseSequence.
+    Returns the sequence and the swing phase of each frame.
+    """
+    rows = (db.query(PoseFrame.frame_index, PoseFrame.phase, PoseFrame.valid,
+                     PoseFrame.score, PoseFrame.bbox, PoseFrame.keypoints)
+            .filter(PoseFrame.video_id == video_id, PoseFrame.analysis_id == analysis_id)
+            .order_by(PoseFrame.frame_index)
+            .all())
+    if not rows:
+        return PoseSequence.empty(0, 0), []
+    
+    num_frames = rows[-1].frame_index + 1
+    num_keypoints = max(len(row.keypoints or []) for row in rows) // 3
+    poses = PoseSequence.empty(num_frames, num_keypoints)
+    phases: List[Optional[str]] = [None] * num_frames
+    
+    for row in rows:
+        phases[row.frame_index] = row.phase
+        if row.valid and row.keypoints:
+            poses.keypoints[row.frame_index] = np.asarray(row.keypoints, dtype=np.float32).reshape(-1, 3)
+            poses.bboxes[row.frame_index] = row.bbox
+            poses.scores[row.frame_index] = row.score
+            poses.valid[row.frame_index] = True
+    return poses, phases
+
+def get_frames_by_phase(db: Session, phase: str, skip: int = 0, limit: int = 1000) -> List[PoseFrame]:
+    """Fetch stored frames of one swing phase across all videos."""
+    return (db.query(PoseFrame)
+            .filter(PoseFrame.phase == phase, PoseFrame.valid == True)  # noqa: E712
+            .offset(skip).limit(limit).all())
+
+def get_swing_embedding(db: Session, analysis_id: str) -> Optional[SwingEmbedding]:
+    return db.query(SwingEmbedding).filter(SwingEmbedding.analysis_id == analysis_id).first()
+
+def list_swing_embeddings(db: Session, since=None, skip: int = 0, limit: int = 10000) -> list:
+    """
+    Page through stored swing embeddings, oldest first, optionally only those
+    created at or after `since`; rows sharing that timestamp are returned again.
+    """
+    query = db.query(SwingEmbedding.analysis_id, SwingEmbedding.video_id,
+                     SwingEmbedding.embedding, SwingEmbedding.created_at)
+    if since is not None:
+        query = query.filter(SwingEmbedding.created_at >= since)
+    return query.order_by(SwingEmbedding.created_at, SwingEmbedding.analysis_id).offset(skip).limit(limit).all()
+
+def get_swing_sequences(db: Session, analysis_ids: List[str]) -> Dict[str, list]:
+    """Normalized swing sequences by analysis id, flattened as stored."""
+    if not analysis_ids:
+        return {}
+    rows = (db.query(SwingEmbedding.analysis_id, SwingEmbedding.sequence)
+            .filter(SwingEmbedding.analysis_id.in_(analysis_ids))
+            .all())
+    return {row.analysis_id: row.sequence for row in rows}
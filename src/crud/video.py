@@ -1,35 +1,68 @@
+from sqlalchemy import delete, insert, update
 from sqlalchemy.orm import Session
 from src.models.video import Video
 from src.schemas.video import VideoCreate
 from datetime import datetime
+from typing import List
+
+# Sessions don't expire objects on commit (see SessionLocal), so rows built
+# here keep their attributes without a refresh round trip
 
 def create_video(db: Session, video: VideoCreate) -> Video:
     db_video = Video(**video.model_dump())
     db.add(db_video)
     db.commit()
-    db.refresh(db_video)
     return db_video
 
+def create_videos(db: Session, videos: List[VideoCreate]) -> List[Video]:
+    """
+    Insert several videos with a single executemany, which the CrateDB
+    driver sends as one bulk request. Returns detached Video objects.
+    """
+    if not videos:
+        return []
+    now = datetime.utcnow()
+    rows = [{**video.model_dump(), "created_at": now, "updated_at": now} for video in videos]
+    db.execute(insert(Video), rows)
+    db.commit()
+    return [Video(**row) for row in rows]
+
 def get_video(db: Session, video_id: str) -> Video:
     return db.query(Video).filter(Video.id == video_id).first()
 
+def get_videos(db: Session, video_ids: List[str]) -> List[Video]:
+    if not video_ids:
+        return []
+    return db.query(Video).filter(Video.id.in_(video_ids)).all()
+
 def list_videos(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Video).offset(skip).limit(limit).all()
 
 def delete_video(db: Session, video_id: str) -> bool:
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if video:
-        db.delete(video)
-        db.commit()
-        return True
-    return False
+    return delete_videos(db, [video_id]) > 0
+
+def delete_videos(db: Session, video_ids: List[str]) -> int:
+    """Delete several videos with one statement. Returns the number of rows deleted."""
+    if not video_ids:
+        return 0
+    result = db.execute(delete(Video).where(Video.id.in_(video_ids)))
+    db.commit()
+    return result.rowcount
 
 def update_video(db: Session, video_id: str, **kwargs) -> Video:
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if video:
-        for key, value in kwargs.items():
-            setattr(video, key, value)
-        video.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(video)
-    return video
\ No newline at end of file
+    update_videos(db, [video_id], **kwargs)
+    # Primary key lookups see the update without a table refresh
+    return db.get(Video, video_id, populate_existing=True)
+
+def update_videos(db: Session, video_ids: List[str], **kwargs) -> int:
+    """Set the same values on several videos with one statement. Returns the number of rows updated."""
+    if not video_ids:
+        return 0
+    result = db.execute(
+        update(Video)
+        .where(Video.id.in_(video_ids))
+        .values(**kwargs, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
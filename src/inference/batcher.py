@@ -0,0 +1,124 @@
+from concurrent.futures import Future
+from typing import Any, Callable, List
+from src.config import logger
+from src.utils.metrics import Histogram, LATENCY_BUCKETS_MS
+import queue
+import threading
+import time
+
+class MicroBatcher:
+    """
+    Collects items submitted from concurrent callers into micro-batches.
+
+    A worker thread waits for the first item, then keeps collecting until
+    either `max_batch_size` items are queued or `max_wait_ms` has passed since
+    that first item, and runs `batch_fn` once on the whole batch. Each caller
+    gets a Future resolving to the result for its own item. Items still queued
+    when the batcher stops fail with RuntimeError.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stopped = threading.Event()
+        self._submit_lock = threading.Lock()  # No item is queued behind the stop sentinel
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.compute_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item and return a Future for its result."""
+        future: Future = Future()
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise RuntimeError(f"Batcher {self.name} is stopped")
+            self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def map(self, items: List[Any]) -> List[Any]:
+        """Submit several items and wait for all of their results, in order."""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def stop(self) -> None:
+        with self._submit_lock:
+            self._stopped.set()
+            self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self) -> list:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._stopped.set()
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, submitted in batch:
+                self.queue_wait_ms.observe((started - submitted) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed in {self.name}: {str(e)}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            self.compute_ms.observe((finished - started) * 1000)
+            for (_, future, submitted), result in zip(batch, results):
+                self.latency_ms.observe((finished - submitted) * 1000)
+                future.set_result(result)
+        self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        """Fail the futures of items left in the queue at shutdown, so no caller waits forever."""
+        error = RuntimeError(f"Batcher {self.name} stopped before the item ran")
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if entry is not None:
+                entry[1].set_exception(error)
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "compute_ms": self.compute_ms.snapshot(),
+            "latency_ms": self.latency_ms.snapshot(),
+        }
@@ -0,0 +1,68 @@
+from functools import lru_cache
+from typing import List
+from src.config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, POSE_BATCH_SIZE, POSE_KEYFRAME_INTERVAL
+from src.inference.batcher import MicroBatcher
+from src.models.pose_sequence import PoseSequence
+
+class InferenceServer:
+    """
+    In-process inference service shared by every analysis in the process.
+
+    Owns one copy of the detector, pose and CLIP models and puts a
+    MicroBatcher in front of each, so frames from concurrent analyses are
+    grouped into larger batches instead of each analysis running its own
+    small ones.
+    """
+
+    def __init__(self, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        from src.utils.pose_processor import get_pose_processor
+        from src.utils.golf_swing_detection import golf_swing_probabilities
+
+        self.pose_processor = get_pose_processor()
+        self.detector = MicroBatcher(
+            "detector", self.pose_processor.detect_people, max_batch_size, max_wait_ms
+        )
+        self.pose = MicroBatcher(
+            "pose", self._estimate_batch, max_batch_size, max_wait_ms
+        )
+        self.clip = MicroBatcher(
+            "clip", golf_swing_probabilities, max_batch_size, max_wait_ms
+        )
+
+    def _estimate_batch(self, items):
+        images, boxes = zip(*items)
+        return self.pose_processor.estimate_poses(list(images), list(boxes))
+
+    def detect_people(self, images):
+        return self.detector.map(images)
+
+    def estimate_poses(self, images, boxes):
+        return self.pose.map(list(zip(images, boxes)))
+
+    def process_frames(self, frames, on_progress=None, keyframe_interval: int = POSE_KEYFRAME_INTERVAL) -> PoseSequence:
+        """Estimate poses for one analysis through the shared batchers."""
+        # Frames are submitted one item each, so the batchers mix frames of
+        # concurrent analyses regardless of the chunk size used here
+        return self.pose_processor.process_frames(
+            frames,
+            detect=self.detect_people,
+            estimate=self.estimate_poses,
+            batch_size=POSE_BATCH_SIZE,
+            on_progress=on_progress,
+            keyframe_interval=keyframe_interval
+        )
+
+    def golf_swing_probabilities(self, images) -> List[float]:
+        return self.clip.map(images)
+
+    def metrics(self) -> dict:
+        return {
+            "detector": self.detector.metrics(),
+            "pose": self.pose.metrics(),
+            "clip": self.clip.metrics(),
+        }
+
+@lru_cache
+def get_inference_server() -> InferenceServer:
+    """Shared InferenceServer, created with its models on first use"""
+    return InferenceServer()
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, String, DateTime, Integer, Float, Boolean, ARRAY
+from crate.client.sqlalchemy.types import ObjectType
+from src.config import Base
+from datetime import datetime
+
+class Analysis(Base):
+    __tablename__ = "analyses"
+    
+    id = Column(String, primary_key=True)
+    video_id = Column(String)
+    video_hash = Column(String)
+    num_frames = Column(Integer)
+    analysis_results = Column(ObjectType)
+    feedback = Column(String)
+    annotated_video_object = Column(String)
+    sprite_sheet_object = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PoseFrame(Base):
+    """
+    One row per analysed frame. Keypoints are stored flattened as
+    x, y, confidence triples. CrateDB indexes every column by default, and
+    clustering by video_id keeps all frames of a video on the same shard so
+    per-video reads hit a single shard.
+    """
+    __tablename__ = "pose_frames"
+    __table_args__ = {"crate_clustered_by": "video_id"}
+    
+    video_id = Column(String, primary_key=True)
+    analysis_id = Column(String, primary_key=True)
+    frame_index = Column(Integer, primary_key=True)
+    phase = Column(String)
+    valid = Column(Boolean)
+    score = Column(Float)
+    bbox = Column(ARRAY(Float))
+    keypoints = Column(ARRAY(Float))
+
+class SwingEmbedding(Base):
+    """
+    Fixed-size embedding of one analysed swing for similarity search, see
+    src/utils/swing_embedding.py. The normalized sequence it was pooled from
+    is kept alongside for DTW re-ranking of the nearest candidates.
+    """
+    __tablename__ = "swing_embeddings"
+    
+    analysis_id = Column(String, primary_key=True)
+    video_id = Column(String)
+    embedding = Column(ARRAY(Float))
+    sequence = Column(ARRAY(Float))
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,8 +1,9 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Any, Dict
+from typing import Callable, List, Optional, Any, Dict
+from pathlib import Path
 from PIL import Image
 import numpy as np
-from src.schemas import PoseResult
+from src.models.pose_sequence import PoseSequence
 
 @dataclass
 class FrameData:
@@ -16,20 +17,27 @@ class FrameData:
     # Converted PIL Image
     pil_image: Optional[Image.Image] = None
     
-    # Pose estimation results
-    pose_result: Optional[PoseResult] = None
-    
     # Swing phase data
     swing_phase: Optional[str] = None
     
     # Frame index in the sequence
     frame_index: int = 0
     
+    # Frame index in the source video and its time in seconds
+    source_index: Optional[int] = None
+    timestamp: Optional[float] = None
+    
     # Analysis results specific to this frame
     frame_analysis: Dict[str, Any] = field(default_factory=dict)
     
-    # Base64 encoded image with pose estimation drawn
+    # Image with pose estimation drawn
+    annotated_image: Optional[Image.Image] = None
+    
+    # Base64 encoded image with pose estimation drawn ("frames" output mode only)
     annotated_image_base64: Optional[str] = None
+    
+    # URL of the annotated frame on disk ("frames" output mode only)
+    annotated_frame_url: Optional[str] = None
 
 @dataclass
 class SwingSequence:
@@ -40,6 +48,9 @@ class SwingSequence:
     video_path: str
     metadata: dict = field(default_factory=dict)
     
+    # Pose estimation results for every frame, indexed like `frames`
+    poses: Optional[PoseSequence] = None
+    
     # Overall swing analysis results
     analysis_results: Dict[str, Any] = field(default_factory=dict)
     
@@ -48,3 +59,22 @@ class SwingSequence:
     
     # Video hash for identification
     video_hash: str = ""
+    
+    # Single encoded video with pose estimation drawn ("video" output mode)
+    annotated_video_url: Optional[str] = None
+    
+    # Keyframe sprite sheet of the annotated video
+    sprite_sheet_url: Optional[str] = None
+    
+    # Receives progress events and partial results as (event, data)
+    listener: Optional[Callable[[str, dict], None]] = field(default=None, repr=False)
+    
+    def emit(self, event: str, data: dict) -> None:
+        """Send a progress event to the listener, if any."""
+        if self.listener is not None:
+            self.listener(event, data)
+    
+    @property
+    def analysis_id(self) -> str:
+        """Identifier of this analysis, defaulting to the directory the video lives in."""
+        return self.metadata.get("analysis_id") or Path(self.video_path).parent.name
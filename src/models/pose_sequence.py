@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, NamedTuple, Optional
+import io
+import numpy as np
+
+class FramePose(NamedTuple):
+    """
+    Read-only view of one frame of a PoseSequence. The arrays are views into
+    the sequence, so creating one costs no copies.
+    """
+    keypoints: np.ndarray  # (keypoints, 3) as x, y, confidence
+    scores: np.ndarray     # (keypoints,) keypoint confidences
+    bbox: np.ndarray       # (4,) as x, y, width, height
+    score: float           # Person detection score
+
+@dataclass
+class PoseSequence:
+    """
+    Columnar pose estimation results for a whole swing.
+
+    Keypoints for every frame live in one (frames, keypoints, 3) float32 array
+    holding x, y and confidence, so analysis code can work on the full
+    sequence without per-frame objects. Frames where no pose was estimated
+    are kept with `valid` set to False and zeroed data.
+    """
+    keypoints: np.ndarray  # (frames, keypoints, 3) float32
+    scores: np.ndarray     # (frames,) float32 person detection scores
+    bboxes: np.ndarray     # (frames, 4) float32 as x, y, width, height
+    valid: np.ndarray      # (frames,) bool
+
+    @classmethod
+    def empty(cls, num_frames: int, num_keypoints: int) -> 'PoseSequence':
+        """Allocate a sequence with every frame marked invalid."""
+        return cls(
+            keypoints=np.zeros((num_frames, num_keypoints, 3), dtype=np.float32),
+            scores=np.zeros(num_frames, dtype=np.float32),
+            bboxes=np.zeros((num_frames, 4), dtype=np.float32),
+            valid=np.zeros(num_frames, dtype=bool)
+        )
+
+    def __len__(self) -> int:
+        return self.keypoints.shape[0]
+
+    @property
+    def num_keypoints(self) -> int:
+        return self.keypoints.shape[1]
+
+    @property
+    def xy(self) -> np.ndarray:
+        """(frames, keypoints, 2) view of the keypoint coordinates."""
+        return self.keypoints[..., :2]
+
+    @property
+    def confidence(self) -> np.ndarray:
+        """(frames, keypoints) view of the keypoint confidences."""
+        return self.keypoints[..., 2]
+
+    def set_frame(self, index: int, keypoints, keypoint_scores, bbox, score: float = 1.0) -> None:
+        """Store the pose of one frame and mark it valid."""
+        self.keypoints[index, :, :2] = np.asarray(keypoints, dtype=np.float32)[:, :2]
+        self.keypoints[index, :, 2] = np.asarray(keypoint_scores, dtype=np.float32)
+        self.bboxes[index] = np.asarray(bbox, dtype=np.float32)
+        self.scores[index] = score
+        self.valid[index] = True
+
+    def frame(self, index: int) -> Optional[FramePose]:
+        """Return a view of one frame, or None if no pose was estimated for it."""
+        if not self.valid[index]:
+            return None
+        return FramePose(
+            keypoints=self.keypoints[index],
+            scores=self.keypoints[index, :, 2],
+            bbox=self.bboxes[index],
+            score=float(self.scores[index])
+        )
+
+    def to_npz_bytes(self) -> bytes:
+        """Serialize to a compressed NumPy archive."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            keypoints=self.keypoints,
+            scores=self.scores,
+            bboxes=self.bboxes,
+            valid=self.valid
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_npz_bytes(cls, data: bytes) -> 'PoseSequence':
+        """Deserialize from bytes produced by `to_npz_bytes`."""
+        with np.load(io.BytesIO(data)) as archive:
+            return cls(
+                keypoints=archive["keypoints"].astype(np.float32, copy=False),
+                scores=archive["scores"].astype(np.float32, copy=False),
+                bboxes=archive["bboxes"].astype(np.float32, copy=False),
+                valid=archive["valid"].astype(bool, copy=False)
+            )
+
+    def to_json(self, decimals: int = 2) -> Dict[str, Any]:
+        """
+        Convert to plain JSON types for the API boundary. Invalid frames are
+        returned as null so frame indices stay aligned.
+        """
+        # Round in float64 so float32 artifacts do not leak into the JSON
+        keypoints = np.round(self.keypoints.astype(np.float64), decimals).tolist()
+        bboxes = np.round(self.bboxes.astype(np.float64), decimals).tolist()
+        scores = np.round(self.scores.astype(np.float64), 4).tolist()
+        frames: List[Optional[Dict[str, Any]]] = []
+        for i, is_valid in enumerate(self.valid.tolist()):
+            if is_valid:
+                frames.append({"keypoints": keypoints[i], "bbox": bboxes[i], "score": scores[i]})
+            else:
+                frames.append(None)
+        return {"num_keypoints": self.num_keypoints, "frames": frames}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy import Column, String, DateTime, Integer, Float
 from src.config import Base
 from datetime import datetime
 
@@ -11,5 +11,14 @@ class Video(Base):
     size = Column(Integer)
     bucket = Column(String)
     object_name = Column(String)
+    content_hash = Column(String)  # SHA-256 of the uploaded file
+    thumbnail_object = Column(String)
+    proxy_object = Column(String)
+    duration = Column(Float)
+    fps = Column(Float)
+    width = Column(Integer)
+    height = Column(Integer)
+    codec = Column(String)
+    rotation = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,170 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from src.config import MOTION_SCALE_WIDTH, SEGMENT_THRESHOLD, SEGMENT_MIN_DURATION, SEGMENT_MAX_DURATION, \
+    SEGMENT_PADDING, SEGMENT_MERGE_GAP, MULTI_ANGLE_MAX_OFFSET, SYNC_SAMPLE_RATE, logger
+from src.models.frame_data import SwingSequence
+from src.pipeline.swing_pipeline import SwingPipeline, create_default_pipeline
+from src.utils.swing_segmentation import find_swing_windows
+from src.utils.video_processing import compute_motion_energy
+import numpy as np
+import uuid
+
+@dataclass
+class MultiAngleResult:
+    """
+    Results of a multi-angle session.
+    Times are in seconds on the reference angle's clock; a moment at time t in
+    the reference video is at t + offsets[angle] in the other video.
+    """
+    sequences: Dict[str, SwingSequence]
+    offsets: Dict[str, float]
+    window: Tuple[float, float]
+    reference: str
+    session_id: str = ""
+    errors: Dict[str, str] = field(default_factory=dict)
+
+def resample_signal(signal, fps, rate, duration=None):
+    """Resample a per-frame signal onto a regular time grid of `rate` samples per second."""
+    signal = np.asarray(signal, dtype=np.float64)
+    times = np.arange(len(signal)) / fps
+    duration = duration if duration is not None else (times[-1] if len(times) else 0.0)
+    grid = np.arange(0.0, duration, 1.0 / rate)
+    return np.interp(grid, times, signal)
+
+def estimate_offset(reference, reference_fps, other, other_fps, max_offset=5.0, rate=30.0) -> float:
+    """
+    Estimate the time offset between two recordings of the same swing by
+    cross-correlating their motion-energy signals.
+
+    :return: Offset in seconds such that time t in the reference is t + offset in the other video.
+    """
+    ref = resample_signal(reference, reference_fps, rate)
+    oth = resample_signal(other, other_fps, rate)
+    if len(ref) < 2 or len(oth) < 2:
+        return 0.0
+
+    # Correlate motion onsets rather than absolute levels, which differ by angle
+    ref = np.diff(ref)
+    oth = np.diff(oth)
+    ref = (ref - ref.mean()) / (ref.std() or 1.0)
+    oth = (oth - oth.mean()) / (oth.std() or 1.0)
+
+    # corr[k] pairs oth[n + lag] with ref[n], lag = k - (len(ref) - 1)
+    corr = np.correlate(oth, ref, mode="full")
+    lags = np.arange(-(len(ref) - 1), len(oth))
+    max_lag = int(max_offset * rate)
+    allowed = np.abs(lags) <= max_lag
+    best_lag = lags[allowed][np.argmax(corr[allowed])]
+    return float(best_lag) / rate
+
+class MultiAngleSession:
+    """
+    Analyses the same swing recorded from several angles, e.g. face-on and
+    down-the-line. Videos are aligned in time, only frames around the common
+    swing window are sampled, and the angles are processed concurrently on
+    the same warm models.
+    """
+
+    def __init__(self, pipeline: SwingPipeline, max_offset: float = MULTI_ANGLE_MAX_OFFSET,
+                 sync_rate: float = SYNC_SAMPLE_RATE):
+        self.pipeline = pipeline
+        self.max_offset = max_offset
+        self.sync_rate = sync_rate
+
+    def _swing_window(self, energy, fps) -> Tuple[float, float]:
+        """Find the swing in the reference video, in seconds."""
+        windows = find_swing_windows(
+            energy,
+            fps,
+            threshold=SEGMENT_THRESHOLD,
+            min_duration=SEGMENT_MIN_DURATION,
+            max_duration=SEGMENT_MAX_DURATION,
+            padding=SEGMENT_PADDING,
+            merge_gap=SEGMENT_MERGE_GAP
+        )
+        if windows:
+            # The swing is the window with the most motion
+            start, end = max(windows, key=lambda w: float(np.sum(energy[w[0]:w[1]])))
+        else:
+            # Fall back to a window centred on the motion peak
+            half = int((SEGMENT_MAX_DURATION / 2 + SEGMENT_PADDING) * fps)
+            peak = int(np.argmax(energy)) if len(energy) else 0
+            start, end = max(0, peak - half), min(len(energy), peak + half)
+        return start / fps, end / fps
+
+    def process(self, videos: Dict[str, str], reference: Optional[str] = None,
+                metadata: Optional[dict] = None,
+                angle_metadata: Optional[Dict[str, dict]] = None) -> MultiAngleResult:
+        """
+        Process a multi-angle session.
+        Args:
+            videos: Local video path per angle name, e.g. {"face_on": ..., "down_the_line": ...}
+            reference: Angle whose clock the others are aligned to, defaults to the first one
+            metadata: Metadata shared by every angle
+            angle_metadata: Metadata of individual angles, e.g. their video_id
+        """
+        if not videos:
+            raise ValueError("A multi-angle session needs at least one video")
+        reference = reference or next(iter(videos))
+        if reference not in videos:
+            raise ValueError(f"Unknown reference angle: {reference}")
+        session_id = (metadata or {}).get("session_id") or str(uuid.uuid4())
+
+        with ThreadPoolExecutor(max_workers=len(videos)) as executor:
+            # Motion signals are cheap and decoding releases the GIL, so compute them together
+            signals = dict(zip(videos, executor.map(
+                lambda path: compute_motion_energy(path, scale_width=MOTION_SCALE_WIDTH), videos.values()
+            )))
+
+            ref_energy, ref_fps = signals[reference]
+            offsets = {
+                angle: 0.0 if angle == reference else estimate_offset(
+                    ref_energy, ref_fps, energy, fps, max_offset=self.max_offset, rate=self.sync_rate
+                )
+                for angle, (energy, fps) in signals.items()
+            }
+            window = self._swing_window(ref_energy, ref_fps)
+            logger.info(f"Session {session_id}: offsets {offsets}, swing window {window}")
+
+            def run(angle):
+                energy, fps = signals[angle]
+                start = int(np.clip(round((window[0] + offsets[angle]) * fps), 0, len(energy)))
+                end = int(np.clip(round((window[1] + offsets[angle]) * fps), start, len(energy)))
+                swing_metadata = dict(metadata or {})
+                swing_metadata.update((angle_metadata or {}).get(angle, {}))
+                swing_metadata.update({
+                    "analysis_id": str(uuid.uuid4()),
+                    "session_id": session_id,
+                    "angle": angle,
+                    "time_offset": offsets[angle],
+                    "window": (start, end),
+                    "motion_energy": energy,
+                    "fps": fps
+                })
+                return self.pipeline.process(videos[angle], metadata=swing_metadata)
+
+            futures = {angle: executor.submit(run, angle) for angle in videos}
+
+        sequences, errors = {}, {}
+        for angle, future in futures.items():
+            try:
+                sequences[angle] = future.result()
+            except Exception as e:
+                logger.error(f"Angle {angle} of session {session_id} failed: {str(e)}")
+                errors[angle] = str(e)
+
+        return MultiAngleResult(
+            sequences=sequences,
+            offsets=offsets,
+            window=window,
+            reference=reference,
+            session_id=session_id,
+            errors=errors
+        )
+
+def create_multi_angle_session() -> MultiAngleSession:
+    """
+    Factory method to create a multi-angle session with the default pipeline
+    """
+    return MultiAngleSession(create_default_pipeline())
@@ -1,13 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, List, Optional
 from src.models.frame_data import FrameData, SwingSequence
 from src.utils.golf_swing_detection import is_golf_swing
-from src.utils.video_processing import extract_frames
+from src.utils.video_processing import extract_frames, compute_motion_energy, select_adaptive_indices, extract_frames_at
 from src.utils.image_conversion import convert_frames_to_images
-from src.utils.pose_processor import PoseProcessor
 from src.utils.swing_phases import SwingPhase, PHASE_DESCRIPTIONS
 from src.utils.feedback_generation import generate_feedback
-from huggingface_hub import InferenceClient 
+from src.config import ANNOTATED_OUTPUT_MODE, ANNOTATED_SPRITE_SHEET, ANNOTATED_VIDEO_FPS, \
+    SPRITE_SHEET_FRAMES, SPRITE_SHEET_COLUMNS, SPRITE_SHEET_THUMB_WIDTH, FRAME_SAMPLING, FRAME_BUDGET, \
+    UNIFORM_SAMPLING_FPS, WORKING_SHORT_SIDE, WORKING_LONG_SIDE, MOTION_SCALE_WIDTH, IDLE_SAMPLE_FRACTION, FRAME_CACHE_ENABLED, SEGMENT_THRESHOLD, SEGMENT_MIN_DURATION, \
+    SEGMENT_MAX_DURATION, SEGMENT_PADDING, SEGMENT_MERGE_GAP, SEGMENT_WORKERS, INFERENCE_SERVER_ENABLED, \
+    POSE_KEYFRAME_INTERVAL, \
+    FEEDBACK_MODE, FEEDBACK_DEFERRED, FEEDBACK_LLM_TIMEOUT, METRICS_LEAD_SIDE, logger
+import numpy as np
 import os
 import time
 import json
@@ -23,15 +28,110 @@ class PipelineStage(ABC):
 
 class SwingValidationStage(PipelineStage):
     def process(self, sequence: SwingSequence) -> SwingSequence:
-        if not is_golf_swing(sequence.video_path):
+        start_frame = sequence.metadata.get("window", (0, None))[0]
+        probabilities = None
+        if INFERENCE_SERVER_ENABLED:
+            from src.inference.server import get_inference_server
+            probabilities = get_inference_server().golf_swing_probabilities
+        if not is_golf_swing(sequence.video_path, start_frame=start_frame, probabilities=probabilities):
             raise ValueError("The video does not contain a golf swing")
         return sequence
 
 class FrameExtractionStage(PipelineStage):
+    def __init__(self, sampling: str = FRAME_SAMPLING, frame_budget: int = FRAME_BUDGET, fps: int = UNIFORM_SAMPLING_FPS,
+                 cache_enabled: bool = FRAME_CACHE_ENABLED, short_side: Optional[int] = WORKING_SHORT_SIDE,
+                 long_side: Optional[int] = WORKING_LONG_SIDE):
+        """
+        Initialize the frame extraction stage.
+        Args:
+            sampling: "adaptive" samples densely during high motion and sparsely while idle,
+                "uniform" samples at a fixed rate
+            frame_budget: Maximum number of frames extracted in adaptive mode
+            fps: Sampling rate in uniform mode
+            cache_enabled: Map previously decoded frames of the same video and sampling from the frame cache
+            short_side: Working resolution frames are downsampled to on decode, together with long_side;
+                None keeps the full resolution
+            long_side: See short_side
+        """
+        if sampling not in ("adaptive", "uniform"):
+            raise ValueError(f"Unknown frame sampling mode: {sampling}")
+        self.sampling = sampling
+        self.frame_budget = frame_budget
+        self.fps = fps
+        self.short_side = short_side
+        self.long_side = long_side
+        self.cache = None
+        if cache_enabled:
+            from src.services.frame_cache import frame_cache
+            self.cache = frame_cache
+
     def process(self, sequence: SwingSequence) -> SwingSequence:
-        frames = extract_frames(sequence.video_path, fps=1)
-        sequence.frames = [FrameData(frame=frame, frame_index=i) 
-                         for i, frame in enumerate(frames)]
+        window = sequence.metadata.get("window")
+        sequence.video_hash = sequence.video_hash or sequence.metadata.get("video_hash", "")
+        # Admission control lowers the sampling of analyses downgraded under load
+        frame_budget = sequence.metadata.get("frame_budget", self.frame_budget)
+        fps = sequence.metadata.get("sampling_fps", self.fps)
+        if self.sampling == "uniform" and window is None:
+            frames = extract_frames(sequence.video_path, fps=fps, short_side=self.short_side,
+                                    long_side=self.long_side)
+            sequence.frames = [FrameData(frame=frame, frame_index=i) 
+                             for i, frame in enumerate(frames)]
+            return sequence
+        
+        cache_key = None
+        if self.cache is not None:
+            if not sequence.video_hash:
+                from src.services.frame_cache import file_hash
+                sequence.video_hash = file_hash(sequence.video_path)
+            cache_key = self.cache.key(
+                sequence.video_hash,
+                sampling=self.sampling,
+                frame_budget=frame_budget,
+                fps=fps,
+                window=list(window) if window is not None else None,
+                idle_fraction=IDLE_SAMPLE_FRACTION,
+                motion_scale_width=MOTION_SCALE_WIDTH,
+                working_size=[self.short_side, self.long_side]
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Mapped {len(cached.frames)} cached frames for {sequence.video_path}")
+                return self._set_frames(sequence, list(cached.frames), cached.indices, cached.fps, cached.energy)
+        
+        # A session segmenter may already have computed the motion signal
+        if "motion_energy" in sequence.metadata:
+            energy, frame_rate = sequence.metadata["motion_energy"], sequence.metadata["fps"]
+        else:
+            energy, frame_rate = compute_motion_energy(sequence.video_path, scale_width=MOTION_SCALE_WIDTH)
+        start, end = window if window is not None else (0, len(energy))
+        
+        if self.sampling == "uniform":
+            indices = np.arange(start, end, max(1, int(round(frame_rate / fps))))
+        else:
+            indices = start + select_adaptive_indices(energy[start:end], frame_budget,
+                                                      idle_fraction=IDLE_SAMPLE_FRACTION)
+        # Frames that fail to decode are dropped, so keep the indices that go with the decoded ones
+        frames, indices = extract_frames_at(sequence.video_path, indices, short_side=self.short_side,
+                                            long_side=self.long_side)
+        if cache_key is not None:
+            self.cache.put(cache_key, frames, indices, frame_rate, energy)
+        
+        return self._set_frames(sequence, frames, indices, frame_rate, energy)
+
+    @staticmethod
+    def _set_frames(sequence: SwingSequence, frames, indices, frame_rate, energy) -> SwingSequence:
+        sequence.frames = [FrameData(frame=frame, frame_index=i, source_index=int(source_index),
+                                     timestamp=float(source_index) / frame_rate)
+                           for i, (frame, source_index) in enumerate(zip(frames, indices))]
+        sequence.metadata["fps"] = frame_rate
+        sequence.metadata["motion_energy"] = energy
+        sequence.emit("frames", {
+            "count": len(sequence.frames),
+            # Keypoints are in the coordinates of the working resolution
+            "frame_size": list(frames[0].shape[1::-1]) if len(frames) else None,
+            "source_indices": [frame.source_index for frame in sequence.frames],
+            "timestamps": [frame.timestamp for frame in sequence.frames]
+        })
         return sequence
 
 class ImageConversionStage(PipelineStage):
@@ -43,17 +143,139 @@ class ImageConversionStage(PipelineStage):
 
 class PoseProcessingStage(PipelineStage):
     def process(self, sequence: SwingSequence) -> SwingSequence:
-        pose_processor = PoseProcessor()
         frames = [frame.frame for frame in sequence.frames]
-        pose_results = pose_processor.process_frames(frames)
-        
-        # Assuming pose_results maintains frame order
-        for frame_data, pose_result in zip(sequence.frames, pose_results):
-            frame_data.pose_result = pose_result
+        on_progress = self._progress_callback(sequence, len(frames)) if sequence.listener else None
+        # Admission control raises the keyframe interval of analyses downgraded under load
+        keyframe_interval = sequence.metadata.get("keyframe_interval", POSE_KEYFRAME_INTERVAL)
+        # Imported here so torch and transformers only load when poses are needed
+        if INFERENCE_SERVER_ENABLED:
+            from src.inference.server import get_inference_server
+            sequence.poses = get_inference_server().process_frames(frames, on_progress=on_progress,
+                                                                   keyframe_interval=keyframe_interval)
+        else:
+            from src.utils.pose_processor import get_pose_processor
+            sequence.poses = get_pose_processor().process_frames(frames, on_progress=on_progress,
+                                                                 keyframe_interval=keyframe_interval)
         return sequence
 
+    @staticmethod
+    def _progress_callback(sequence: SwingSequence, total: int):
+        """Emit each frame's keypoints as soon as it is estimated, so clients can draw skeletons progressively."""
+        from src.utils.pose_processor import _to_numpy
+        done = [0]
+
+        def on_progress(frame_index, data):
+            done[0] += 1
+            pose = None
+            if data is not None:
+                pose = {
+                    "keypoints": np.round(_to_numpy(data['keypoints']).astype(np.float64), 2).tolist(),
+                    "scores": np.round(_to_numpy(data['scores']).astype(np.float64), 3).tolist()
+                }
+            sequence.emit("pose", {"frame_index": frame_index, "done": done[0], "total": total, "pose": pose})
+        return on_progress
+
 class VisualizationStage(PipelineStage):
+    def __init__(self, output_mode: str = ANNOTATED_OUTPUT_MODE, sprite_sheet: bool = ANNOTATED_SPRITE_SHEET):
+        """
+        Initialize the visualization stage.
+        Args:
+            output_mode: "video" streams annotated frames into one encoded video stored in MinIO,
+                "frames" writes one JPEG per frame to disk and keeps a base64 copy in memory
+            sprite_sheet: Whether to also store a keyframe sprite sheet in "video" mode
+        """
+        if output_mode not in ("video", "frames"):
+            raise ValueError(f"Unknown annotated output mode: {output_mode}")
+        self.output_mode = output_mode
+        self.sprite_sheet = sprite_sheet
+
     def process(self, sequence: SwingSequence) -> SwingSequence:
+        """
+        Draw pose estimations on images and store the annotated output.
+        """
+        if self.output_mode == "video":
+            return self._process_video(sequence)
+        return self._process_frames(sequence)
+
+    @staticmethod
+    def _draw(frame, pose) -> "np.ndarray":
+        """Draw a pose onto a BGR copy of the frame's image."""
+        from src.utils.visualization_utils import draw_pose_on_image, keypoint_edges, keypoint_colors, link_colors
+        return draw_pose_on_image(
+            frame.frame,
+            [pose],
+            keypoint_edges=keypoint_edges,
+            keypoint_colors=keypoint_colors,
+            link_colors=link_colors
+        )
+
+    def _process_video(self, sequence: SwingSequence) -> SwingSequence:
+        """
+        Stream annotated frames into a single encoded video and upload it to MinIO.
+        """
+        from src.utils.video_processing import EncodedVideoWriter, build_sprite_sheet
+        from src.config import get_minio_client, MINIO_BUCKET
+        from datetime import timedelta
+        from PIL import Image
+        import cv2
+        import tempfile
+        
+        analysis_id = sequence.analysis_id
+        keyframes = []
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = EncodedVideoWriter(os.path.join(tmp_dir, "annotated"), fps=ANNOTATED_VIDEO_FPS)
+            with writer:
+                for i, frame in enumerate(sequence.frames):
+                    pose = sequence.poses.frame(i) if sequence.poses is not None else None
+                    if pose is not None:
+                        annotated_img = self._draw(frame, pose)
+                    else:
+                        annotated_img = frame.frame
+                    writer.write(annotated_img)
+                    
+                    # Keep an RGB copy for the CLIP stage; no per-frame encoding happens here
+                    if pose is not None:
+                        frame.annotated_image = Image.fromarray(cv2.cvtColor(annotated_img, cv2.COLOR_BGR2RGB))
+            
+            if writer.frame_count == 0:
+                return sequence
+            
+            minio_client = get_minio_client()
+            extension = os.path.splitext(writer.path)[1]
+            video_object = f"analyses/{analysis_id}/annotated{extension}"
+            minio_client.fput_object(MINIO_BUCKET, video_object, writer.path, content_type=writer.content_type)
+            sequence.metadata["annotated_video_object"] = video_object
+            sequence.annotated_video_url = minio_client.presigned_get_object(
+                MINIO_BUCKET, video_object, expires=timedelta(days=7)
+            )
+            
+            if self.sprite_sheet:
+                # Evenly spaced keyframes across the whole clip
+                step = max(1, len(sequence.frames) / SPRITE_SHEET_FRAMES)
+                indices = sorted({min(len(sequence.frames) - 1, int(i * step)) for i in range(SPRITE_SHEET_FRAMES)})
+                keyframes = [sequence.frames[i].frame if sequence.frames[i].annotated_image is None
+                             else cv2.cvtColor(np.array(sequence.frames[i].annotated_image), cv2.COLOR_RGB2BGR)
+                             for i in indices]
+                sheet = build_sprite_sheet(keyframes, columns=SPRITE_SHEET_COLUMNS, thumb_width=SPRITE_SHEET_THUMB_WIDTH)
+                
+                sheet_path = os.path.join(tmp_dir, "sprite.jpg")
+                cv2.imwrite(sheet_path, sheet)
+                sheet_object = f"analyses/{analysis_id}/sprite.jpg"
+                minio_client.fput_object(MINIO_BUCKET, sheet_object, sheet_path, content_type="image/jpeg")
+                sequence.metadata["sprite_sheet_object"] = sheet_object
+                sequence.metadata["sprite_sheet_layout"] = {
+                    "columns": SPRITE_SHEET_COLUMNS,
+                    "thumb_width": SPRITE_SHEET_THUMB_WIDTH,
+                    "frame_indices": indices
+                }
+                sequence.sprite_sheet_url = minio_client.presigned_get_object(
+                    MINIO_BUCKET, sheet_object, expires=timedelta(days=7)
+                )
+        
+        return sequence
+
+    def _process_frames(self, sequence: SwingSequence) -> SwingSequence:
         """
         Draw pose estimations on images and save them to disk.
         """
@@ -61,19 +283,20 @@ class VisualizationStage(PipelineStage):
         import cv2
         import base64
         import io
-        import numpy as np
         from PIL import Image
         from pathlib import Path
         
         for i, frame in enumerate(sequence.frames):
-            if frame.pose_result and frame.pil_image:
-                # Convert PIL Image to numpy array for drawing
-                img_array = np.array(frame.pil_image)
+            pose = sequence.poses.frame(i) if sequence.poses is not None else None
+            if pose is not None and frame.frame is not None:
+                # Only this output mode draws on an RGB copy, so convert here rather than in a stage of its own
+                img_array = np.array(frame.pil_image) if frame.pil_image is not None \
+                    else cv2.cvtColor(frame.frame, cv2.COLOR_BGR2RGB)
                 
                 # Draw pose on image
                 annotated_img = draw_pose_on_image(
                     img_array, 
-                    [frame.pose_result],
+                    [pose],
                     keypoint_edges=keypoint_edges,
                     keypoint_colors=keypoint_colors,
                     link_colors=link_colors
@@ -86,7 +309,7 @@ class VisualizationStage(PipelineStage):
                 pil_image = Image.fromarray(annotated_img)
                 
                 # Save annotated frame
-                analysis_id = Path(sequence.video_path).parent.name
+                analysis_id = sequence.analysis_id
                 annotated_frames_dir = Path("media/frames") / analysis_id / "annotated"
                 annotated_frames_dir.mkdir(parents=True, exist_ok=True)
                 
@@ -108,6 +331,8 @@ class CLIPAnalysisStage(PipelineStage):
         """
         Initialize CLIP analysis stage with HuggingFace API token.
         """    
+        from huggingface_hub import InferenceClient
+        
         # Get API token from environment variable
         self.api_token = os.getenv('HF_TOKEN')
         if not self.api_token:
@@ -120,11 +345,11 @@ class CLIPAnalysisStage(PipelineStage):
         self.swing_phases = SwingPhase
         self.phase_descriptions = PHASE_DESCRIPTIONS
 
-    def _call_clip_api(self, image_path: str, descriptions: list, max_retries: int = 3, retry_delay: float = 1.0) -> dict:
+    def _call_clip_api(self, image, descriptions: list, max_retries: int = 3, retry_delay: float = 1.0) -> dict:
         """
         Call the CLIP API with retry logic using image data.
         Args:
-            image_path: Path to the image file
+            image: PIL image to classify, encoded in memory so concurrent swings share no files
             descriptions: List of descriptions to classify against
             max_retries: Maximum number of retry attempts
             retry_delay: Initial delay between retries in seconds
@@ -132,33 +357,30 @@ class CLIPAnalysisStage(PipelineStage):
             A dictionary with scores mapped to labels.
         """
         import json
-        from PIL import Image
         import base64
         import io
         
+        # Convert to RGB if needed
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+            
+        # Convert to base64
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG")
+        img_base64 = base64.b64encode(buffered.getvalue()).decode()
+        
         for attempt in range(max_retries):
             try:
-                # Open and encode image
-                with Image.open(image_path) as img:
-                    # Convert to RGB if needed
-                    if img.mode != "RGB":
-                        img = img.convert("RGB")
-                        
-                    # Convert to base64
-                    buffered = io.BytesIO()
-                    img.save(buffered, format="JPEG")
-                    img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                    
-                    response = self.client.post(
-                        json={
-                            "parameters": {
-                                "candidate_labels": descriptions
-                            },
-                            "inputs": img_base64,
-                            "task": "zero-shot-image-classification"
+                response = self.client.post(
+                    json={
+                        "parameters": {
+                            "candidate_labels": descriptions
                         },
-                        model="openai/clip-vit-large-patch14"
-                    )
+                        "inputs": img_base64,
+                        "task": "zero-shot-image-classification"
+                    },
+                    model="openai/clip-vit-large-patch14"
+                )
                 
                 # Parse the response
                 if isinstance(response, (dict, list)):
@@ -221,6 +443,7 @@ class CLIPAnalysisStage(PipelineStage):
         for i, frame in enumerate(sequence.frames):
             phase_index = min(9, i // frames_per_phase)
             frame.swing_phase = phase_map[phase_index]
+        sequence.emit("phases", {"phases": [frame.swing_phase.value for frame in sequence.frames]})
         
         # Store analysis for each phase
         clip_analysis = {}
@@ -230,16 +453,18 @@ class CLIPAnalysisStage(PipelineStage):
         phase_frames = {}
         for frame in sequence.frames:
             try:
-                if not frame.annotated_image_base64:
-                    continue
-                    
-                # Convert base64 to PIL Image
-                try:
-                    img_data = base64.b64decode(frame.annotated_image_base64)
-                    img = Image.open(io.BytesIO(img_data))
-                except Exception as e:
-                    if logging.getLogger().isEnabledFor(logging.ERROR):
-                        logging.error(f"Failed to decode image data: {str(e)}")
+                if frame.annotated_image is not None:
+                    img = frame.annotated_image
+                elif frame.annotated_image_base64:
+                    # Convert base64 to PIL Image
+                    try:
+                        img_data = base64.b64decode(frame.annotated_image_base64)
+                        img = Image.open(io.BytesIO(img_data))
+                    except Exception as e:
+                        if logging.getLogger().isEnabledFor(logging.ERROR):
+                            logging.error(f"Failed to decode image data: {str(e)}")
+                        continue
+                else:
                     continue
                 
                 # Initialize list for this phase if needed
@@ -275,21 +500,13 @@ class CLIPAnalysisStage(PipelineStage):
             # Process each image in this phase
             for img in phase_frames[phase]:
                 try:
-                    # Save image to a temporary file
-                    img_path = f"temp_{phase_name}.jpg"
-                    img.save(img_path)
-                    
                     # Call the CLIP endpoint with retry logic
-                    response = self._call_clip_api(img_path, descriptions)
+                    response = self._call_clip_api(img, descriptions)
                     
                     # Extract scores from response
                     if response:
                         all_scores.append(response)
                     
-                    # Remove temporary file
-                    import os
-                    os.remove(img_path)
-                    
                 except Exception as e:
                     if logging.getLogger().isEnabledFor(logging.ERROR):
                         logging.error(f"Error analyzing {phase_name}: {str(e)}")
@@ -308,6 +525,7 @@ class CLIPAnalysisStage(PipelineStage):
                     phase_result = self._analyze_phase_scores(avg_scores)
                     clip_analysis[phase_name] = phase_result
                     phase_analysis[phase.name] = 1  # Mark as detected
+                    sequence.emit("phase_result", {"phase": phase_name, **phase_result})
                     
                 except Exception as e:
                     if logging.getLogger().isEnabledFor(logging.ERROR):
@@ -318,10 +536,10 @@ class CLIPAnalysisStage(PipelineStage):
                 phase_analysis[phase.name] = 0  # Mark as no scores
         
         # Store both analyses in the sequence
-        sequence.analysis_results = {
+        sequence.analysis_results.update({
             'clip_analysis': clip_analysis,
             'phase_analysis': phase_analysis
-        }
+        })
         
         return sequence
         
@@ -350,99 +568,175 @@ class CLIPAnalysisStage(PipelineStage):
             'all_scores': dict(sorted_scores)  # All scores for reference
         }
 
+class MetricsStage(PipelineStage):
+    def __init__(self, lead_side: str = METRICS_LEAD_SIDE):
+        """
+        Initialize the metrics stage.
+        Args:
+            lead_side: "left" for right-handed golfers, "right" for left-handed ones
+        """
+        self.lead_side = lead_side
+
+    def process(self, sequence: SwingSequence) -> SwingSequence:
+        """Compute swing kinematics from the pose sequence for the whole clip at once."""
+        from src.utils.swing_metrics import compute_swing_metrics
+        
+        if sequence.poses is None:
+            return sequence
+        timestamps = [frame.timestamp for frame in sequence.frames]
+        metrics = compute_swing_metrics(
+            sequence.poses,
+            timestamps=timestamps if all(t is not None for t in timestamps) else None,
+            fps=sequence.metadata.get("fps") or UNIFORM_SAMPLING_FPS,
+            lead_side=self.lead_side
+        )
+        sequence.analysis_results["metrics"] = metrics["summary"]
+        sequence.analysis_results["kinematics"] = {
+            "keyframes": metrics["keyframes"],
+            "series": metrics["series"]
+        }
+        sequence.emit("metrics", metrics["summary"])
+        return sequence
+
+class SwingEmbeddingStage(PipelineStage):
+    def process(self, sequence: SwingSequence) -> SwingSequence:
+        """Embed the swing for similarity search; the embedding is stored with the analysis."""
+        from src.utils.swing_embedding import normalize_pose_sequence, embed_sequence
+        
+        if sequence.poses is None:
+            return sequence
+        timestamps = [frame.timestamp for frame in sequence.frames]
+        normalized = normalize_pose_sequence(
+            sequence.poses,
+            timestamps=timestamps if all(t is not None for t in timestamps) else None,
+            fps=sequence.metadata.get("fps") or UNIFORM_SAMPLING_FPS
+        )
+        if normalized is not None:
+            sequence.metadata["swing_embedding"] = (embed_sequence(normalized), normalized)
+        return sequence
+
 class FeedbackGenerationStage(PipelineStage):
-    def __init__(self):
-        from huggingface_hub import InferenceClient
-        import os
+    def __init__(self, mode: str = FEEDBACK_MODE, deferred: bool = FEEDBACK_DEFERRED,
+                 llm_timeout: float = FEEDBACK_LLM_TIMEOUT):
+        """
+        Initialize the feedback stage.
+        Args:
+            mode: "rules" renders feedback locally from templates, "llm" generates it with Mistral,
+                "auto" uses the LLM and falls back to the rules when it is unavailable
+            deferred: Leave feedback that is not cached to be generated when the client streams it from
+                /analyses/{id}/feedback/stream, instead of blocking the pipeline. In "auto" mode the
+                rule-based text is stored right away and replaced by the LLM's once it is streamed
+            llm_timeout: Seconds the LLM gets in "auto" mode without deferral before the rules are used
+        """
+        if mode not in ("rules", "llm", "auto"):
+            raise ValueError(f"Unknown feedback mode: {mode}")
+        self.mode = mode
+        self.deferred = deferred
+        self.llm_timeout = llm_timeout
+        self.generator = None
         
-        self.api_token = os.getenv('HF_TOKEN')
-        if not self.api_token:
-            raise ValueError("Please set the HF_TOKEN environment variable")
-            
-        self.client = InferenceClient(token=self.api_token)
+        if mode != "rules":
+            from src.services.feedback import get_feedback_generator
+            try:
+                self.generator = get_feedback_generator()
+            except ValueError:
+                if mode == "llm":
+                    raise
+                logger.warning("HF_TOKEN is not set, feedback falls back to the rule-based engine")
+        if mode == "auto" and not deferred:
+            from concurrent.futures import ThreadPoolExecutor
+            # Generations that time out keep running here and still fill the cache
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="feedback")
 
     def process(self, sequence: SwingSequence) -> SwingSequence:
-        """Generate natural language feedback using Mistral."""
+        """Generate natural language feedback using Mistral or the rule-based engine."""
         clip_analysis = sequence.analysis_results.get('clip_analysis', {})
         
         if not clip_analysis:
             sequence.feedback = "No swing analysis available."
             return sequence
+        
+        # Swings with the same profile reuse earlier feedback without calling the LLM
+        cached = self.generator.cached(clip_analysis) if self.generator else None
+        if cached is not None:
+            sequence.feedback, source = cached, "cache"
+        elif self.mode == "rules" or self.generator is None:
+            sequence.feedback, source = generate_feedback(sequence.analysis_results), "rules"
+        elif self.mode == "llm":
+            if self.deferred:
+                sequence.metadata["feedback_pending"] = True
+                source = "pending"
+            else:
+                sequence.feedback, source = self.generator.generate(clip_analysis, lookup=False), "llm"
+        elif self.deferred:
+            # Results are delivered with the rule-based text, the LLM upgrades it when streamed
+            sequence.feedback, source = generate_feedback(sequence.analysis_results), "rules"
+            sequence.metadata["feedback_pending"] = True
+        else:
+            sequence.feedback, source = self._generate_with_fallback(sequence)
+        sequence.analysis_results["feedback_source"] = source
+        # Stored so the stream endpoint knows the feedback is still to be generated by the LLM
+        sequence.analysis_results["feedback_pending"] = bool(sequence.metadata.get("feedback_pending"))
+        sequence.emit("feedback", {
+            "feedback": sequence.feedback,
+            "source": source,
+            "pending": bool(sequence.metadata.get("feedback_pending"))
+        })
             
-        # Create a conversational prompt
-        prompt = """As a friendly golf instructor having a one-on-one session with your student, provide encouraging feedback on their swing. Write in a natural, conversational tone as if you're speaking directly to them:
-
-Start with a warm greeting and highlight what they're doing well. Focus on their natural strengths and how these will help their game. Be specific with your praise.
+        return sequence
 
-Then, gently transition into a couple of helpful adjustments they can make. Explain these in simple terms, using relatable "feel cues" that make sense. Help them understand how these changes will improve their game.
+    def _generate_with_fallback(self, sequence: SwingSequence):
+        """Try the LLM within the timeout, otherwise render the feedback from rules."""
+        from concurrent.futures import TimeoutError
+        
+        clip_analysis = sequence.analysis_results['clip_analysis']
+        future = self._executor.submit(lambda: "".join(self.generator.stream(clip_analysis, lookup=False)).strip())
+        try:
+            feedback = future.result(timeout=self.llm_timeout)
+            if feedback:
+                return feedback, "llm"
+        except TimeoutError:
+            logger.warning(f"LLM feedback took longer than {self.llm_timeout}s, using rule-based feedback")
+        except Exception as e:
+            logger.error(f"Error generating feedback, using rule-based feedback: {str(e)}")
+        return generate_feedback(sequence.analysis_results), "rules"
 
-Finally, share two fun practice drills they can try. For each drill:
-- Explain why you chose it and how it helps
-- Walk them through the setup and steps
-- Share what success feels like
-- Offer ways to make it easier or more challenging
-- Give them clear signs of progress to look for
+class PersistenceStage(PipelineStage):
+    def __init__(self, session_factory=None):
+        """
+        Initialize the persistence stage.
+        Args:
+            session_factory: Callable returning a database session, defaults to get_session
+        """
+        if session_factory is None:
+            from src.config import get_session
+            session_factory = get_session
+        self.session_factory = session_factory
 
-Here's what I noticed in their swing:\n\n"""
-        
-        for phase_name, phase_data in clip_analysis.items():
-            strengths = phase_data.get('strengths', [])
-            improvements = phase_data.get('areas_for_improvement', [])
-            
-            if strengths or improvements:
-                prompt += f"{phase_name}:\n"
-                if strengths:
-                    prompt += f"Strengths: {', '.join(strengths)}\n"
-                if improvements:
-                    prompt += f"Opportunities: {', '.join(improvements)}\n"
-                prompt += "\n"
+    def process(self, sequence: SwingSequence) -> SwingSequence:
+        """
+        Store the analysis and its per-frame poses so results can be fetched
+        again without re-running inference. Skipped for sequences that are not
+        linked to a stored video.
+        """
+        from src.crud import analysis as analysis_crud
         
-        prompt += "\nWrite as if you're having a friendly conversation at the driving range. Keep the tone warm and encouraging, while making sure they have all the details they need to improve. Make them feel excited about practicing these changes!"
+        video_id = sequence.metadata.get("video_id")
+        if not video_id:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug("No video_id in sequence metadata, skipping persistence")
+            return sequence
         
+        db = self.session_factory()
         try:
-            response = self.client.post(
-                json={
-                    "inputs": prompt,
-                    "parameters": {
-                        "max_new_tokens": 750,
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "do_sample": True,
-                        "return_full_text": False
-                    }
-                },
-                model="mistralai/Mistral-7B-Instruct-v0.3"
-            )
-            
-            # Clean up the response
-            import json
-            if isinstance(response, bytes):
-                response = response.decode('utf-8')
-            if isinstance(response, str):
-                try:
-                    response = json.loads(response)
-                except json.JSONDecodeError:
-                    pass
-                
-            # Extract the feedback text
-            if isinstance(response, list) and response:
-                feedback = response[0].get('generated_text', '')
-            elif isinstance(response, dict):
-                feedback = response.get('generated_text', '')
-            else:
-                feedback = str(response)
-            
-            # Clean up the feedback text
-            feedback = feedback.strip()
-            feedback = feedback.replace('\\n', '\n')  # Convert escaped newlines
-            feedback = feedback.replace('\\', '')     # Remove other escape chars
-            
-            sequence.feedback = feedback
-            
-        except Exception as e:
-            logger.error(f"Error generating feedback: {str(e)}")
-            sequence.feedback = "Unable to generate detailed feedback at this time. Please try again."
-            
+            analysis_crud.create_analysis(db, sequence.analysis_id, video_id, sequence)
+        finally:
+            db.close()
+        
+        embedding = sequence.metadata.get("swing_embedding")
+        if embedding is not None:
+            from src.services.swing_index import swing_index
+            swing_index.add(sequence.analysis_id, video_id, embedding[0])
         return sequence
 
 class SwingPipeline:
@@ -459,23 +753,111 @@ class SwingPipeline:
         self.stages.append(stage)
         return self  # Enable method chaining
         
-    def process(self, video_path: str) -> SwingSequence:
+    def process(self, video_path: str, metadata: Optional[dict] = None,
+                listener: Optional[Callable[[str, dict], None]] = None) -> SwingSequence:
         """
         Process a video through all pipeline stages
+        Args:
+            video_path: Path to the local video file
+            metadata: Initial sequence metadata, e.g. video_id and analysis_id
+            listener: Receives stage start/finish events and partial results as (event, data)
         """
         # Initialize sequence with video path
-        sequence = SwingSequence(frames=[], video_path=video_path)
+        sequence = SwingSequence(frames=[], video_path=video_path, metadata=dict(metadata or {}),
+                                 listener=listener)
         
         # Process through each stage
-        for stage in self.stages:
+        for index, stage in enumerate(self.stages):
+            stage_name = stage.__class__.__name__
+            sequence.emit("stage_started", {"stage": stage_name, "index": index, "total": len(self.stages)})
+            started = time.perf_counter()
             try:
                 sequence = stage.process(sequence)
+                sequence.emit("stage_finished", {"stage": stage_name, "seconds": round(time.perf_counter() - started, 3)})
             except Exception as e:
                 # In a production environment, you might want to add logging here
                 raise Exception(f"Pipeline failed at stage {stage.__class__.__name__}: {str(e)[:100]}")  # Truncate long error messages
                 
         return sequence
 
+class SessionPipeline:
+    """
+    Pipeline for long range-session videos containing many swings.
+    Swing windows are found with a cheap motion detector, and each window is
+    run through the swing pipeline as its own SwingSequence, in parallel.
+    Footage between swings is never decoded by the heavy stages.
+    """
+    
+    def __init__(self, pipeline: SwingPipeline, max_workers: int = SEGMENT_WORKERS):
+        self.pipeline = pipeline
+        self.max_workers = max_workers
+        
+    def segment(self, video_path: str):
+        """
+        Find swing windows in a video.
+        Returns the windows and the motion signal and frame rate they were found in.
+        """
+        from src.utils.swing_segmentation import find_swing_windows
+        
+        energy, frame_rate = compute_motion_energy(video_path, scale_width=MOTION_SCALE_WIDTH)
+        windows = find_swing_windows(
+            energy,
+            frame_rate,
+            threshold=SEGMENT_THRESHOLD,
+            min_duration=SEGMENT_MIN_DURATION,
+            max_duration=SEGMENT_MAX_DURATION,
+            padding=SEGMENT_PADDING,
+            merge_gap=SEGMENT_MERGE_GAP
+        )
+        return windows, energy, frame_rate
+        
+    def process(self, video_path: str, metadata: Optional[dict] = None,
+                listener: Optional[Callable[[str, dict], None]] = None) -> List[SwingSequence]:
+        """
+        Process every swing found in a video.
+        Windows that fail a stage, e.g. because validation finds no golf swing
+        in them, are logged and left out of the result.
+        Args:
+            video_path: Path to the local video file
+            metadata: Metadata shared by every swing, e.g. video_id
+            listener: Receives the swing windows found and one event per swing as it
+                is stored or skipped; per-stage events of the swings are not forwarded
+        Returns:
+            One SwingSequence per swing, in the order they appear in the video
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        import uuid
+        
+        windows, energy, frame_rate = self.segment(video_path)
+        logger.info(f"Found {len(windows)} swing windows in {video_path}")
+        emit = listener or (lambda event, data: None)
+        emit("segments", {"count": len(windows), "fps": frame_rate,
+                          "windows": [[int(start), int(end)] for start, end in windows]})
+        
+        def run(swing_index, window):
+            swing_metadata = dict(metadata or {})
+            swing_metadata.update({
+                "analysis_id": str(uuid.uuid4()),
+                "swing_index": swing_index,
+                "window": window,
+                "motion_energy": energy,
+                "fps": frame_rate
+            })
+            event = {"swing_index": swing_index, "window": [int(window[0]), int(window[1])]}
+            try:
+                sequence = self.pipeline.process(video_path, metadata=swing_metadata)
+            except Exception as e:
+                logger.error(f"Swing {swing_index} in frames {window[0]}-{window[1]} skipped: {str(e)}")
+                emit("swing_skipped", {**event, "detail": str(e)})
+                return None
+            emit("swing_analyzed", {**event, "analysis_id": swing_metadata["analysis_id"]})
+            return sequence
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(run, range(len(windows)), windows))
+        
+        return [sequence for sequence in results if sequence is not None]
+
 def create_default_pipeline() -> SwingPipeline:
     """
     Factory method to create a pipeline with the default stages
@@ -483,8 +865,16 @@ def create_default_pipeline() -> SwingPipeline:
     return (SwingPipeline()
             .add_stage(SwingValidationStage())
             .add_stage(FrameExtractionStage())
-            .add_stage(ImageConversionStage())
             .add_stage(PoseProcessingStage())
             .add_stage(VisualizationStage())
             .add_stage(CLIPAnalysisStage())  # This handles phase analysis
-            .add_stage(FeedbackGenerationStage()))
+            .add_stage(MetricsStage())
+            .add_stage(SwingEmbeddingStage())
+            .add_stage(FeedbackGenerationStage())
+            .add_stage(PersistenceStage()))
+
+def create_session_pipeline() -> SessionPipeline:
+    """
+    Factory method to create a pipeline for multi-swing range-session videos
+    """
+    return SessionPipeline(create_default_pipeline())
@@ -0,0 +1,481 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from src.config import get_db, get_session, get_minio_client, MINIO_BUCKET, ANALYSIS_FRAME_MAX_AGE, \
+    SSE_HEARTBEAT_SECONDS, FEEDBACK_MODE, SEGMENT_WORKERS, SESSION_MIN_DURATION, logger
+from src.crud import analysis as analysis_crud
+from src.crud import video as video_crud
+from src.models.analysis import Analysis
+from src.schemas.analysis_response import AnalysisSummary, FrameRef, SessionAnalysisSummary, SimilarSwing, \
+    SimilarSwingsResponse
+from src.schemas.job import AnalysisJobStatus
+from src.schemas.multi_angle import MultiAngleSessionRequest, MultiAngleSessionSummary
+from src.services.admission import AdmissionRejected, admission, analysis_tiers
+from src.services.frame_store import frame_etag, get_annotated_frame
+from src.services.jobs import AnalysisJob, JobQueueFull, jobs
+from src.services.object_cache import object_cache
+from src.services.swing_index import swing_index
+from src.utils.sse import format_sse, iterate_in_stream_threads, SSE_HEARTBEAT
+from contextlib import ExitStack
+from functools import lru_cache
+from datetime import timedelta
+from typing import List, Literal, Optional, Union
+import base64
+import time
+import uuid
+
+router = APIRouter(tags=["Analysis"])
+
+@lru_cache
+def get_pipeline():
+    """Build the default pipeline once so its models stay loaded between requests"""
+    from src.pipeline.swing_pipeline import create_default_pipeline
+    return create_default_pipeline()
+
+@lru_cache
+def get_session_pipeline():
+    """Range-session pipeline running each swing through the shared default pipeline"""
+    from src.pipeline.swing_pipeline import SessionPipeline
+    return SessionPipeline(get_pipeline())
+
+@lru_cache
+def get_multi_angle_session():
+    """Multi-angle session running every angle through the shared default pipeline"""
+    from src.pipeline.multi_angle import MultiAngleSession
+    return MultiAngleSession(get_pipeline())
+
+AnalysisMode = Literal["auto", "single", "session"]
+MODE_DESCRIPTION = ("'single' analyses the video as one swing, 'session' finds and analyses every swing of a "
+                    "range session, 'auto' picks 'session' for videos longer than SESSION_MIN_DURATION")
+
+def _analysis_mode(db_video, mode: str) -> str:
+    if mode == "auto":
+        return "session" if (db_video.duration or 0) > SESSION_MIN_DURATION else "single"
+    return mode
+
+def _wants_frames(include: Optional[str]) -> bool:
+    return include is not None and "frames" in [part.strip() for part in include.split(",")]
+
+def _run_analysis(db_video, analysis_id: str, listener=None) -> None:
+    """
+    Fetch a stored video through the local object cache and run the pipeline on it, storing the analysis.
+    The analysis waits for admission first and runs at the tier it was admitted with.
+    """
+    with admission.admit(analysis_tiers(db_video), on_admitted=_admission_listener(listener)) as tier:
+        with object_cache.path(db_video.bucket, db_video.object_name) as video_path:
+            get_pipeline().process(
+                str(video_path),
+                metadata={"video_id": db_video.id, "analysis_id": analysis_id, "video_hash": db_video.content_hash,
+                          **tier.overrides},
+                listener=listener
+            )
+
+def _run_session(db_video, listener=None) -> List[str]:
+    """
+    Find every swing of a range-session video and analyse each as its own analysis.
+    Admitted as one analysis sized for the swings processed at once.
+    Returns the IDs of the stored analyses, in the order the swings were played.
+    """
+    tiers = analysis_tiers(db_video, swings=SEGMENT_WORKERS)
+    with admission.admit(tiers, on_admitted=_admission_listener(listener)) as tier:
+        with object_cache.path(db_video.bucket, db_video.object_name) as video_path:
+            sequences = get_session_pipeline().process(
+                str(video_path),
+                metadata={"video_id": db_video.id, "video_hash": db_video.content_hash, **tier.overrides},
+                listener=listener
+            )
+    return [sequence.metadata["analysis_id"] for sequence in sequences]
+
+def _admission_listener(listener):
+    if listener is None:
+        return None
+
+    def on_admitted(tier, waited):
+        listener("admission", {"tier": tier.name, "queued_seconds": round(waited, 3), **tier.cost._asdict()})
+    return on_admitted
+
+def _retry_later(e: Union[AdmissionRejected, JobQueueFull]) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+def _job_status(job: AnalysisJob, request: Request) -> AnalysisJobStatus:
+    return AnalysisJobStatus(
+        **job.to_dict(),
+        events_url=str(request.url_for("get_analysis_job_events", job_id=job.id)),
+        analysis_url=str(request.url_for("get_analysis", analysis_id=job.id)) if job.mode == "single" else None
+    )
+
+def _presign(object_name: Optional[str], bucket: str) -> Optional[str]:
+    if not object_name:
+        return None
+    try:
+        return get_minio_client().presigned_get_object(bucket, object_name, expires=timedelta(days=7))
+    except Exception as e:
+        logger.error(f"Error generating presigned URL: {str(e)}")
+        return None
+
+def build_summary(db: Session, analysis: Analysis, request: Request, include_frames: bool = False) -> AnalysisSummary:
+    """Build the lean analysis response, optionally with frames inlined as base64"""
+    poses, phases = analysis_crud.get_pose_sequence(db, analysis.video_id, analysis.id)
+
+    frames = []
+    for index in range(analysis.num_frames or 0):
+        frame_ref = FrameRef(
+            index=index,
+            phase=phases[index] if index < len(phases) else None,
+            url=str(request.url_for("get_analysis_frame", analysis_id=analysis.id, frame_index=index)),
+            etag=frame_etag(analysis.id, index)
+        )
+        if include_frames:
+            data = get_annotated_frame(analysis.id, index, analysis.annotated_video_object)
+            if data is not None:
+                frame_ref.image_base64 = base64.b64encode(data).decode()
+        frames.append(frame_ref)
+
+    return AnalysisSummary(
+        id=analysis.id,
+        video_id=analysis.video_id,
+        video_hash=analysis.video_hash,
+        created_at=analysis.created_at,
+        num_frames=analysis.num_frames or 0,
+        analysis_results=analysis.analysis_results or {},
+        feedback=analysis.feedback,
+        poses=poses.to_json(),
+        frames=frames,
+        annotated_video_url=_presign(analysis.annotated_video_object, MINIO_BUCKET),
+        sprite_sheet_url=_presign(analysis.sprite_sheet_object, MINIO_BUCKET)
+    )
+
+@router.post("/videos/{video_id}/analysis", response_model=Union[AnalysisSummary, SessionAnalysisSummary])
+def analyze_video(
+    video_id: str,
+    request: Request,
+    include: Optional[str] = Query(None, description="Set to 'frames' to inline annotated frames as base64"),
+    mode: AnalysisMode = Query("auto", description=MODE_DESCRIPTION),
+    db: Session = Depends(get_db)
+) -> Union[AnalysisSummary, SessionAnalysisSummary]:
+    """
+    Run the swing analysis pipeline on a stored video.
+    Range sessions return one analysis per swing found.
+    """
+    db_video = video_crud.get_video(db, video_id)
+    if not db_video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    session = _analysis_mode(db_video, mode) == "session"
+    analysis_id = str(uuid.uuid4())
+    try:
+        if session:
+            analysis_ids = _run_session(db_video)
+        else:
+            _run_analysis(db_video, analysis_id)
+    except AdmissionRejected as e:
+        raise _retry_later(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error analyzing video: {str(e)}"
+        )
+
+    if session:
+        analyses = [analysis_crud.get_analysis(db, analysis_id) for analysis_id in analysis_ids]
+        return SessionAnalysisSummary(
+            video_id=video_id,
+            swings=[build_summary(db, analysis, request, _wants_frames(include)) for analysis in analyses if analysis]
+        )
+    analysis = analysis_crud.get_analysis(db, analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=500, detail="Analysis was not stored")
+    return build_summary(db, analysis, request, _wants_frames(include))
+
+@router.post("/videos/{video_id}/analysis/jobs", response_model=AnalysisJobStatus, status_code=202)
+def start_analysis_job(
+    video_id: str,
+    request: Request,
+    mode: AnalysisMode = Query("auto", description=MODE_DESCRIPTION),
+    db: Session = Depends(get_db)
+) -> AnalysisJobStatus:
+    """
+    Start analysing a stored video in the background.
+    Progress and partial results are streamed from the job's events URL;
+    range sessions report the swings found and each swing's analysis ID as it is stored.
+    """
+    db_video = video_crud.get_video(db, video_id)
+    if not db_video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if admission.full():
+        raise _retry_later(AdmissionRejected("Analysis queue is full, try again later"))
+
+    mode = _analysis_mode(db_video, mode)
+    if mode == "session":
+        def run(job):
+            job.analysis_ids = _run_session(db_video, listener=job.publish)
+    else:
+        def run(job):
+            _run_analysis(db_video, job.id, listener=job.publish)
+    try:
+        job = jobs.submit(str(uuid.uuid4()), video_id, run, mode=mode)
+    except JobQueueFull as e:
+        raise _retry_later(e)
+    return _job_status(job, request)
+
+@router.post("/sessions/multi-angle", response_model=MultiAngleSessionSummary)
+def analyze_multi_angle_session(
+    body: MultiAngleSessionRequest,
+    request: Request,
+    include: Optional[str] = Query(None, description="Set to 'frames' to inline annotated frames as base64"),
+    db: Session = Depends(get_db)
+) -> MultiAngleSessionSummary:
+    """
+    Analyse one swing recorded from several angles. The videos are aligned in
+    time, only frames around the common swing window are sampled, and each
+    angle is stored as its own analysis.
+    """
+    if not body.videos:
+        raise HTTPException(status_code=400, detail="A multi-angle session needs at least one video")
+    if body.reference is not None and body.reference not in body.videos:
+        raise HTTPException(status_code=400, detail=f"Unknown reference angle: {body.reference}")
+    db_videos = {}
+    for angle, video_id in body.videos.items():
+        db_videos[angle] = video_crud.get_video(db, video_id)
+        if not db_videos[angle]:
+            raise HTTPException(status_code=404, detail=f"Video not found: {video_id}")
+
+    # The angles run concurrently, so admit them together; the reference decides the cost per angle
+    reference = body.reference or next(iter(body.videos))
+    tiers = analysis_tiers(db_videos[reference], swings=len(db_videos))
+    try:
+        with admission.admit(tiers) as tier, ExitStack() as stack:
+            paths = {
+                angle: str(stack.enter_context(object_cache.path(db_video.bucket, db_video.object_name)))
+                for angle, db_video in db_videos.items()
+            }
+            # Each angle's video_id and video_hash differ, see PersistenceStage
+            result = get_multi_angle_session().process(paths, reference=reference, metadata=tier.overrides,
+                                                       angle_metadata={
+                                                           angle: {"video_id": db_video.id,
+                                                                   "video_hash": db_video.content_hash}
+                                                           for angle, db_video in db_videos.items()
+                                                       })
+    except AdmissionRejected as e:
+        raise _retry_later(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing session: {str(e)}")
+
+    analyses = {}
+    for angle, sequence in result.sequences.items():
+        analysis = analysis_crud.get_analysis(db, sequence.metadata["analysis_id"])
+        if analysis:
+            analyses[angle] = build_summary(db, analysis, request, _wants_frames(include))
+    return MultiAngleSessionSummary(
+        session_id=result.session_id,
+        reference=result.reference,
+        offsets=result.offsets,
+        window=list(result.window),
+        analyses=analyses,
+        errors=result.errors
+    )
+
+@router.get("/analysis-jobs/{job_id}", response_model=AnalysisJobStatus)
+def get_analysis_job(job_id: str, request: Request) -> AnalysisJobStatus:
+    """Get the status of an analysis job"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job, request)
+
+@router.get("/analysis-jobs/{job_id}/events", name="get_analysis_job_events")
+async def get_analysis_job_events(
+    job_id: str,
+    last_event_id: Optional[int] = Header(None, description="Resume after this event, sent by EventSource on reconnect")
+) -> StreamingResponse:
+    """
+    Stream the events of an analysis job as Server-Sent Events: stage
+    start/finish, per-frame pose progress with keypoints, swing phases,
+    per-phase results and feedback. The stream ends once the job has finished.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        after = last_event_id if last_event_id is not None else -1
+        async for entry in job.events(after=after, heartbeat=SSE_HEARTBEAT_SECONDS):
+            if entry is None:
+                yield SSE_HEARTBEAT
+            else:
+                event_id, event, data = entry
+                yield format_sse(event, data, event_id=event_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/videos/{video_id}/analysis", response_model=AnalysisSummary)
+def get_latest_video_analysis(
+    video_id: str,
+    request: Request,
+    include: Optional[str] = Query(None, description="Set to 'frames' to inline annotated frames as base64"),
+    db: Session = Depends(get_db)
+) -> AnalysisSummary:
+    """Get the most recent analysis of a video"""
+    analysis = analysis_crud.get_latest_analysis(db, video_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return build_summary(db, analysis, request, _wants_frames(include))
+
+@router.get("/analyses/{analysis_id}", response_model=AnalysisSummary, name="get_analysis")
+def get_analysis(
+    analysis_id: str,
+    request: Request,
+    include: Optional[str] = Query(None, description="Set to 'frames' to inline annotated frames as base64"),
+    db: Session = Depends(get_db)
+) -> AnalysisSummary:
+    """Get analysis by ID"""
+    analysis = analysis_crud.get_analysis(db, analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return build_summary(db, analysis, request, _wants_frames(include))
+
+@router.get("/analyses/{analysis_id}/frames/{frame_index}", name="get_analysis_frame")
+def get_analysis_frame(
+    analysis_id: str,
+    frame_index: int,
+    request: Request,
+    db: Session = Depends(get_db)
+) -> Response:
+    """Get one annotated frame as JPEG, cacheable by ETag"""
+    etag = frame_etag(analysis_id, frame_index)
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ANALYSIS_FRAME_MAX_AGE}, immutable"
+    }
+
+    # Frames never change, so a matching ETag needs no database or storage access
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=cache_headers)
+
+    analysis = analysis_crud.get_analysis(db, analysis_id)
+    if not analysis or not 0 <= frame_index < (analysis.num_frames or 0):
+        raise HTTPException(status_code=404, detail="Frame not found")
+
+    try:
+        data = get_annotated_frame(analysis_id, frame_index, analysis.annotated_video_object)
+    except Exception as e:
+        logger.error(f"Error loading annotated frame: {str(e)}")
+        raise HTTPException(status_code=503, detail="Storage service is currently unavailable")
+    if data is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+
+    return Response(content=data, media_type="image/jpeg", headers=cache_headers)
+
+@router.get("/analyses/{analysis_id}/feedback/stream")
+def stream_analysis_feedback(
+    analysis_id: str,
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Stream the coaching feedback of an analysis as Server-Sent Events.
+    Sends "token" events while text is generated, then one "done" event with
+    the full feedback. Stored or cached feedback is sent right away; rule-based
+    feedback stored in "auto" mode is replaced by the LLM's here.
+    """
+    analysis = analysis_crud.get_analysis(db, analysis_id)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    stored_feedback = analysis.feedback
+    analysis_results = analysis.analysis_results or {}
+    clip_analysis = analysis_results.get("clip_analysis", {})
+    # "auto" mode stores rule-based feedback for the LLM to replace here
+    pending = bool(analysis_results.get("feedback_pending"))
+
+    def events():
+        if stored_feedback and not pending:
+            yield format_sse("token", {"text": stored_feedback})
+            yield format_sse("done", {"feedback": stored_feedback, "cached": True,
+                                      "source": analysis_results.get("feedback_source")})
+            return
+        if not clip_analysis:
+            yield format_sse("done", {"feedback": "No swing analysis available.", "cached": False})
+            return
+
+        from src.services.feedback import get_feedback_generator
+        try:
+            pieces, source = [], "llm"
+            generator = get_feedback_generator()
+            # One cache lookup per request, so /metrics/feedback counts it once
+            cached_feedback = generator.cached(clip_analysis)
+            cached = cached_feedback is not None
+            tokens = [cached_feedback] if cached else generator.stream(clip_analysis, lookup=False)
+            for token in tokens:
+                pieces.append(token)
+                yield format_sse("token", {"text": token})
+        except Exception as e:
+            logger.error(f"Error streaming feedback for analysis {analysis_id}: {str(e)}")
+            if pieces or FEEDBACK_MODE == "llm":
+                yield format_sse("error", {"detail": "Unable to generate detailed feedback at this time. Please try again."})
+                return
+            # Nothing was sent yet, so the rule-based text can stand in for the LLM
+            if stored_feedback:
+                # Still pending, a later request tries the LLM again
+                yield format_sse("token", {"text": stored_feedback})
+                yield format_sse("done", {"feedback": stored_feedback, "cached": True, "source": "rules"})
+                return
+            from src.utils.feedback_generation import generate_feedback
+            cached, source = False, "rules"
+            pieces = [generate_feedback(analysis_results)]
+            yield format_sse("token", {"text": pieces[0]})
+
+        feedback = "".join(pieces).strip()
+        # The request's session may already be closed while the response streams
+        stream_db = get_session()
+        try:
+            analysis_crud.update_analysis_feedback(stream_db, analysis_id, feedback, source=source)
+        finally:
+            stream_db.close()
+        yield format_sse("done", {"feedback": feedback, "cached": cached, "source": source})
+
+    # Generation blocks, so it runs on the stream threads rather than the shared pool
+    return StreamingResponse(
+        iterate_in_stream_threads(events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/analyses/{analysis_id}/similar", response_model=SimilarSwingsResponse)
+def find_similar_swings(
+    analysis_id: str,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50, description="Number of similar swings to return"),
+    same_video: bool = Query(False, description="Include other analyses of the same video"),
+    db: Session = Depends(get_db)
+) -> SimilarSwingsResponse:
+    """
+    Find the stored swings most similar to an analysed one. Candidates come
+    from the embedding index and are re-ranked by DTW distance of their
+    normalized keypoint sequences.
+    """
+    started = time.perf_counter()
+    embedding = analysis_crud.get_swing_embedding(db, analysis_id)
+    if not embedding:
+        if not analysis_crud.get_analysis(db, analysis_id):
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        raise HTTPException(status_code=404, detail="No swing embedding for this analysis, re-run the analysis to add it")
+
+    exclude = {analysis_id}
+    if not same_video:
+        exclude.update(analysis.id for analysis in analysis_crud.list_analyses(db, embedding.video_id))
+    results = swing_index.search(embedding.embedding, embedding.sequence, limit=limit, exclude=exclude)
+    return SimilarSwingsResponse(
+        analysis_id=analysis_id,
+        results=[
+            SimilarSwing(
+                **result._asdict(),
+                analysis_url=str(request.url_for("get_analysis", analysis_id=result.analysis_id))
+            )
+            for result in results
+        ],
+        indexed=len(swing_index),
+        took_ms=round((time.perf_counter() - started) * 1000, 1)
+    )
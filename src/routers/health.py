@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from src.services.readiness import readiness
+
+router = APIRouter(tags=["Health"])
+
+@router.get("/healthz")
+def healthz():
+    """Liveness probe, answers as soon as the process is serving requests"""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+def readyz():
+    """Readiness probe, reports the warm-up state of models and storage"""
+    ready = readiness.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "components": readiness.snapshot()}
+    )
@@ -0,0 +1,56 @@
+from fastapi import APIRouter
+from src.config import INFERENCE_SERVER_ENABLED, pool_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics/inference")
+def inference_metrics():
+    """Batch size, queue wait and latency histograms of the shared inference server"""
+    from src.inference.server import get_inference_server
+
+    # Don't load the models just to report that nothing has run yet
+    if not INFERENCE_SERVER_ENABLED or get_inference_server.cache_info().currsize == 0:
+        return {"enabled": INFERENCE_SERVER_ENABLED, "started": False, "batchers": {}}
+    return {"enabled": True, "started": True, "batchers": get_inference_server().metrics()}
+
+@router.get("/metrics/feedback")
+def feedback_metrics():
+    """Size and hit rate of the LLM feedback cache"""
+    from src.services.feedback import feedback_cache
+    return feedback_cache.stats()
+
+@router.get("/metrics/database")
+def database_metrics():
+    """Connection pool utilization"""
+    return pool_metrics()
+
+@router.get("/metrics/storage-gc")
+def storage_gc_metrics():
+    """Result of the last storage GC pass"""
+    from src.services.storage_gc import storage_gc
+    return storage_gc.last_report
+
+@router.get("/metrics/admission")
+def admission_metrics():
+    """Analysis budgets in use, queue length and admission counts"""
+    from src.services.admission import admission
+    return admission.usage()
+
+@router.get("/metrics/process")
+def process_metrics():
+    """Resident memory and thread count of this server process"""
+    import os
+    import resource
+    import sys
+    import threading
+
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass  # Not Linux, only the peak is available
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak if sys.platform == "darwin" else peak * 1024
+    return {"pid": os.getpid(), "rss_bytes": rss, "peak_rss_bytes": peak, "threads": threading.active_count()}
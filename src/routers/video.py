@@ -1,71 +1,123 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, BackgroundTasks, Query, Request
 from sqlalchemy.orm import Session
-from src.config import get_db, get_minio_client, MINIO_BUCKET, MINIO_SECURE, logger
+from src.config import get_db, get_minio_client, MINIO_BUCKET, MINIO_SECURE, logger, \
+    MAX_UPLOAD_BYTES, MAX_VIDEO_DURATION, MAX_VIDEO_DIMENSION, ALLOWED_VIDEO_CODECS, UPLOAD_CHUNK_SIZE
 from src.crud import video as video_crud
-from src.schemas.video import Video, VideoCreate
+from src.schemas.video import Video, VideoCreate, VideoBulkDelete, VideoBulkDeleteResult
+from src.services.media_derivation import derive_video_media
+from src.services.storage_gc import remove_objects
+from src.utils.video_probe import IngestProbe, ProbeLimits, ProbeError, VideoMetadata
+import hashlib
 import uuid
 import io
 from datetime import datetime, timedelta
-from typing import List
+from pathlib import Path
+from collections import defaultdict
+from typing import AsyncIterator, List, Tuple
 
 router = APIRouter(prefix="/videos", tags=["Videos"])
 
+ALLOWED_CONTENT_TYPES = ["video/mp4", "video/quicktime"]
+
 def validate_video_file(file: UploadFile) -> None:
     """Validate uploaded video file."""
-    allowed_types = ["video/mp4", "video/quicktime"]
-    if file.content_type not in allowed_types:
+    validate_content_type(file.content_type)
+
+def validate_content_type(content_type: str) -> None:
+    """Reject content types other than MP4 and QuickTime."""
+    if content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"File type {file.content_type} not allowed. Must be one of: {allowed_types}"
+            detail=f"File type {content_type} not allowed. Must be one of: {ALLOWED_CONTENT_TYPES}"
         )
 
-@router.post("/", response_model=Video)
-async def upload_video(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-) -> Video:
-    """Upload a video file"""
-    # Validate file type
-    validate_video_file(file)
-    
+def create_probe() -> IngestProbe:
+    return IngestProbe(ProbeLimits(
+        max_bytes=MAX_UPLOAD_BYTES,
+        max_duration=MAX_VIDEO_DURATION,
+        max_dimension=MAX_VIDEO_DIMENSION,
+        allowed_codecs=ALLOWED_VIDEO_CODECS
+    ))
+
+async def probe_chunks(chunks: AsyncIterator[bytes]) -> Tuple[bytes, VideoMetadata]:
+    """
+    Read an upload chunk by chunk through the ingest probe, rejecting it as
+    soon as the probe finds a problem. Returns the content and probed metadata.
+    """
+    probe = create_probe()
+    buffer = io.BytesIO()
+    try:
+        async for chunk in chunks:
+            probe.feed(chunk)
+            buffer.write(chunk)
+        metadata = probe.finish()
+    except ProbeError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return buffer.getvalue(), metadata
+
+async def _upload_file_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def store_video(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    filename: str,
+    content_type: str,
+    content: bytes,
+    metadata: VideoMetadata
+) -> dict:
+    """Store a probed video in MinIO and record it in the database"""
     # Create unique ID
     video_id = str(uuid.uuid4())
     minio_client = None
     
+    # Connect to MinIO
+    try:
+        minio_client = get_minio_client()
+    except Exception as e:
+        logger.error(f"Failed to connect to MinIO: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Storage service is currently unavailable"
+        )
+    
+    object_name = f"{video_id}/{filename}"
     try:
-        # Connect to MinIO
-        try:
-            minio_client = get_minio_client()
-        except Exception as e:
-            logger.error(f"Failed to connect to MinIO: {str(e)}")
-            raise HTTPException(
-                status_code=503,
-                detail="Storage service is currently unavailable"
-            )
-        
         # Upload to MinIO
-        object_name = f"{video_id}/{file.filename}"
-        content = await file.read()
         minio_client.put_object(
             MINIO_BUCKET,
             object_name,
             io.BytesIO(content),
             len(content),
-            file.content_type
+            content_type
         )
         
         # Create database entry
         video_data = VideoCreate(
             id=video_id,
-            filename=file.filename,
-            content_type=file.content_type,
+            filename=filename,
+            content_type=content_type,
             size=len(content),
             bucket=MINIO_BUCKET,
-            object_name=object_name
+            object_name=object_name,
+            content_hash=hashlib.sha256(content).hexdigest(),
+            duration=metadata.duration,
+            fps=metadata.fps,
+            width=metadata.width,
+            height=metadata.height,
+            codec=metadata.codec,
+            rotation=metadata.rotation
         )
         
         db_video = video_crud.create_video(db, video_data)
         
+        # Generate thumbnail and proxy once the response has been sent
+        background_tasks.add_task(derive_video_media, video_id, MINIO_BUCKET, object_name, content)
+        
         # Generate presigned URL with explicit HTTP scheme
         video_url = minio_client.presigned_get_object(
             MINIO_BUCKET,
@@ -84,16 +136,72 @@ async def upload_video(
         
     except Exception as e:
         # Cleanup on error
-        if minio_client and video_id:
-            try:
-                minio_client.remove_object(MINIO_BUCKET, object_name)
-            except:
-                pass
+        try:
+            minio_client.remove_object(MINIO_BUCKET, object_name)
+        except:
+            pass
         raise HTTPException(
             status_code=500,
             detail=f"Error uploading video: {str(e)}"
         )
 
+@router.post("/", response_model=Video)
+async def upload_video(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+) -> Video:
+    """Upload a video file"""
+    # Validate file type
+    validate_video_file(file)
+    
+    # Probe the container before anything is stored
+    content, metadata = await probe_chunks(_upload_file_chunks(file))
+    
+    return store_video(db, background_tasks, file.filename, file.content_type, content, metadata)
+
+@router.post("/stream", response_model=Video)
+async def upload_video_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(..., description="Original file name of the video"),
+    db: Session = Depends(get_db)
+) -> Video:
+    """
+    Upload a video as the raw request body.
+    Unlike multipart uploads the body is probed while it streams in, so
+    oversized, overlong or unsupported videos are rejected before the rest of
+    the body is received.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    validate_content_type(content_type)
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum size of {MAX_UPLOAD_BYTES} bytes"
+        )
+    
+    content, metadata = await probe_chunks(request.stream())
+    
+    return store_video(db, background_tasks, Path(filename).name, content_type, content, metadata)
+
+def presign_derived_media(minio_client, video) -> dict:
+    """Generate presigned URLs for the thumbnail and proxy of a video, if present"""
+    urls = {"thumbnail_url": None, "proxy_url": None}
+    for field, object_name in (("thumbnail_url", video.thumbnail_object), ("proxy_url", video.proxy_object)):
+        if object_name:
+            try:
+                urls[field] = minio_client.presigned_get_object(
+                    video.bucket,
+                    object_name,
+                    expires=timedelta(days=7)
+                )
+            except Exception as e:
+                logger.error(f"Error generating presigned URL: {str(e)}")
+    return urls
+
 @router.get("/{video_id}", response_model=Video)
 def get_video(video_id: str, db: Session = Depends(get_db)) -> Video:
     """Get video by ID"""
@@ -109,7 +217,7 @@ def get_video(video_id: str, db: Session = Depends(get_db)) -> Video:
             db_video.object_name,
             expires=timedelta(days=7)
         )
-        return {**db_video.__dict__, "video_url": video_url}
+        return {**db_video.__dict__, "video_url": video_url, **presign_derived_media(minio_client, db_video)}
     except Exception as e:
         logger.error(f"Error generating presigned URL: {str(e)}")
         return db_video
@@ -135,11 +243,50 @@ def list_videos(
                 )
             except:
                 video.video_url = None
+            for field, url in presign_derived_media(minio_client, video).items():
+                setattr(video, field, url)
     except Exception as e:
         logger.error(f"Error generating presigned URLs: {str(e)}")
     
     return videos
 
+def stored_objects(video) -> List[str]:
+    """The original and derived media objects of a video"""
+    return [name for name in (video.object_name, video.thumbnail_object, video.proxy_object) if name]
+
+@router.post("/bulk-delete", response_model=VideoBulkDeleteResult)
+def bulk_delete_videos(request: VideoBulkDelete, db: Session = Depends(get_db)) -> VideoBulkDeleteResult:
+    """
+    Delete several videos at once: their objects are removed with MinIO
+    multi-object deletes, one per bucket, and their rows with one statement.
+    Analyses left without a video are cleaned up by the storage GC.
+    """
+    video_ids = list(dict.fromkeys(request.video_ids))
+    videos = video_crud.get_videos(db, video_ids)
+    found = {video.id for video in videos}
+    
+    objects = defaultdict(list)
+    for video in videos:
+        objects[video.bucket].extend(stored_objects(video))
+    
+    try:
+        minio_client = get_minio_client()
+        failed = []
+        for bucket, object_names in objects.items():
+            failed.extend(remove_objects(minio_client, bucket, object_names))
+        deleted = video_crud.delete_videos(db, list(found))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting videos: {str(e)}"
+        )
+    
+    return VideoBulkDeleteResult(
+        deleted=deleted,
+        not_found=[video_id for video_id in video_ids if video_id not in found],
+        failed_objects=failed
+    )
+
 @router.delete("/{video_id}")
 def delete_video(video_id: str, db: Session = Depends(get_db)):
     """Delete a video"""
@@ -150,7 +297,7 @@ def delete_video(video_id: str, db: Session = Depends(get_db)):
     try:
         # Delete from MinIO
         minio_client = get_minio_client()
-        minio_client.remove_object(db_video.bucket, db_video.object_name)
+        remove_objects(minio_client, db_video.bucket, stored_objects(db_video))
         
         # Delete from database
         video_crud.delete_video(db, video_id)
@@ -1,3 +1,6 @@
 from .pose_result import PoseResult
 from .swing_input import SwingInput
-from .analysis_response import SwingAnalysisResponse
\ No newline at end of file
+from .analysis_response import SwingAnalysisResponse, AnalysisSummary, FrameRef, SessionAnalysisSummary, \
+    SimilarSwing, SimilarSwingsResponse
+from .job import AnalysisJobStatus
+from .multi_angle import MultiAngleSessionRequest, MultiAngleSessionSummary
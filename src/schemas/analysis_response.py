@@ -1,8 +1,48 @@
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 class SwingAnalysisResponse(BaseModel):
     video_hash: str
     analysis_results: dict
     feedback: str
-    annotated_frames: List[str]  # List of base64 encoded images
\ No newline at end of file
+    annotated_frames: List[str] = []  # List of base64 encoded images ("frames" output mode)
+    annotated_video_url: Optional[str] = None  # Single annotated video ("video" output mode)
+    sprite_sheet_url: Optional[str] = None
+
+class FrameRef(BaseModel):
+    index: int
+    phase: Optional[str] = None
+    url: str  # Served separately with ETag and Cache-Control headers
+    etag: str
+    image_base64: Optional[str] = None  # Only filled in with ?include=frames
+
+class AnalysisSummary(BaseModel):
+    id: str
+    video_id: str
+    video_hash: Optional[str] = None
+    created_at: datetime
+    num_frames: int
+    analysis_results: dict
+    feedback: Optional[str] = None
+    poses: dict  # Columnar keypoints, see PoseSequence.to_json
+    frames: List[FrameRef]
+    annotated_video_url: Optional[str] = None
+    sprite_sheet_url: Optional[str] = None
+
+class SessionAnalysisSummary(BaseModel):
+    video_id: str
+    swings: List[AnalysisSummary]  # One analysis per swing found, in the order they were played
+
+class SimilarSwing(BaseModel):
+    analysis_id: str
+    video_id: str
+    similarity: float  # Cosine similarity of the swing embeddings
+    distance: float  # DTW distance of the normalized keypoint sequences, lower is more similar
+    analysis_url: str
+
+class SimilarSwingsResponse(BaseModel):
+    analysis_id: str
+    results: List[SimilarSwing]
+    indexed: int  # Swings in the index at query time
+    took_ms: float
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class AnalysisJobStatus(BaseModel):
+    id: str  # Also the ID of the analysis the job stores in "single" mode
+    video_id: str
+    mode: str = "single"  # "single" or "session"
+    analysis_ids: List[str] = []  # "session" mode: one analysis per swing, filled in when the job succeeds
+    status: str  # queued, running, succeeded or failed
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    num_events: int = 0
+    events_url: str  # Server-Sent Events stream of progress and partial results
+    analysis_url: Optional[str] = None  # "single" mode, available once the job has succeeded
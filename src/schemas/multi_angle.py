@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from .analysis_response import AnalysisSummary
+
+class MultiAngleSessionRequest(BaseModel):
+    videos: Dict[str, str]  # Stored video ID per angle, e.g. {"face_on": ..., "down_the_line": ...}
+    reference: Optional[str] = None  # Angle the others are aligned to, defaults to the first one
+
+class MultiAngleSessionSummary(BaseModel):
+    session_id: str
+    reference: str
+    offsets: Dict[str, float]  # Seconds; time t in the reference video is t + offset in each angle's video
+    window: List[float]  # Swing window in seconds on the reference video's clock
+    analyses: Dict[str, AnalysisSummary]  # One analysis per angle that succeeded
+    errors: Dict[str, str] = {}  # Angles that failed, with the reason
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class VideoBase(BaseModel):
     filename: str
@@ -8,6 +8,13 @@ class VideoBase(BaseModel):
     size: int
     bucket: str
     object_name: str
+    content_hash: Optional[str] = None
+    duration: Optional[float] = None
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    codec: Optional[str] = None
+    rotation: Optional[int] = None
 
 class VideoCreate(VideoBase):
     id: str
@@ -17,6 +24,17 @@ class Video(VideoBase):
     created_at: datetime
     updated_at: datetime
     video_url: Optional[str] = None
+    thumbnail_object: Optional[str] = None
+    proxy_object: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    proxy_url: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class VideoBulkDelete(BaseModel):
+    video_ids: List[str]
+
+class VideoBulkDeleteResult(BaseModel):
+    deleted: int
+    not_found: List[str] = []
+    failed_objects: List[str] = []  # Left for the storage GC to retry
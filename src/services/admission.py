@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional
+from src.config import ADMISSION_ENABLED, ADMISSION_MAX_CONCURRENT, ADMISSION_MEMORY_BUDGET_BYTES, \
+    ADMISSION_CPU_BUDGET_SECONDS, ADMISSION_MAX_QUEUED, ADMISSION_QUEUE_TIMEOUT, ADMISSION_DOWNGRADE, \
+    ADMISSION_DOWNGRADE_FRAME_BUDGET, ADMISSION_DOWNGRADE_SAMPLING_FPS, ADMISSION_DOWNGRADE_KEYFRAME_INTERVAL, \
+    ADMISSION_BASE_MEMORY_BYTES, ADMISSION_DECODE_SECONDS_PER_MEGAPIXEL, ADMISSION_MODEL_SECONDS_PER_FRAME, \
+    FRAME_SAMPLING, FRAME_BUDGET, UNIFORM_SAMPLING_FPS, WORKING_SHORT_SIDE, WORKING_LONG_SIDE, POSE_BATCH_SIZE, \
+    POSE_KEYFRAME_INTERVAL, logger
+import math
+import threading
+import time
+
+FRAME_COPIES = 2  # Decoded frame and annotated image held per sampled frame
+REMOTE_CALLS_PER_SWING = 2  # Swing validation and feedback, besides one CLIP call per annotated frame
+
+class AnalysisCost(NamedTuple):
+    frames: int  # Sampled frames analysed
+    memory_bytes: int  # Peak working memory
+    cpu_seconds: float  # Decoding plus local model time
+    model_calls: int  # Batched detector and pose model calls
+    remote_calls: int  # Swing validation, per-frame CLIP and feedback API calls
+
+class AnalysisTier(NamedTuple):
+    name: str  # "full" or "reduced"
+    cost: AnalysisCost
+    overrides: dict  # Pipeline metadata applied on top of the stage defaults
+
+class AdmissionRejected(Exception):
+    """The analysis could not be admitted within the queue limits."""
+
+def estimate_cost(video, frame_budget: int = FRAME_BUDGET, sampling_fps: float = UNIFORM_SAMPLING_FPS,
+                  keyframe_interval: int = POSE_KEYFRAME_INTERVAL, sampling: str = FRAME_SAMPLING,
+                  swings: int = 1) -> AnalysisCost:
+    """
+    Estimate what analysing a stored video costs from its probed metadata.
+
+    Motion energy decodes every source frame, so decoding scales with the
+    clip's length and source resolution. Sampled frames are held at the
+    working resolution, a few copies each, and the pose models run on every
+    `keyframe_interval`th of them. Videos probed before duration and size were
+    recorded count as a 10 second 1080p30 clip.
+
+    Range sessions pass the number of swings analysed at once as `swings`;
+    sampling, memory and model work scale with it, decoding for motion does not.
+    """
+    from src.utils.preprocessing import working_size
+
+    duration = video.duration or 10.0
+    fps = video.fps or 30.0
+    width, height = video.width or 1920, video.height or 1080
+    source_frames = int(math.ceil(duration * fps))
+    if sampling == "uniform":
+        frames = max(1, int(duration * sampling_fps))
+    else:
+        frames = max(1, min(frame_budget, source_frames))
+    work_width, work_height = working_size(width, height, WORKING_SHORT_SIDE, WORKING_LONG_SIDE)
+    work_pixels = work_width * work_height
+
+    memory = (ADMISSION_BASE_MEMORY_BYTES
+              + swings * frames * work_pixels * 3 * FRAME_COPIES
+              # Normalized float32 batch shared by the detector and the pose model
+              + swings * min(frames, POSE_BATCH_SIZE) * work_pixels * 3 * 4)
+    remote_calls = swings * (frames + REMOTE_CALLS_PER_SWING)
+    frames *= swings
+    keyframes = int(math.ceil(frames / max(1, keyframe_interval)))
+    cpu = ((source_frames + frames) * width * height / 1e6 * ADMISSION_DECODE_SECONDS_PER_MEGAPIXEL
+           + keyframes * ADMISSION_MODEL_SECONDS_PER_FRAME)
+    return AnalysisCost(
+        frames=frames,
+        memory_bytes=int(memory),
+        cpu_seconds=round(cpu, 2),
+        model_calls=2 * int(math.ceil(keyframes / POSE_BATCH_SIZE)),
+        remote_calls=remote_calls
+    )
+
+def analysis_tiers(video, downgrade: bool = ADMISSION_DOWNGRADE, swings: int = 1) -> List[AnalysisTier]:
+    """The ways a video can be analysed, most thorough first."""
+    tiers = [AnalysisTier("full", estimate_cost(video, swings=swings), {})]
+    if downgrade:
+        overrides = {
+            "frame_budget": min(FRAME_BUDGET, ADMISSION_DOWNGRADE_FRAME_BUDGET),
+            "sampling_fps": min(UNIFORM_SAMPLING_FPS, ADMISSION_DOWNGRADE_SAMPLING_FPS),
+            "keyframe_interval": max(POSE_KEYFRAME_INTERVAL, ADMISSION_DOWNGRADE_KEYFRAME_INTERVAL),
+        }
+        tiers.append(AnalysisTier("reduced", estimate_cost(video, swings=swings, **overrides), overrides))
+    return tiers
+
+class AdmissionController:
+    """
+    Admits analyses against budgets for concurrency, memory and CPU work in
+    flight.
+
+    An analysis arriving under pressure takes the first tier that fits the
+    remaining budget, so it is downgraded before it has to wait. If no tier
+    fits, it queues in arrival order for up to `queue_timeout` seconds; only
+    the head of the queue is admitted, so large analyses are not starved by
+    small ones. An analysis too large for the budgets on its own is admitted
+    at its cheapest tier once nothing else is running.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 memory_budget: int = ADMISSION_MEMORY_BUDGET_BYTES,
+                 cpu_budget: float = ADMISSION_CPU_BUDGET_SECONDS, max_queued: int = ADMISSION_MAX_QUEUED,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, enabled: bool = ADMISSION_ENABLED):
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget
+        self.cpu_budget = cpu_budget
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self._condition = threading.Condition()
+        self._queue: List[object] = []
+        self._running = 0
+        self._memory = 0
+        self._cpu = 0.0
+        self._remote_calls = 0
+        self._counts = {"admitted": 0, "downgraded": 0, "waited": 0, "rejected": 0}
+
+    def _fits(self, cost: AnalysisCost) -> bool:
+        return (self._running < self.max_concurrent
+                and self._memory + cost.memory_bytes <= self.memory_budget
+                and self._cpu + cost.cpu_seconds <= self.cpu_budget)
+
+    def _choose(self, tiers: List[AnalysisTier]) -> Optional[AnalysisTier]:
+        for tier in tiers:
+            if self._fits(tier.cost):
+                return tier
+        if self._running == 0:
+            return tiers[-1]
+        return None
+
+    def full(self) -> bool:
+        """Whether the queue is at its limit, so a new analysis would be rejected if it can't start."""
+        with self._condition:
+            return self.enabled and len(self._queue) >= self.max_queued
+
+    @contextmanager
+    def admit(self, tiers: List[AnalysisTier], on_admitted=None) -> Iterator[AnalysisTier]:
+        """
+        Hold budget for one analysis while the block runs.
+        Args:
+            tiers: Candidate tiers, most thorough first, see analysis_tiers
+            on_admitted: Called with the chosen tier and the seconds spent queued
+        Raises AdmissionRejected when the queue is full or the wait times out.
+        """
+        if not self.enabled:
+            yield tiers[0]
+            return
+
+        token = object()
+        started = time.monotonic()
+        with self._condition:
+            tier = self._choose(tiers) if not self._queue else None
+            if tier is None:
+                if len(self._queue) >= self.max_queued:
+                    self._counts["rejected"] += 1
+                    raise AdmissionRejected(f"Analysis queue is full ({self.max_queued} waiting)")
+                self._counts["waited"] += 1
+                self._queue.append(token)
+                try:
+                    while tier is None:
+                        if self._queue[0] is token:
+                            tier = self._choose(tiers)
+                            if tier is not None:
+                                break
+                        remaining = started + self.queue_timeout - time.monotonic()
+                        if remaining <= 0:
+                            self._counts["rejected"] += 1
+                            raise AdmissionRejected(f"No capacity for the analysis within {self.queue_timeout:g}s")
+                        self._condition.wait(remaining)
+                finally:
+                    self._queue.remove(token)
+                    # The next analysis in line may fit now
+                    self._condition.notify_all()
+            self._running += 1
+            self._memory += tier.cost.memory_bytes
+            self._cpu += tier.cost.cpu_seconds
+            self._remote_calls += tier.cost.remote_calls
+            self._counts["admitted"] += 1
+            if tier is not tiers[0]:
+                self._counts["downgraded"] += 1
+
+        waited = time.monotonic() - started
+        if tier is not tiers[0]:
+            logger.info(f"Analysis downgraded to the {tier.name} tier under load")
+        try:
+            if on_admitted is not None:
+                on_admitted(tier, waited)
+            yield tier
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._memory -= tier.cost.memory_bytes
+                self._cpu -= tier.cost.cpu_seconds
+                self._remote_calls -= tier.cost.remote_calls
+                self._condition.notify_all()
+
+    def usage(self) -> dict:
+        """Budget in use, queue length and admission counts since startup."""
+        with self._condition:
+            return {
+                "enabled": self.enabled,
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "memory_bytes": self._memory,
+                "memory_budget_bytes": self.memory_budget,
+                "cpu_seconds": round(max(0.0, self._cpu), 2),
+                "cpu_budget_seconds": self.cpu_budget,
+                "remote_calls": self._remote_calls,
+                "queued": len(self._queue),
+                "max_queued": self.max_queued,
+                **self._counts,
+            }
+
+admission = AdmissionController()
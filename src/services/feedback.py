@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterator, Optional
+from src.config import FEEDBACK_CACHE_SIZE, FEEDBACK_CACHE_TTL, FEEDBACK_MODEL, logger
+import hashlib
+import json
+import os
+import threading
+import time
+
+FEEDBACK_PROMPT = """As a friendly golf instructor having a one-on-one session with your student, provide encouraging feedback on their swing. Write in a natural, conversational tone as if you're speaking directly to them:
+
+Start with a warm greeting and highlight what they're doing well. Focus on their natural strengths and how these will help their game. Be specific with your praise.
+
+Then, gently transition into a couple of helpful adjustments they can make. Explain these in simple terms, using relatable "feel cues" that make sense. Help them understand how these changes will improve their game.
+
+Finally, share two fun practice drills they can try. For each drill:
+- Explain why you chose it and how it helps
+- Walk them through the setup and steps
+- Share what success feels like
+- Offer ways to make it easier or more challenging
+- Give them clear signs of progress to look for
+
+Here's what I noticed in their swing:\n\n"""
+
+FEEDBACK_PROMPT_END = "\nWrite as if you're having a friendly conversation at the driving range. Keep the tone warm and encouraging, while making sure they have all the details they need to improve. Make them feel excited about practicing these changes!"
+
+GENERATION_PARAMETERS = {
+    "max_new_tokens": 750,
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "do_sample": True,
+}
+
+FEEDBACK_UNAVAILABLE = "Unable to generate detailed feedback at this time. Please try again."
+
+def feedback_fingerprint(clip_analysis: dict) -> Optional[str]:
+    """
+    Fingerprint the parts of a CLIP analysis the feedback prompt is built from.
+    Scores and confidences are left out and phases and descriptions are
+    sorted, so swings with the same strengths/opportunities profile share a
+    fingerprint. Returns None when there is nothing to give feedback on.
+    """
+    profile = []
+    for phase_name in sorted(clip_analysis):
+        phase_data = clip_analysis[phase_name] or {}
+        strengths = sorted(s.strip().lower() for s in phase_data.get('strengths', []))
+        improvements = sorted(s.strip().lower() for s in phase_data.get('areas_for_improvement', []))
+        if strengths or improvements:
+            profile.append([phase_name, strengths, improvements])
+    if not profile:
+        return None
+    return hashlib.sha256(json.dumps(profile, separators=(",", ":")).encode()).hexdigest()
+
+def build_prompt(clip_analysis: dict) -> str:
+    """Build the instructor prompt from the strengths and opportunities of each phase."""
+    prompt = FEEDBACK_PROMPT
+    for phase_name, phase_data in clip_analysis.items():
+        strengths = phase_data.get('strengths', [])
+        improvements = phase_data.get('areas_for_improvement', [])
+        
+        if strengths or improvements:
+            prompt += f"{phase_name}:\n"
+            if strengths:
+                prompt += f"Strengths: {', '.join(strengths)}\n"
+            if improvements:
+                prompt += f"Opportunities: {', '.join(improvements)}\n"
+            prompt += "\n"
+    return prompt + FEEDBACK_PROMPT_END
+
+def clean_feedback(text: str) -> str:
+    text = text.replace('\\n', '\n')  # Convert escaped newlines
+    return text.replace('\\', '')     # Remove other escape chars
+
+class FeedbackCache:
+    """Thread-safe LRU cache of generated feedback with a time to live."""
+
+    def __init__(self, max_size: int = FEEDBACK_CACHE_SIZE, ttl: float = FEEDBACK_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Optional[str], feedback: str) -> None:
+        if key is None or not feedback:
+            return
+        with self._lock:
+            self._entries[key] = (feedback, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+feedback_cache = FeedbackCache()
+
+class FeedbackGenerator:
+    """
+    Generates coaching feedback with an LLM on the Hugging Face Inference API.
+    Text is streamed token by token and cached per swing profile, so repeated
+    profiles never reach the model.
+    """
+
+    def __init__(self, model: str = FEEDBACK_MODEL, cache: FeedbackCache = feedback_cache):
+        from huggingface_hub import InferenceClient
+        
+        self.api_token = os.getenv('HF_TOKEN')
+        if not self.api_token:
+            raise ValueError("Please set the HF_TOKEN environment variable")
+            
+        self.client = InferenceClient(token=self.api_token)
+        self.model = model
+        self.cache = cache
+
+    def cached(self, clip_analysis: dict) -> Optional[str]:
+        return self.cache.get(feedback_fingerprint(clip_analysis))
+
+    def stream(self, clip_analysis: dict, lookup: bool = True) -> Iterator[str]:
+        """
+        Yield the feedback in pieces as it is generated.
+        A cached profile yields its whole text at once. Generated text is
+        cached once the model has finished.
+        Args:
+            lookup: False when the caller already missed the cache with `cached`,
+                so the request is counted once in the cache statistics
+        """
+        key = feedback_fingerprint(clip_analysis)
+        cached = self.cache.get(key) if lookup else None
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        for token in self.client.text_generation(
+            build_prompt(clip_analysis),
+            model=self.model,
+            stream=True,
+            return_full_text=False,
+            **GENERATION_PARAMETERS
+        ):
+            if not pieces:
+                token = token.lstrip()
+            token = clean_feedback(token)
+            if token:
+                pieces.append(token)
+                yield token
+
+        self.cache.put(key, "".join(pieces).strip())
+
+    def generate(self, clip_analysis: dict, lookup: bool = True) -> str:
+        """Generate the whole feedback text, from the cache when possible, see stream."""
+        try:
+            return "".join(self.stream(clip_analysis, lookup=lookup)).strip()
+        except Exception as e:
+            logger.error(f"Error generating feedback: {str(e)}")
+            return FEEDBACK_UNAVAILABLE
+
+@lru_cache
+def get_feedback_generator() -> FeedbackGenerator:
+    """Shared FeedbackGenerator, created on first use"""
+    return FeedbackGenerator()
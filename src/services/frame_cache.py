@@ -0,0 +1,109 @@
+from pathlib import Path
+from typing import NamedTuple, Optional
+from src.config import FRAME_CACHE_DIR, FRAME_CACHE_MAX_BYTES, logger
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import numpy as np
+
+class CachedFrames(NamedTuple):
+    frames: np.ndarray  # (N, H, W, 3) uint8, memory-mapped read-only
+    indices: np.ndarray  # Source frame index of each frame
+    fps: float
+    energy: np.ndarray  # Motion energy of the whole video
+
+def file_hash(path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FrameCache:
+    """
+    On-disk cache of decoded, sampled frames.
+
+    Entries are keyed by the video's content hash and the sampling parameters,
+    and hold the frames as one .npy array that is memory-mapped on read, so a
+    re-analysis maps frames in instead of decoding the video again. The total
+    size is kept under `max_bytes` by evicting the least recently used entries.
+    """
+
+    def __init__(self, root=FRAME_CACHE_DIR, max_bytes: int = FRAME_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(video_hash: str, **params) -> str:
+        payload = json.dumps({"video": video_hash, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def get(self, key: str) -> Optional[CachedFrames]:
+        entry = self.root / key
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            frames = np.load(entry / "frames.npy", mmap_mode="r")
+            energy = np.load(entry / "energy.npy")
+            # Mark as recently used for eviction
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return CachedFrames(frames, np.asarray(meta["indices"], dtype=np.int64), meta["fps"], energy)
+
+    def put(self, key: str, frames, indices, fps: float, energy) -> None:
+        """Store frames of identical shape. Failures are logged, never raised."""
+        if not len(frames):
+            return
+        try:
+            stacked = np.stack(frames)
+        except ValueError:
+            logger.warning(f"Frames of entry {key} differ in shape, not caching them")
+            return
+        if stacked.nbytes > self.max_bytes:
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{key}.{uuid.uuid4().hex}"
+        try:
+            tmp.mkdir()
+            np.save(tmp / "frames.npy", stacked)
+            np.save(tmp / "energy.npy", np.asarray(energy, dtype=np.float32))
+            (tmp / "meta.json").write_text(json.dumps({
+                "indices": [int(i) for i in indices],
+                "fps": float(fps),
+                "shape": list(stacked.shape)
+            }))
+            with self._lock:
+                try:
+                    tmp.rename(self.root / key)
+                except OSError:
+                    # Another worker stored the same entry first
+                    shutil.rmtree(tmp, ignore_errors=True)
+                self._evict()
+        except OSError as e:
+            logger.error(f"Error writing frame cache entry {key}: {str(e)}")
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+            total += size
+        # Least recently used first
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Readers holding a memory map keep their data until they close it
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+frame_cache = FrameCache()
@@ -0,0 +1,42 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from src.config import MINIO_BUCKET, logger
+from src.services.object_cache import object_cache
+import hashlib
+import cv2
+
+def frame_etag(analysis_id: str, frame_index: int) -> str:
+    """
+    Strong ETag for an annotated frame. Analyses are immutable once stored,
+    so the identifier and index fully determine the frame content.
+    """
+    digest = hashlib.sha1(f"{analysis_id}:{frame_index}".encode()).hexdigest()[:16]
+    return f'"{digest}"'
+
+@lru_cache(maxsize=512)
+def get_annotated_frame(analysis_id: str, frame_index: int, annotated_video_object: Optional[str]) -> Optional[bytes]:
+    """
+    Get one annotated frame as JPEG bytes.
+    Frames come from the annotated video in "video" output mode, or from the
+    per-frame JPEG on disk in "frames" output mode. Returns None if the frame
+    does not exist.
+    """
+    if not annotated_video_object:
+        frame_path = Path("media/frames") / analysis_id / "annotated" / f"frame_{frame_index}_annotated.jpg"
+        return frame_path.read_bytes() if frame_path.exists() else None
+
+    video_path = object_cache.local_path(MINIO_BUCKET, annotated_video_object)
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        success, frame = cap.read()
+    finally:
+        cap.release()
+
+    if not success:
+        logger.error(f"Could not read frame {frame_index} of analysis {analysis_id}")
+        return None
+
+    success, encoded = cv2.imencode(".jpg", frame)
+    return encoded.tobytes() if success else None
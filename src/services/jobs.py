@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from src.config import ANALYSIS_JOB_WORKERS, ANALYSIS_JOB_MAX_QUEUED, ANALYSIS_JOB_RETENTION, logger
+import asyncio
+import threading
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting for a worker."""
+
+class AnalysisJob:
+    """
+    A background analysis and the events it has produced so far.
+    Events are kept in order with increasing ids, so a client that reconnects
+    can resume from the last id it saw.
+    """
+
+    def __init__(self, job_id: str, video_id: str, mode: str = "single"):
+        self.id = job_id
+        self.video_id = video_id
+        self.mode = mode  # "single" stores one analysis under the job id, "session" one per swing found
+        self.analysis_ids: List[str] = []
+        self.status = "queued"  # queued, running, succeeded or failed
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self._events = []
+        self._condition = threading.Condition()
+        self._waiters = set()  # (loop, asyncio.Event) of each stream waiting for events
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def publish(self, event: str, data: dict) -> None:
+        with self._condition:
+            self._events.append((len(self._events), event, data))
+            self._notify()
+
+    def _finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._condition:
+            self.status = status
+            self.error = error
+            self.finished_at = datetime.now(timezone.utc)
+            self._notify()
+
+    def _notify(self) -> None:
+        """Wake waiting streams; called from job threads with the condition held."""
+        self._condition.notify_all()
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The stream's event loop has been closed
+                pass
+
+    async def events(self, after: int = -1, heartbeat: float = 15.0) -> AsyncIterator[Optional[Tuple[int, str, dict]]]:
+        """
+        Yield (id, event, data) for every event after the given id, waiting
+        for new ones until the job has finished. Yields None when nothing
+        happened for `heartbeat` seconds. Waiting happens on the event loop,
+        so open streams hold no threads.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        next_id = after + 1
+        with self._condition:
+            self._waiters.add(waiter)
+        try:
+            while True:
+                with self._condition:
+                    pending = self._events[next_id:]
+                    done = self.finished
+                    # Cleared together with the snapshot, so anything published after it wakes us
+                    waiter[1].clear()
+                for entry in pending:
+                    yield entry
+                next_id += len(pending)
+                if done and not pending:
+                    return
+                if pending:
+                    continue
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "video_id": self.video_id,
+            "mode": self.mode,
+            "analysis_ids": list(self.analysis_ids),
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "num_events": len(self._events),
+        }
+
+class JobRegistry:
+    """
+    Runs analysis jobs on a bounded thread pool and keeps them in memory
+    for `retention` seconds after they finish. At most `max_queued` jobs wait
+    for a worker, so a burst is turned away rather than piling up unbounded.
+    """
+
+    def __init__(self, max_workers: int = ANALYSIS_JOB_WORKERS, retention: float = ANALYSIS_JOB_RETENTION,
+                 max_queued: int = ANALYSIS_JOB_MAX_QUEUED):
+        self.retention = retention
+        self.max_queued = max_queued
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+
+    def submit(self, job_id: str, video_id: str, run: Callable[[AnalysisJob], None],
+               mode: str = "single") -> AnalysisJob:
+        """
+        Queue `run(job)`; it publishes progress on the job as it goes.
+        Raises JobQueueFull when `max_queued` jobs are already waiting.
+        """
+        job = AnalysisJob(job_id, video_id, mode)
+        with self._lock:
+            self._prune()
+            if sum(1 for queued in self._jobs.values() if queued.status == "queued") >= self.max_queued:
+                raise JobQueueFull(f"Analysis job queue is full ({self.max_queued} waiting)")
+            self._jobs[job_id] = job
+        job.publish("job_queued", {"job_id": job_id, "video_id": video_id})
+        self._executor.submit(self._run, job, run)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_count(self) -> int:
+        """Number of jobs queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _run(self, job: AnalysisJob, run: Callable[[AnalysisJob], None]) -> None:
+        job.status = "running"
+        job.publish("job_started", {"job_id": job.id})
+        try:
+            run(job)
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {str(e)}")
+            job.publish("job_failed", {"job_id": job.id, "detail": str(e)})
+            job._finish("failed", str(e))
+            return
+        job.publish("job_finished", {"job_id": job.id})
+        job._finish("succeeded")
+
+    def _prune(self) -> None:
+        now = datetime.now(timezone.utc)
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and (now - job.finished_at).total_seconds() > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+jobs = JobRegistry()
@@ -0,0 +1,49 @@
+from src.config import get_minio_client, get_session, THUMBNAIL_WIDTH, PROXY_WIDTH, PROXY_FPS, logger
+from src.crud import video as video_crud
+from src.utils.video_processing import generate_thumbnail, generate_proxy
+from pathlib import Path
+import io
+import os
+import tempfile
+
+def derive_video_media(video_id: str, bucket: str, object_name: str, content: bytes) -> None:
+    """
+    Generate a poster thumbnail and a low resolution proxy clip for an uploaded
+    video, store them in MinIO next to the original and record them on the
+    video row. Runs as a background task after the upload response is sent,
+    so failures are logged rather than raised.
+    """
+    prefix = object_name.rsplit("/", 1)[0] if "/" in object_name else video_id
+    updates = {}
+
+    try:
+        minio_client = get_minio_client()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_path = os.path.join(tmp_dir, Path(object_name).name)
+            with open(source_path, "wb") as f:
+                f.write(content)
+
+            thumbnail = generate_thumbnail(source_path, max_width=THUMBNAIL_WIDTH)
+            if thumbnail:
+                thumbnail_object = f"{prefix}/thumbnail.jpg"
+                minio_client.put_object(bucket, thumbnail_object, io.BytesIO(thumbnail), len(thumbnail), "image/jpeg")
+                updates["thumbnail_object"] = thumbnail_object
+
+            proxy = generate_proxy(source_path, os.path.join(tmp_dir, "proxy"), max_width=PROXY_WIDTH, fps=PROXY_FPS)
+            if proxy:
+                proxy_object = f"{prefix}/proxy{Path(proxy.path).suffix}"
+                minio_client.fput_object(bucket, proxy_object, proxy.path, content_type=proxy.content_type)
+                updates["proxy_object"] = proxy_object
+    except Exception as e:
+        logger.error(f"Error deriving media for video {video_id}: {str(e)}")
+
+    if not updates:
+        return
+
+    db = get_session()
+    try:
+        video_crud.update_video(db, video_id, **updates)
+    except Exception as e:
+        logger.error(f"Error recording derived media for video {video_id}: {str(e)}")
+    finally:
+        db.close()
@@ -0,0 +1,292 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from src.config import get_minio_client, OBJECT_CACHE_DIR, OBJECT_CACHE_MAX_BYTES, OBJECT_CACHE_CHUNK_SIZE, \
+    OBJECT_CACHE_WORKERS, logger
+import hashlib
+import io
+import math
+import os
+import threading
+
+class _Download:
+    """
+    An object being downloaded in ranged chunks into a preallocated .part file.
+    Readers wait on the condition for the chunks they need.
+    """
+
+    def __init__(self, bucket: str, object_name: str, path: Path, size: int, chunk_size: int):
+        self.bucket = bucket
+        self.object_name = object_name
+        self.path = path
+        self.part_path = path.with_name(path.name + ".part")
+        self.size = size
+        self.chunk_size = chunk_size
+        self.num_chunks = max(1, math.ceil(size / chunk_size))
+        self.done = [False] * self.num_chunks
+        self.remaining = self.num_chunks
+        self.error: Optional[Exception] = None
+        self.finished = False
+        self.condition = threading.Condition()
+        # Write descriptor of the .part file, shared by the chunk tasks and
+        # closed by the last one to return, so no task writes to a reused number
+        self.fd: Optional[int] = None
+        self.tasks = 0
+
+    def wait_range(self, start: int, end: int) -> None:
+        """Block until bytes [start, end) are on disk, raising if the download failed."""
+        first = start // self.chunk_size
+        last = min(self.num_chunks - 1, max(start, end - 1) // self.chunk_size)
+        with self.condition:
+            while True:
+                if self.error is not None:
+                    raise IOError(f"Download of {self.bucket}/{self.object_name} failed: {self.error}")
+                if self.finished or all(self.done[first:last + 1]):
+                    return
+                self.condition.wait()
+
+    def wait(self) -> None:
+        self.wait_range(0, self.size)
+        with self.condition:
+            while not self.finished and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise IOError(f"Download of {self.bucket}/{self.object_name} failed: {self.error}")
+
+class ObjectReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over a cached object. Reads block until
+    the bytes they need have been downloaded, so consumers can start on the
+    first chunks while the rest is still arriving.
+    """
+
+    def __init__(self, path: Path, size: int, download: Optional[_Download] = None):
+        # Opened before the .part file is renamed, so the descriptor stays valid afterwards
+        self._fd = os.open(path, os.O_RDONLY)
+        self._size = size
+        self._download = download
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = self._size + offset
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self._size - self._position)
+        if length <= 0:
+            return 0
+        if self._download is not None:
+            self._download.wait_range(self._position, self._position + length)
+        data = os.pread(self._fd, length, self._position)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+class ObjectCache:
+    """
+    Read-through disk cache of MinIO objects.
+
+    Objects are fetched with parallel ranged GETs into a preallocated file,
+    the first and last chunks first since MP4 metadata sits at either end.
+    Concurrent requests for the same object share one download. Completed
+    objects are kept up to `max_bytes` in total, evicting the least recently
+    used; objects pinned with `path()` are never evicted while in use.
+    """
+
+    def __init__(self, root=OBJECT_CACHE_DIR, max_bytes: int = OBJECT_CACHE_MAX_BYTES,
+                 chunk_size: int = OBJECT_CACHE_CHUNK_SIZE, max_workers: int = OBJECT_CACHE_WORKERS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="object-cache")
+        self._downloads: Dict[Path, _Download] = {}
+        self._pins: Dict[Path, int] = {}
+        self._lock = threading.Lock()
+
+    def _local_path(self, bucket: str, object_name: str) -> Path:
+        digest = hashlib.sha1(f"{bucket}/{object_name}".encode()).hexdigest()
+        return self.root / digest[:2] / digest / Path(object_name).name
+
+    def _start(self, bucket: str, object_name: str) -> Optional[_Download]:
+        """Return the running download of an object, starting one if needed; None if it is cached."""
+        path = self._local_path(bucket, object_name)
+        with self._lock:
+            found, download = self._lookup(path)
+        if found:
+            return download
+
+        # A network round trip, made without holding the lock
+        size = get_minio_client().stat_object(bucket, object_name).size
+        with self._lock:
+            # Another request may have started or finished the download meanwhile
+            found, download = self._lookup(path)
+            if found:
+                return download
+            download = _Download(bucket, object_name, path, size, self.chunk_size)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(download.part_path, "wb") as f:
+                f.truncate(size)
+            download.fd = os.open(download.part_path, os.O_WRONLY)
+            order = list(dict.fromkeys([0, download.num_chunks - 1] + list(range(1, download.num_chunks - 1))))
+            download.tasks = len(order)
+            self._downloads[path] = download
+
+        for index in order:
+            self._executor.submit(self._fetch_chunk, download, index)
+        return download
+
+    def _lookup(self, path: Path) -> Tuple[bool, Optional[_Download]]:
+        """
+        Whether the object is downloading or complete on disk, with its download
+        if it is still running. Called with the lock held.
+        """
+        if path in self._downloads:
+            return True, self._downloads[path]
+        if path.exists():
+            os.utime(path)  # Mark as recently used for eviction
+            return True, None
+        return False, None
+
+    def _fetch_chunk(self, download: _Download, index: int, retries: int = 3) -> None:
+        try:
+            self._fetch_chunk_data(download, index, retries)
+        finally:
+            with download.condition:
+                download.tasks -= 1
+                last = download.tasks == 0
+            if last:
+                os.close(download.fd)
+
+    def _fetch_chunk_data(self, download: _Download, index: int, retries: int) -> None:
+        offset = index * download.chunk_size
+        length = min(download.chunk_size, download.size - offset)
+        for attempt in range(retries):
+            if download.error is not None:
+                break
+            response = None
+            try:
+                if length > 0:
+                    response = get_minio_client().get_object(
+                        download.bucket, download.object_name, offset=offset, length=length
+                    )
+                    data = response.read()
+                    if len(data) != length:
+                        raise IOError(f"Short read of chunk {index}: {len(data)} of {length} bytes")
+                    os.pwrite(download.fd, data, offset)
+                break
+            except Exception as e:
+                if attempt == retries - 1:
+                    self._fail(download, e)
+                    return
+            finally:
+                if response is not None:
+                    response.close()
+                    response.release_conn()
+
+        with download.condition:
+            if download.error is not None:
+                return
+            download.done[index] = True
+            download.remaining -= 1
+            complete = download.remaining == 0
+            download.condition.notify_all()
+        if complete:
+            self._complete(download)
+
+    def _complete(self, download: _Download) -> None:
+        # Every chunk is written; the descriptor is closed once the last task returns
+        with self._lock:
+            download.part_path.replace(download.path)
+            self._downloads.pop(download.path, None)
+        with download.condition:
+            download.finished = True
+            download.condition.notify_all()
+        self._evict()
+
+    def _fail(self, download: _Download, error: Exception) -> None:
+        logger.error(f"Error downloading {download.bucket}/{download.object_name}: {str(error)}")
+        with download.condition:
+            if download.error is not None:
+                return
+            download.error = error
+            download.condition.notify_all()
+        with self._lock:
+            self._downloads.pop(download.path, None)
+            # Unlinked under the lock, before a retry can create a new .part file at the same path.
+            # Chunk tasks still running write to the unlinked file until the last one closes it
+            download.part_path.unlink(missing_ok=True)
+
+    def local_path(self, bucket: str, object_name: str) -> Path:
+        """Return the path of the complete cached object, downloading it if needed."""
+        download = self._start(bucket, object_name)
+        if download is not None:
+            download.wait()
+        return self._local_path(bucket, object_name)
+
+    @contextmanager
+    def path(self, bucket: str, object_name: str) -> Iterator[Path]:
+        """Like local_path, but the object is not evicted until the block exits."""
+        key = self._local_path(bucket, object_name)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield self.local_path(bucket, object_name)
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    def open(self, bucket: str, object_name: str) -> ObjectReader:
+        """Open an object for reading while it may still be downloading."""
+        download = self._start(bucket, object_name)
+        with self._lock:
+            # Holding the lock keeps a finishing download from renaming the .part file in between
+            if download is not None and self._downloads.get(download.path) is download:
+                return ObjectReader(download.part_path, download.size, download)
+        if download is not None and download.error is not None:
+            raise IOError(f"Download of {bucket}/{object_name} failed: {download.error}")
+        path = self._local_path(bucket, object_name)
+        return ObjectReader(path, path.stat().st_size)
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*/*"):
+                if path.name.endswith(".part") or not path.is_file():
+                    continue
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            # Least recently used first
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                # Open readers keep their data until they close it
+                path.unlink(missing_ok=True)
+                total -= size
+
+object_cache = ObjectCache()
@@ -0,0 +1,106 @@
+from src.config import Base, get_engine, get_minio_client, WARMUP_MODELS, WARMUP_RETRY_SECONDS, logger
+from typing import Callable, Dict, List, Tuple
+import threading
+import time
+
+class ReadinessState:
+    """
+    Thread-safe record of which dependencies have finished warming up.
+    Each component is "pending", "ready" or "failed".
+    """
+
+    def __init__(self, components: List[str]):
+        self._lock = threading.Lock()
+        self._components = {
+            name: {"status": "pending", "error": None, "seconds": None}
+            for name in components
+        }
+
+    def mark(self, name: str, status: str, error: str = None, seconds: float = None) -> None:
+        with self._lock:
+            self._components[name] = {"status": status, "error": error, "seconds": seconds}
+
+    def is_ready(self, name: str = None) -> bool:
+        with self._lock:
+            if name is not None:
+                return self._components.get(name, {}).get("status") == "ready"
+            return all(c["status"] == "ready" for c in self._components.values())
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(c) for name, c in self._components.items()}
+
+def _warm_database() -> None:
+    # Import models so their tables are registered on Base
+    import src.models.video  # noqa: F401
+    import src.models.analysis  # noqa: F401
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+
+def _add_missing_columns(engine) -> None:
+    """
+    create_all only creates missing tables, so columns added to a model
+    since its table was created are added here. Safe to run repeatedly.
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            logger.info(f"Adding column {table.name}.{column.name} ({column_type})")
+            with engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def _warm_storage() -> None:
+    get_minio_client()
+
+def _warm_models() -> None:
+    from src.utils.pose_processor import get_pose_processor
+    from src.utils.golf_swing_detection import get_clip_model
+    get_pose_processor()
+    get_clip_model()
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("database", _warm_database),
+    ("storage", _warm_storage),
+]
+if WARMUP_MODELS:
+    WARMUP_STEPS.append(("models", _warm_models))
+
+readiness = ReadinessState([name for name, _ in WARMUP_STEPS])
+
+def warm_up(stop_event: threading.Event) -> None:
+    """
+    Run every warm-up step, retrying failed ones with exponential backoff
+    until they succeed or the stop event is set.
+    """
+    pending = list(WARMUP_STEPS)
+    delay = WARMUP_RETRY_SECONDS
+    while pending and not stop_event.is_set():
+        failed = []
+        for name, step in pending:
+            start = time.perf_counter()
+            try:
+                step()
+                readiness.mark(name, "ready", seconds=round(time.perf_counter() - start, 3))
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {str(e)}")
+                readiness.mark(name, "failed", error=str(e)[:200])
+                failed.append((name, step))
+        pending = failed
+        if pending:
+            stop_event.wait(delay)
+            delay = min(delay * 2, 60.0)
+
+def start_warmup() -> threading.Event:
+    """Start warming up on a daemon thread. Set the returned event to stop retrying."""
+    stop_event = threading.Event()
+    threading.Thread(target=warm_up, args=(stop_event,), name="warmup", daemon=True).start()
+    return stop_event
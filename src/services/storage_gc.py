@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.config import get_minio_client, get_session, MINIO_BUCKET, GC_ENABLED, GC_INTERVAL_SECONDS, \
+    GC_LOCAL_RETENTION, GC_ORPHAN_MIN_AGE, GC_MAX_DELETES_PER_SECOND, GC_BUSY_DELETES_PER_SECOND, GC_BATCH_SIZE, \
+    OBJECT_CACHE_DIR, logger
+import shutil
+import threading
+import time
+import uuid
+
+# Local artifacts written by the pipeline
+FRAMES_DIR = Path("media/frames")
+
+class RateLimiter:
+    """Token bucket limiting deletions per second."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._allowance = rate
+        self._last = time.monotonic()
+
+    def acquire(self, count: int = 1, stop_event: threading.Event = None) -> None:
+        """Take `count` tokens, waiting while the bucket is in debt."""
+        now = time.monotonic()
+        self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+        self._last = now
+        self._allowance -= count
+        if self._allowance < 0:
+            wait = -self._allowance / self.rate
+            if stop_event is not None:
+                stop_event.wait(wait)
+            else:
+                time.sleep(wait)
+
+def _is_video_prefix(segment: str) -> bool:
+    """Uploads are stored under a random UUID per video."""
+    try:
+        uuid.UUID(segment)
+    except ValueError:
+        return False
+    return True
+
+def remove_objects(minio_client, bucket: str, object_names: Iterable[str]) -> List[str]:
+    """
+    Remove objects with MinIO's multi-object delete, up to 1000 per request.
+    Returns the names that could not be removed.
+    """
+    from minio.deleteobjects import DeleteObject
+    
+    # remove_objects is lazy, the errors have to be consumed for anything to happen
+    errors = minio_client.remove_objects(bucket, [DeleteObject(name) for name in object_names])
+    failed = []
+    for error in errors:
+        logger.error(f"Error removing {bucket}/{error.name}: {error.message}")
+        failed.append(error.name)
+    return failed
+
+class StorageGC:
+    """
+    Removes storage nobody refers to any more:
+    - analyses and pose frames of deleted videos; analyses of bucket objects
+      the backfill analysed without a video row are kept while the object exists,
+    - MinIO objects under a video (UUID) or analysis prefix whose row is gone,
+      including derived media and annotated videos; other prefixes were not
+      written by the app and are left alone,
+    - local annotated frames of analyses whose row is gone,
+    - interrupted downloads older than the retention period.
+    Deletions are rate limited, and slowed down further while analysis jobs
+    are running so GC competes as little as possible with them for I/O.
+    """
+
+    def __init__(self, bucket: str = MINIO_BUCKET, local_retention: float = GC_LOCAL_RETENTION,
+                 orphan_min_age: float = GC_ORPHAN_MIN_AGE, max_deletes_per_second: float = GC_MAX_DELETES_PER_SECOND,
+                 busy_deletes_per_second: float = GC_BUSY_DELETES_PER_SECOND, batch_size: int = GC_BATCH_SIZE):
+        self.bucket = bucket
+        self.local_retention = local_retention
+        self.orphan_min_age = orphan_min_age
+        self.batch_size = batch_size
+        self.max_deletes_per_second = max_deletes_per_second
+        self.busy_deletes_per_second = busy_deletes_per_second
+        self.limiter = RateLimiter(max_deletes_per_second)
+        self.last_report: Dict = {}
+
+    def _throttle(self, count: int, stop_event: threading.Event = None) -> None:
+        """Wait for `count` deletions, at the lower rate while analysis jobs are running."""
+        from src.services.jobs import jobs
+
+        self.limiter.rate = self.busy_deletes_per_second if jobs.active_count() else self.max_deletes_per_second
+        self.limiter.acquire(count, stop_event)
+
+    def run_once(self, stop_event: threading.Event = None) -> Dict:
+        from src.services.jobs import jobs
+
+        started = time.perf_counter()
+        busy = jobs.active_count() > 0
+        video_ids, analysis_ids = self._live_ids()
+        orphaned_objects, stored_videos = self._collect_orphaned_objects(video_ids, analysis_ids, stop_event)
+        report = {
+            "orphaned_analyses": self._collect_orphaned_analyses(stored_videos),
+            "orphaned_objects": orphaned_objects,
+            "local_artifacts": self._collect_local_artifacts(analysis_ids, stop_event),
+            "busy": busy,
+        }
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        report["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.last_report = report
+        logger.info(f"Storage GC finished: {report}")
+        return report
+
+    def _collect_orphaned_analyses(self, stored_videos: Optional[Set[str]]) -> int:
+        """Delete analyses whose video has neither a row nor an original object in the bucket."""
+        from sqlalchemy import delete
+        from src.models.analysis import Analysis, PoseFrame, SwingEmbedding
+        from src.models.video import Video
+        
+        if stored_videos is None:
+            return 0
+        db = get_session()
+        try:
+            video_ids = {row[0] for row in db.query(Video.id).all()}
+            analysed = {row[0] for row in db.query(Analysis.video_id).distinct().all()}
+            orphans = list(analysed - video_ids - stored_videos)
+            if not orphans:
+                return 0
+            result = db.execute(delete(Analysis).where(Analysis.video_id.in_(orphans)))
+            db.execute(delete(PoseFrame).where(PoseFrame.video_id.in_(orphans)))
+            db.execute(delete(SwingEmbedding).where(SwingEmbedding.video_id.in_(orphans)))
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
+    def _live_ids(self) -> Tuple[Set[str], Set[str]]:
+        """IDs of the videos and analyses that still have rows."""
+        from src.models.analysis import Analysis
+        from src.models.video import Video
+
+        db = get_session()
+        try:
+            return {row[0] for row in db.query(Video.id).all()}, {row[0] for row in db.query(Analysis.id).all()}
+        finally:
+            db.close()
+
+    def _collect_orphaned_objects(self, video_ids: Set[str], analysis_ids: Set[str],
+                                  stop_event: threading.Event = None) -> Tuple[int, Optional[Set[str]]]:
+        """
+        Delete objects under prefixes of deleted videos and analyses.
+        Returns the number removed and the first path segments that still hold
+        an original video, which backfilled analyses use as their video id, or
+        None if the pass was stopped before listing everything.
+        """
+        from src.cli.backfill import is_original_video
+
+        minio_client = get_minio_client()
+        # Uploads store the object before the row, so leave recent objects alone
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.orphan_min_age)
+        batch, removed, stored_videos = [], 0, set()
+        for obj in minio_client.list_objects(self.bucket, recursive=True):
+            if stop_event is not None and stop_event.is_set():
+                break
+            parts = obj.object_name.split("/")
+            if parts[0] == "analyses" and len(parts) > 2:
+                orphaned = parts[1] not in analysis_ids
+            elif len(parts) > 1 and _is_video_prefix(parts[0]):
+                orphaned = parts[0] not in video_ids
+            else:
+                orphaned = False
+            if not orphaned or obj.last_modified is None or obj.last_modified > cutoff:
+                if len(parts) > 1 and is_original_video(obj.object_name):
+                    stored_videos.add(parts[0])
+                continue
+            batch.append(obj.object_name)
+            if len(batch) >= self.batch_size:
+                removed += self._remove_batch(minio_client, batch, stop_event)
+                batch = []
+        if batch:
+            removed += self._remove_batch(minio_client, batch, stop_event)
+        if stop_event is not None and stop_event.is_set():
+            # The listing is incomplete, so keep every analysis this pass
+            stored_videos = None
+        return removed, stored_videos
+
+    def _remove_batch(self, minio_client, object_names: List[str], stop_event: threading.Event = None) -> int:
+        self._throttle(len(object_names), stop_event)
+        failed = remove_objects(minio_client, self.bucket, object_names)
+        return len(object_names) - len(failed)
+
+    def _collect_local_artifacts(self, analysis_ids: Set[str], stop_event: threading.Event = None) -> int:
+        now = time.time()
+        # In "frames" output mode the annotated frames are the only copy, so only
+        # frames of deleted analyses go; running analyses write theirs before the row exists
+        candidates = []
+        if FRAMES_DIR.exists():
+            candidates.extend((path, now - self.orphan_min_age) for path in FRAMES_DIR.iterdir()
+                              if path.is_dir() and path.name not in analysis_ids)
+        candidates.extend((path, now - self.local_retention) for path in Path(OBJECT_CACHE_DIR).glob("*/*/*.part"))
+        
+        removed = 0
+        for path, cutoff in candidates:
+            if stop_event is not None and stop_event.is_set():
+                break
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                self._throttle(1, stop_event)
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+                removed += 1
+            except OSError as e:
+                logger.error(f"Error removing {path}: {str(e)}")
+        return removed
+
+storage_gc = StorageGC()
+
+def run_storage_gc(stop_event: threading.Event, interval: float = GC_INTERVAL_SECONDS) -> None:
+    """Run GC passes every `interval` seconds until the stop event is set."""
+    while not stop_event.wait(interval):
+        try:
+            storage_gc.run_once(stop_event)
+        except Exception as e:
+            logger.error(f"Storage GC failed: {str(e)}")
+
+def start_storage_gc() -> threading.Event:
+    """Start the GC loop on a daemon thread, if enabled. Set the returned event to stop it."""
+    stop_event = threading.Event()
+    if GC_ENABLED:
+        threading.Thread(target=run_storage_gc, args=(stop_event,), name="storage-gc", daemon=True).start()
+    return stop_event
@@ -0,0 +1,180 @@
+from typing import Iterable, List, NamedTuple, Optional
+from src.config import SIMILARITY_CANDIDATES, SIMILARITY_DTW_WINDOW, SIMILARITY_REFRESH_SECONDS, logger
+from src.utils.swing_embedding import BODY_KEYPOINTS, EMBEDDING_DIM, SEQUENCE_LENGTH, dtw_distances
+import threading
+import time
+import numpy as np
+
+class SimilarSwing(NamedTuple):
+    analysis_id: str
+    video_id: str
+    similarity: float  # Cosine similarity of the embeddings
+    distance: float  # DTW distance of the normalized sequences, lower is more similar
+
+class SwingIndex:
+    """
+    In-memory nearest-neighbour index over the swing_embeddings table.
+
+    Embeddings are unit length and kept in one contiguous float32 matrix, so a
+    query is a single matrix-vector product followed by a partial sort; at
+    416 dimensions that stays in the low milliseconds for hundreds of
+    thousands of swings. Only the best `candidates` are then fetched with
+    their full normalized sequences and re-ranked with DTW.
+
+    The matrix is loaded from the database on first use and topped up with
+    rows created by other processes every `refresh_seconds`. Swings deleted
+    elsewhere are dropped when a query no longer finds their sequence.
+    """
+
+    def __init__(self, session_factory=None, candidates: int = SIMILARITY_CANDIDATES,
+                 dtw_window: float = SIMILARITY_DTW_WINDOW, refresh_seconds: float = SIMILARITY_REFRESH_SECONDS):
+        if session_factory is None:
+            from src.config import get_session
+            session_factory = get_session
+        self.session_factory = session_factory
+        self.candidates = candidates
+        self.dtw_window = dtw_window
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._count = 0
+        self._ids: List[str] = []
+        self._video_ids: List[str] = []
+        self._rows = {}  # analysis_id -> row in _vectors
+        self._loaded_until = None  # created_at of the newest row read from the database
+        self._refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _append(self, analysis_id: str, video_id: str, embedding) -> None:
+        if analysis_id in self._rows:
+            self._vectors[self._rows[analysis_id]] = embedding
+            return
+        if self._count == len(self._vectors):
+            # Grow geometrically so appends are amortized O(1)
+            grown = np.zeros((max(1024, 2 * len(self._vectors)), EMBEDDING_DIM), dtype=np.float32)
+            grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+        self._vectors[self._count] = embedding
+        self._rows[analysis_id] = self._count
+        self._ids.append(analysis_id)
+        self._video_ids.append(video_id)
+        self._count += 1
+
+    def add(self, analysis_id: str, video_id: str, embedding) -> None:
+        with self._lock:
+            self._append(analysis_id, video_id, np.asarray(embedding, dtype=np.float32))
+
+    def remove(self, analysis_ids: Iterable[str]) -> None:
+        """Drop swings by moving the last row into each freed slot."""
+        with self._lock:
+            for analysis_id in analysis_ids:
+                row = self._rows.pop(analysis_id, None)
+                if row is None:
+                    continue
+                last = self._count - 1
+                if row != last:
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = self._ids[last]
+                    self._video_ids[row] = self._video_ids[last]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._video_ids.pop()
+                self._count = last
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Read embeddings created since the last refresh.
+
+        The database is paged without holding the index lock, so adds and
+        searches carry on meanwhile; only one refresh runs at a time.
+        """
+        from src.crud import analysis as analysis_crud
+
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        # Another refresh is already reading the table; wait for it only on the first load
+        if not self._refresh_lock.acquire(blocking=force or not self._refreshed_at):
+            return
+        try:
+            if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return
+            loaded, since = [], self._loaded_until
+            newest = since
+            db = self.session_factory()
+            try:
+                skip, page_size = 0, 10000
+                while True:
+                    rows = analysis_crud.list_swing_embeddings(db, since=since, skip=skip, limit=page_size)
+                    for row in rows:
+                        if row.embedding and len(row.embedding) == EMBEDDING_DIM:
+                            loaded.append((row.analysis_id, row.video_id, np.asarray(row.embedding, dtype=np.float32)))
+                    if rows:
+                        # The last page is empty when the row count is a multiple of the page size
+                        newest = rows[-1].created_at
+                    if len(rows) < page_size:
+                        break
+                    skip += page_size
+            finally:
+                db.close()
+            with self._lock:
+                for analysis_id, video_id, embedding in loaded:
+                    self._append(analysis_id, video_id, embedding)
+                self._loaded_until = newest
+                count = self._count
+            self._refreshed_at = time.monotonic()
+            if loaded:
+                logger.info(f"Swing index loaded {len(loaded)} embeddings, {count} in total")
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, embedding, sequence, limit: int = 10, exclude: Optional[Iterable[str]] = None) -> List[SimilarSwing]:
+        """
+        Find the swings most similar to a query swing.
+        Args:
+            embedding: Unit-length query embedding, see embed_sequence
+            sequence: Normalized query sequence for DTW re-ranking, see normalize_pose_sequence
+            limit: Number of swings returned
+            exclude: Analysis ids left out, e.g. the query swing itself
+        Returns swings ordered by DTW distance.
+        """
+        from src.crud import analysis as analysis_crud
+
+        self.refresh()
+        exclude = set(exclude or ())
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return []
+            scores = self._vectors[:count] @ np.asarray(embedding, dtype=np.float32)
+            wanted = min(count, max(limit, self.candidates) + len(exclude))
+            top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < count else np.arange(count)
+            candidates = [(self._ids[i], self._video_ids[i], float(scores[i]))
+                          for i in top[np.argsort(-scores[top])] if self._ids[i] not in exclude]
+        candidates = candidates[:max(limit, self.candidates)]
+
+        db = self.session_factory()
+        try:
+            stored = analysis_crud.get_swing_sequences(db, [analysis_id for analysis_id, _, _ in candidates])
+        finally:
+            db.close()
+        missing = [analysis_id for analysis_id, _, _ in candidates if not stored.get(analysis_id)]
+        if missing:
+            self.remove(missing)
+            candidates = [candidate for candidate in candidates if candidate[0] not in missing]
+        if not candidates:
+            return []
+
+        shape = (SEQUENCE_LENGTH, len(BODY_KEYPOINTS), 2)
+        sequences = np.stack([np.asarray(stored[analysis_id], dtype=np.float32).reshape(shape)
+                              for analysis_id, _, _ in candidates])
+        distances = dtw_distances(np.asarray(sequence, dtype=np.float32).reshape(shape), sequences, self.dtw_window)
+        order = np.argsort(distances)[:limit]
+        return [
+            SimilarSwing(candidates[i][0], candidates[i][1], round(candidates[i][2], 4), round(float(distances[i]), 4))
+            for i in order
+        ]
+
+swing_index = SwingIndex()
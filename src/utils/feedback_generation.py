@@ -1,3 +1,233 @@
-def generate_feedback(analysis_results):
-    feedback = ""
-    return feedback
\ No newline at end of file
+from typing import Dict, List, NamedTuple
+
+class Drill(NamedTuple):
+    name: str
+    purpose: str
+    steps: str
+    feel: str
+    easier: str
+    harder: str
+    progress: str
+
+class Fault(NamedTuple):
+    cue: str  # Feel cue for the adjustment
+    why: str  # How fixing it helps
+    drill: str  # Key into DRILLS
+
+DRILLS: Dict[str, Drill] = {
+    "posture": Drill(
+        "Club Across the Hips",
+        "it teaches you to hinge from the hips instead of bending your back",
+        "Hold a club against your hip crease, push your hips back until your chest covers the ball, then let your arms hang and flex your knees slightly.",
+        "your weight settles over the balls of your feet and your back feels long and flat",
+        "do it in front of a mirror first",
+        "hit half shots straight after setting up this way",
+        "you can set up the same way ten times in a row without checking the mirror",
+    ),
+    "takeaway": Drill(
+        "Low and Slow Tee",
+        "it gets the club, arms and chest moving back together",
+        "Put a tee in the ground a foot behind the ball on your target line and sweep it away with the clubhead on the first part of your backswing.",
+        "the triangle of your arms and chest turns as one piece",
+        "practise without a ball, just brushing the tee",
+        "place the tee two feet back and keep brushing it",
+        "the tee goes straight back along the line every time",
+    ),
+    "turn": Drill(
+        "Chair Turn",
+        "it keeps your turn centred instead of sliding off the ball",
+        "Stand with a chair touching the outside of your trail hip and make backswings without pushing the chair.",
+        "you turn around your trail hip rather than into it",
+        "cross your arms over your chest and just turn",
+        "make full swings with a short iron against the chair",
+        "the chair stays put through a full bucket of practice swings",
+    ),
+    "top": Drill(
+        "Pause at the Top",
+        "it teaches you where a complete, connected backswing ends",
+        "Swing to the top, hold it for two seconds and check your lead arm and club, then swing through.",
+        "your back faces the target and your lead arm stays comfortably straight",
+        "check the position in a mirror without a ball",
+        "hit three-quarter shots with the pause",
+        "your pause position looks the same every time and the ball still flies solid",
+    ),
+    "transition": Drill(
+        "Step Through",
+        "it trains the lower body to start the downswing",
+        "Start with your feet together, step toward the target with your lead foot as you finish the backswing, then swing through.",
+        "the step pulls the arms down rather than the arms throwing the club",
+        "do it slowly without a ball",
+        "hit balls off a tee with the step",
+        "you strike the ball cleanly without rushing the step",
+    ),
+    "impact": Drill(
+        "Towel Behind the Ball",
+        "it rewards hitting down with the hands ahead",
+        "Lay a towel a hand's width behind the ball and hit shots without touching it.",
+        "your hands lead the clubhead and the shaft leans toward the target at impact",
+        "move the towel further back",
+        "move the towel closer to the ball",
+        "you miss the towel and take a divot after the ball",
+    ),
+    "weight_shift": Drill(
+        "Lead Foot Finish",
+        "it makes you move your weight onto the lead side",
+        "Hit easy shots and hold the finish with your trail foot up on its toe for three seconds.",
+        "your belt buckle faces the target and nearly all your weight is on the lead foot",
+        "hit half shots first",
+        "lift your trail foot off the ground completely at the finish",
+        "you can hold every finish without wobbling",
+    ),
+    "extension": Drill(
+        "Hit the Second Tee",
+        "it trains the arms to extend through the ball",
+        "Put a second tee a foot in front of the ball on your target line and try to clip it after impact.",
+        "your arms stretch out toward the target after the ball is gone",
+        "use a driver tee set high",
+        "use a tee pushed nearly into the ground",
+        "you clip the second tee with most swings",
+    ),
+    "balance": Drill(
+        "Feet Together",
+        "it teaches you to swing at a speed you can control",
+        "Hit shots with your feet together and hold the finish until the ball lands.",
+        "the swing feels smooth and you stay centred over your feet",
+        "hit half shots",
+        "make full swings with a mid iron",
+        "you hold every finish and the ball still goes straight",
+    ),
+    "tempo": Drill(
+        "Count to Three",
+        "it settles the rhythm between backswing and downswing",
+        "Say 'one-two' during the backswing and 'three' at impact on every practice swing.",
+        "the backswing is unhurried and the speed builds on the way down",
+        "count out loud with no ball",
+        "keep the count on full shots with a driver",
+        "your swings sound the same every time",
+    ),
+}
+
+# Ordered list of (keyword in the CLIP description, fault); the first match wins
+FAULTS: List[tuple] = [
+    ("poor posture", Fault("feel tall through your spine and hinge from your hips", "a better posture gives your arms room to swing", "posture")),
+    ("knees too straight", Fault("soften your knees like you're about to catch a ball", "flexed knees give your turn a stable base", "posture")),
+    ("toes or heels", Fault("feel your weight over the balls of your feet", "a centred balance keeps your strike consistent", "posture")),
+    ("lifting club", Fault("push the club back with your chest, not your hands", "a wider takeaway adds width and power", "takeaway")),
+    ("breaking wrists", Fault("keep the wrists quiet until the hands pass your trail leg", "a later wrist set keeps the club on plane", "takeaway")),
+    ("too far inside", Fault("feel the clubhead stay outside your hands going back", "an on-plane takeaway means fewer compensations later", "takeaway")),
+    ("lifting arms", Fault("turn your chest away instead of lifting your arms", "turning stores more power than lifting", "turn")),
+    ("swaying", Fault("feel like you're turning inside a barrel", "staying centred makes it easier to return to the ball", "turn")),
+    ("over-rotation", Fault("stop the backswing when your back faces the target", "a compact top makes the swing easier to repeat", "top")),
+    ("collapsing left arm", Fault("keep some width between your hands and your chest", "a wider arc means more clubhead speed", "top")),
+    ("casting", Fault("let the hips start down while the wrists stay hinged", "holding the angle adds speed where it counts", "transition")),
+    ("arms leading", Fault("let your lead hip bump toward the target first", "a lower body start puts the club in the slot", "transition")),
+    ("spine angle", Fault("keep your chest over the ball until after impact", "holding your posture improves contact", "impact")),
+    ("early extension", Fault("feel your backside stay on an imaginary wall behind you", "keeping your hips back gives your arms room through impact", "impact")),
+    ("flipping", Fault("feel your hands lead the clubhead into the ball", "a forward shaft lean compresses the ball", "impact")),
+    ("hanging back", Fault("finish with your weight on your lead foot", "moving forward helps you strike the ball first", "weight_shift")),
+    ("weight on back foot", Fault("feel your lead hip move over your lead foot", "weight forward means ball-first contact", "weight_shift")),
+    ("poor weight transfer", Fault("let your trail heel come off the ground as you turn through", "a full transfer adds power and consistency", "weight_shift")),
+    ("early release", Fault("let the club release naturally after the ball", "a later release keeps the face square longer", "extension")),
+    ("stopping body rotation", Fault("keep turning your chest until it faces the target", "a continuous turn keeps the club on line", "extension")),
+    ("chicken wing", Fault("let your lead arm fold only after both arms extend", "extension keeps the clubface stable", "extension")),
+    ("incomplete", Fault("turn until your belt buckle faces the target", "a full turn lets you swing freely", "weight_shift")),
+    ("falling backward", Fault("finish tall and balanced on your lead foot", "a balanced finish means a balanced swing", "balance")),
+    ("poor balance", Fault("swing at a speed you can hold the finish at", "balance is the base of consistent contact", "balance")),
+]
+
+# Measured swing metrics, see analysis_results["metrics"]:
+# (metric key, test, finding, drill)
+METRIC_RULES = [
+    ("tempo_ratio", lambda v: v < 2.0, "your backswing is quick compared to your downswing", "tempo"),
+    ("tempo_ratio", lambda v: v > 4.5, "your backswing is slow compared to your downswing", "tempo"),
+    ("head_sway", lambda v: v > 0.25, "your head moves a lot side to side during the swing", "turn"),
+    ("spine_angle_change", lambda v: v > 15.0, "your spine angle changes quite a bit between address and impact", "impact"),
+    ("lead_arm_bend_at_top", lambda v: v > 40.0, "your lead arm bends a lot at the top", "top"),
+]
+
+GENERIC_FAULT = Fault("keep the swing smooth and balanced", "a smooth rhythm makes everything else easier", "balance")
+
+def _find_fault(description: str) -> Fault:
+    description = description.lower()
+    for keyword, fault in FAULTS:
+        if keyword in description:
+            return fault
+    return GENERIC_FAULT
+
+def _phase_label(phase_name: str) -> str:
+    """Drop the "P1:" prefix from a phase name."""
+    return phase_name.split(":", 1)[-1].strip().lower()
+
+def _render_drill(drill: Drill) -> str:
+    return (
+        f"{drill.name}: I picked this one because {drill.purpose}. {drill.steps} "
+        f"Success feels like {drill.feel}. To make it easier, {drill.easier}; "
+        f"for more of a challenge, {drill.harder}. You'll know it's working when {drill.progress}."
+    )
+
+def generate_feedback(analysis_results: dict) -> str:
+    """
+    Build coaching feedback from per-phase strengths, improvement areas and
+    measured metrics with curated templates. Deterministic and offline; the
+    same analysis always gives the same text.
+    """
+    clip_analysis = (analysis_results or {}).get('clip_analysis', {})
+    metrics = (analysis_results or {}).get('metrics', {}) or {}
+
+    strengths = []
+    adjustments = []  # (phase, description, fault)
+    for phase_name, phase_data in clip_analysis.items():
+        phase_data = phase_data or {}
+        for description in phase_data.get('strengths', [])[:1]:
+            strengths.append((_phase_label(phase_name), description))
+        for description in phase_data.get('areas_for_improvement', [])[:1]:
+            adjustments.append((_phase_label(phase_name), description, _find_fault(description)))
+
+    findings = []  # (finding, drill key)
+    for key, test, finding, drill in METRIC_RULES:
+        value = metrics.get(key)
+        if isinstance(value, (int, float)) and test(value):
+            findings.append((finding, drill))
+
+    if not strengths and not adjustments and not findings:
+        return "No swing analysis available."
+
+    parts = ["Great work getting out here and putting in the reps!"]
+
+    if strengths:
+        praise = "; ".join(f"at the {phase} you show {description}" for phase, description in strengths[:3])
+        parts.append(f"Here's what you're doing well: {praise}. Those are the building blocks of a repeatable swing, so keep them.")
+    else:
+        parts.append("Your swing has a solid foundation to build on.")
+
+    drills: List[str] = []
+    seen_cues = set()
+    tips = []
+    for phase, description, fault in adjustments:
+        if fault.cue in seen_cues:
+            continue
+        seen_cues.add(fault.cue)
+        tips.append(f"At the {phase} I noticed {description}. Try to {fault.cue}, because {fault.why}.")
+        drills.append(fault.drill)
+        if len(tips) == 2:
+            break
+    for finding, drill in findings:
+        if len(tips) >= 3:
+            break
+        tips.append(f"The measurements also show {finding}.")
+        drills.append(drill)
+    if tips:
+        parts.append("A couple of adjustments to work on: " + " ".join(tips))
+
+    # Two distinct drills, topped up with tempo and balance work
+    chosen: List[str] = []
+    for drill in drills + ["tempo", "balance"]:
+        if drill not in chosen:
+            chosen.append(drill)
+        if len(chosen) == 2:
+            break
+    parts.append("Two drills for your next practice session:")
+    parts.extend(f"{i}. {_render_drill(DRILLS[drill])}" for i, drill in enumerate(chosen, 1))
+
+    parts.append("Pick one change at a time, stay patient, and enjoy watching the ball flight improve!")
+    return "\n\n".join(parts)
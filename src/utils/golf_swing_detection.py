@@ -1,41 +1,41 @@
+from functools import lru_cache
 import cv2
-from transformers import CLIPProcessor, CLIPModel
 from PIL import Image
-import torch
 
-# Load the model and processor from Hugging Face
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
 
 
-def is_golf_swing(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-
-    # Extract a few frames to analyze
-    for _ in range(10):  # Adjust the number of frames as needed
-        success, frame = cap.read()
-        if not success:
-            break
-        # Convert frame to PIL Image
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(frame_rgb)
-        frames.append(pil_image)
-
-    cap.release()
+@lru_cache
+def get_clip_model():
+    """
+    Load the CLIP model and processor from Hugging Face on first use.
+    torch and transformers are imported here so importing this module stays cheap.
+    """
+    import torch
+    from transformers import CLIPProcessor, CLIPModel
 
     # Check if MPS is available
     if torch.backends.mps.is_available():
         device = torch.device("mps")
     else:
         device = torch.device("cpu")
-    
-    # Load the model and processor from Hugging Face
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME).to(device)
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    return model, processor, device
+
+
+def golf_swing_probabilities(images):
+    """
+    Score a batch of PIL images with CLIP.
+    Returns the probability of "a golf swing" for each image.
+    """
+    import torch
+
+    model, processor, device = get_clip_model()
 
     # Prepare the inputs for the model
-    inputs = processor(text=["a golf swing"], images=frames, return_tensors="pt", padding=True).to(device)
+    inputs = processor(text=["a golf swing"], images=images, return_tensors="pt", padding=True).to(device)
 
     # Get the outputs from the model
     with torch.no_grad():
@@ -43,8 +43,38 @@ def is_golf_swing(video_path):
 
     logits_per_image = outputs.logits_per_image
     probs = logits_per_image.softmax(dim=1)
+    return [float(prob[0]) for prob in probs]
+
+
+def is_golf_swing(video_path, start_frame=0, probabilities=None):
+    """
+    Check whether a video shows a golf swing.
+    `probabilities` scores a batch of images, defaults to golf_swing_probabilities;
+    pass a shared batcher to group frames of concurrent requests.
+    """
+    probabilities = probabilities or golf_swing_probabilities
+
+    cap = cv2.VideoCapture(video_path)
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    frames = []
+
+    # Extract a few frames to analyze
+    for _ in range(10):  # Adjust the number of frames as needed
+        success, frame = cap.read()
+        if not success:
+            break
+        # Convert frame to PIL Image
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(frame_rgb)
+        frames.append(pil_image)
+
+    cap.release()
+
+    if not frames:
+        return False
 
     # Check if a golf swing is detected
-    golf_swing_detected = any(prob[0] > 0.5 for prob in probs)  # Adjust threshold as needed
+    golf_swing_detected = any(prob > 0.5 for prob in probabilities(frames))  # Adjust threshold as needed
 
     return golf_swing_detected
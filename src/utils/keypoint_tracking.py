@@ -0,0 +1,153 @@
+from typing import Callable, List, Optional, Sequence
+import cv2
+import numpy as np
+from src.models.pose_sequence import PoseSequence
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+)
+
+def frame_motion(grays: Sequence[np.ndarray], scale_width: int = 160) -> np.ndarray:
+    """Mean absolute difference of each downscaled frame to the previous one, 0 for the first."""
+    motion = np.zeros(len(grays), dtype=np.float32)
+    previous = None
+    for i, gray in enumerate(grays):
+        height, width = gray.shape[:2]
+        small = cv2.resize(gray, (scale_width, max(1, int(round(height * scale_width / width)))),
+                           interpolation=cv2.INTER_AREA)
+        if previous is not None and previous.shape == small.shape:
+            motion[i] = float(cv2.absdiff(small, previous).mean())
+        previous = small
+    return motion
+
+def select_keyframes(num_frames: int, interval: int, motion: Optional[np.ndarray] = None,
+                     motion_quantile: float = 0.9) -> np.ndarray:
+    """
+    Pick the frames the pose model runs on: every `interval`-th frame plus
+    frames whose motion is in the top `1 - motion_quantile` share, where
+    flow tracking is least reliable.
+    """
+    keyframes = np.zeros(num_frames, dtype=bool)
+    keyframes[::max(1, interval)] = True
+    if motion is not None and len(motion) and motion.max() > 0:
+        keyframes |= motion >= np.quantile(motion, motion_quantile)
+    return keyframes
+
+def track_keypoints(prev_gray: np.ndarray, next_gray: np.ndarray, points: np.ndarray):
+    """
+    Track points from one frame to the next with pyramidal Lucas-Kanade flow.
+    Returns the new points and the forward-backward error of each, which is
+    inf for points that were lost.
+    """
+    p0 = points.reshape(-1, 1, 2).astype(np.float32)
+    p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, next_gray, p0, None, **LK_PARAMS)
+    back, back_status, _ = cv2.calcOpticalFlowPyrLK(next_gray, prev_gray, p1, None, **LK_PARAMS)
+    error = np.linalg.norm((back - p0).reshape(-1, 2), axis=1)
+    lost = (status.ravel() == 0) | (back_status.ravel() == 0)
+    error[lost] = np.inf
+    return p1.reshape(-1, 2), error
+
+def _bbox(points: np.ndarray, width: int, height: int, padding: float = 0.1) -> np.ndarray:
+    """x, y, w, h box around the points, padded and clipped to the frame."""
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    x1, y1 = max(0.0, x1 - pad_x), max(0.0, y1 - pad_y)
+    x2, y2 = min(float(width), x2 + pad_x), min(float(height), y2 + pad_y)
+    return np.array([x1, y1, x2 - x1, y2 - y1], dtype=np.float32)
+
+def estimate_with_propagation(
+    frames: List[np.ndarray],
+    estimate: Callable[[List[int]], PoseSequence],
+    interval: int = 4,
+    motion_quantile: float = 0.9,
+    decay: float = 0.9,
+    max_flow_error: float = 2.0,
+    min_tracked: float = 0.6,
+    min_confidence: float = 0.3,
+    on_progress: Optional[Callable[[int, Optional[dict]], None]] = None
+) -> PoseSequence:
+    """
+    Estimate poses on keyframes only and propagate keypoints to the frames in
+    between with optical flow.
+
+    Keypoints above `min_confidence` are tracked from each frame to the next;
+    their confidence is multiplied by `decay` per propagated frame, and
+    points lost by the tracker drop to zero confidence. A frame is
+    re-anchored with the pose model when the median forward-backward flow
+    error exceeds `max_flow_error` pixels or fewer than `min_tracked` of the
+    confident points survive. Frames following one without a pose stay
+    empty until the next keyframe.
+
+    :param frames: BGR frames as NumPy arrays.
+    :param estimate: Runs the pose model on the frames at the given indices,
+        returning a PoseSequence with one row per index.
+    :return: A PoseSequence with a pose for every frame that has one.
+    """
+    num_frames = len(frames)
+    if num_frames == 0:
+        return PoseSequence.empty(0, 0)
+
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    keyframes = select_keyframes(num_frames, interval, frame_motion(grays), motion_quantile)
+    anchor_indices = [int(i) for i in np.flatnonzero(keyframes)]
+    anchors = estimate(anchor_indices)
+    poses = PoseSequence.empty(num_frames, anchors.num_keypoints)
+    poses.keypoints[anchor_indices] = anchors.keypoints
+    poses.scores[anchor_indices] = anchors.scores
+    poses.bboxes[anchor_indices] = anchors.bboxes
+    poses.valid[anchor_indices] = anchors.valid
+
+    def report(index):
+        if on_progress is not None:
+            pose = poses.frame(index)
+            on_progress(index, None if pose is None else {"keypoints": pose.keypoints, "scores": pose.scores})
+
+    def re_anchor(index):
+        anchor = estimate([index])
+        if anchor.num_keypoints and anchor.valid[0]:
+            if poses.num_keypoints == 0:
+                # No keyframe had a pose, so the array shape is only known now
+                poses.keypoints = np.zeros((num_frames, anchor.num_keypoints, 3), dtype=np.float32)
+            poses.set_frame(index, anchor.keypoints[0, :, :2], anchor.keypoints[0, :, 2],
+                            anchor.bboxes[0], score=float(anchor.scores[0]))
+
+    report(0)
+    for i in range(1, num_frames):
+        if keyframes[i]:
+            report(i)
+            continue
+        if not poses.valid[i - 1]:
+            # Nothing to track from; the next keyframe picks the golfer up again
+            report(i)
+            continue
+
+        previous = poses.keypoints[i - 1]
+        confident = previous[:, 2] >= min_confidence
+        if not confident.any():
+            re_anchor(i)
+            report(i)
+            continue
+
+        points, error = track_keypoints(grays[i - 1], grays[i], previous[confident, :2])
+        # Single points may drift further than the median allows before they are dropped
+        tracked = error <= max_flow_error * 2
+        finite = error[np.isfinite(error)]
+        if tracked.mean() < min_tracked or not len(finite) or np.median(finite) > max_flow_error:
+            re_anchor(i)
+            report(i)
+            continue
+
+        keypoints = previous.copy()
+        keypoints[:, 2] *= decay
+        moved = np.flatnonzero(confident)
+        keypoints[moved[tracked], :2] = points[tracked]
+        keypoints[moved[~tracked], 2] = 0.0
+        height, width = grays[i].shape[:2]
+        poses.set_frame(i, keypoints[:, :2], keypoints[:, 2],
+                        _bbox(keypoints[moved[tracked], :2], width, height), score=float(poses.scores[i - 1]))
+        report(i)
+
+    return poses
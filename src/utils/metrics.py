@@ -0,0 +1,51 @@
+from collections import deque
+from typing import Dict, List, Optional
+import bisect
+import threading
+import numpy as np
+
+# Default bucket upper bounds for latencies in milliseconds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed buckets.
+    A bounded window of recent observations is kept for percentiles, so
+    p50/p95/p99 follow current behaviour rather than the whole process lifetime.
+    """
+
+    def __init__(self, buckets: List[float], window: int = 2048):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last bucket is +Inf
+        self._recent = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self._count += 1
+            self._sum += value
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._recent:
+                return None
+            return float(np.percentile(np.fromiter(self._recent, dtype=np.float64), q))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            recent = np.fromiter(self._recent, dtype=np.float64)
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        snapshot = {
+            "count": count,
+            "sum": round(total, 3),
+            "buckets": dict(zip(labels, counts)),
+        }
+        for q in (50, 95, 99):
+            snapshot[f"p{q}"] = round(float(np.percentile(recent, q)), 3) if len(recent) else None
+        return snapshot
@@ -3,8 +3,17 @@ from transformers import AutoProcessor, RTDetrForObjectDetection, VitPoseForPose
 import cv2
 import numpy as np
 from PIL import Image
-from src.config import logger
-from src.schemas import PoseResult
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+from src.config import POSE_BATCH_SIZE, POSE_KEYFRAME_INTERVAL, POSE_KEYFRAME_MOTION_QUANTILE, POSE_FLOW_DECAY, \
+    POSE_FLOW_MAX_ERROR, POSE_FLOW_MIN_TRACKED, SHARED_PREPROCESSING, logger
+from src.models.pose_sequence import PoseSequence
+from src.utils.preprocessing import normalize_frames, crop_person
+
+@lru_cache
+def get_pose_processor() -> "PoseProcessor":
+    """Shared PoseProcessor, so the detector and pose models are loaded once per process"""
+    return PoseProcessor()
 
 class PoseProcessor:
     def __init__(self):
@@ -44,71 +53,202 @@ class PoseProcessor:
         
         return boxes
 
-    def process_frames(self, frames):
-        pose_results = []
-        boxes = self.calculate_boxes(frames)
+    def detect_people(self, images: List[Image.Image]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Detect people in a batch of images.
+        Images are PIL images, or normalized (3, H, W) arrays from normalize_frames,
+        which are passed to the model as they are instead of being resized again.
+        Returns, per image, the person boxes as x1, y1, x2, y2 and their scores.
+        """
+        if isinstance(images[0], np.ndarray):
+            inputs = self._detector_inputs(images)
+            target_sizes = torch.tensor([image.shape[1:] for image in images])
+        else:
+            inputs = self.person_image_processor(images=images, return_tensors="pt").to(self.device)
+            target_sizes = torch.tensor([(image.height, image.width) for image in images])
+        with torch.no_grad():
+            outputs = self.person_model(**inputs)
+        results = self.person_image_processor.post_process_object_detection(
+            outputs, target_sizes=target_sizes, threshold=0.3
+        )
+        return [
+            (result["boxes"][result["labels"] == 1].cpu().numpy(),
+             result["scores"][result["labels"] == 1].cpu().numpy())
+            for result in results
+        ]
+
+    def _detector_inputs(self, pixels: List[np.ndarray]) -> dict:
+        """Pad normalized frames of different sizes into one batch with a pixel mask, like the DETR processor."""
+        height = max(image.shape[1] for image in pixels)
+        width = max(image.shape[2] for image in pixels)
+        pixel_values = np.zeros((len(pixels), 3, height, width), dtype=np.float32)
+        pixel_mask = np.zeros((len(pixels), height, width), dtype=np.int64)
+        for i, image in enumerate(pixels):
+            pixel_values[i, :, :image.shape[1], :image.shape[2]] = image
+            pixel_mask[i, :image.shape[1], :image.shape[2]] = 1
+        return {
+            "pixel_values": torch.from_numpy(pixel_values).to(self.device),
+            "pixel_mask": torch.from_numpy(pixel_mask).to(self.device)
+        }
+
+    def estimate_poses(self, images: List[Image.Image], boxes: List[np.ndarray]) -> List[Optional[dict]]:
+        """
+        Estimate poses for a batch of images, with one (1, 4) x, y, w, h box per image.
+        Images are PIL images, or normalized (3, H, W) arrays from normalize_frames
+        that the person crops are cut from directly.
+        Returns the pose of each image, or None where none was found.
+        """
+        if isinstance(images[0], np.ndarray):
+            size = (self.processor.size["width"], self.processor.size["height"])
+            crops = np.stack([crop_person(image, box, size) for image, box in zip(images, boxes)])
+            inputs = {"pixel_values": torch.from_numpy(crops).to(self.device)}
+        else:
+            inputs = self.processor(images, boxes=boxes, return_tensors="pt").to(self.device)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        pose_results_list = self.processor.post_process_pose_estimation(outputs, boxes=boxes)
+        # One box is passed per image, so there is at most one pose each
+        return [person_data[0] if person_data else None for person_data in pose_results_list]
+
+    def process_frames(self, frames, detect: Optional[Callable] = None, estimate: Optional[Callable] = None,
+                       batch_size: int = POSE_BATCH_SIZE,
+                       on_progress: Optional[Callable[[int, Optional[dict]], None]] = None,
+                       keyframe_interval: int = POSE_KEYFRAME_INTERVAL) -> PoseSequence:
+        """
+        Estimate the golfer's pose on every frame.
+        Args:
+            frames: BGR frames as NumPy arrays
+            detect: Batched person detection, defaults to detect_people
+            estimate: Batched pose estimation, defaults to estimate_poses
+            batch_size: Number of frames passed to each model call
+            on_progress: Called with the frame index and pose data, or None, as each frame is done
+            keyframe_interval: Run the models on every Nth frame and on high-motion frames only,
+                tracking keypoints with optical flow in between; 1 runs them on every frame
+        Returns a PoseSequence with one row per input frame, in order.
+        """
+        detect = detect or self.detect_people
+        estimate = estimate or self.estimate_poses
         logger.info(f"Extracted {len(frames)} frames from the video")
-        logger.info(f"Found {len(boxes)} boxes for each frame")
-        for frame, person_boxes in zip(frames, boxes):
-            # Convert frame to PIL Image
-            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
-            # Detect humans
-            inputs = self.person_image_processor(images=image, return_tensors="pt").to(self.device)
-            with torch.no_grad():
-                outputs = self.person_model(**inputs)
-            results = self.person_image_processor.post_process_object_detection(
-                outputs, target_sizes=torch.tensor([(image.height, image.width)]), threshold=0.3
+
+        if keyframe_interval > 1:
+            from src.utils.keypoint_tracking import estimate_with_propagation
+            return estimate_with_propagation(
+                frames,
+                lambda indices: self._estimate_frames([frames[i] for i in indices], detect, estimate, batch_size),
+                interval=keyframe_interval,
+                motion_quantile=POSE_KEYFRAME_MOTION_QUANTILE,
+                decay=POSE_FLOW_DECAY,
+                max_flow_error=POSE_FLOW_MAX_ERROR,
+                min_tracked=POSE_FLOW_MIN_TRACKED,
+                on_progress=on_progress
             )
-            result = results[0]
-            person_boxes = result["boxes"][result["labels"] == 1].cpu().numpy()
-            scores = result["scores"][result["labels"] == 1].cpu().numpy()
-
-            # Filter boxes to find the golfer
-            if len(person_boxes) > 0:
-                # Convert boxes format
-                person_boxes_xywh = person_boxes.copy()
-                person_boxes_xywh[:, 2] = person_boxes_xywh[:, 2] - person_boxes_xywh[:, 0]  # width
-                person_boxes_xywh[:, 3] = person_boxes_xywh[:, 3] - person_boxes_xywh[:, 1]  # height
-
-                # Calculate center points
-                centers = person_boxes_xywh[:, :2] + person_boxes_xywh[:, 2:] / 2
-                
-                # Score each person based on:
-                # 1. Distance from center of frame
-                # 2. Size of bounding box (golfer usually takes up more space)
-                # 3. Original detection confidence
-                frame_center = np.array([image.width/2, image.height/2])
-                center_distances = np.linalg.norm(centers - frame_center, axis=1)
-                box_sizes = person_boxes_xywh[:, 2] * person_boxes_xywh[:, 3]
-                
-                # Normalize scores (lower distance is better)
-                center_scores = 1 - (center_distances / np.max(center_distances))
-                size_scores = box_sizes / np.max(box_sizes)
-                
-                # Combine scores (equal weights)
-                combined_scores = 0.4 * center_scores + 0.3 * size_scores + 0.3 * scores
-                
-                # Select the person with highest score (likely the golfer)
-                golfer_idx = np.argmax(combined_scores)
-                person_boxes = person_boxes_xywh[golfer_idx:golfer_idx+1]
+        return self._estimate_frames(frames, detect, estimate, batch_size, on_progress)
+
+    def _estimate_frames(self, frames, detect: Callable, estimate: Callable, batch_size: int,
+                         on_progress: Optional[Callable[[int, Optional[dict]], None]] = None) -> PoseSequence:
+        """Run detection and pose estimation on every given frame."""
+        if SHARED_PREPROCESSING:
+            return self._estimate_normalized(frames, detect, estimate, batch_size, on_progress)
+
+        # Convert frames to PIL Images
+        images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+
+        # Detect humans and pick the golfer in each frame
+        golfers = []
+        for i in range(0, len(images), batch_size):
+            batch = images[i:i + batch_size]
+            for image, (person_boxes, scores) in zip(batch, detect(batch)):
+                golfers.append(select_golfer(person_boxes, scores, image.width, image.height))
+
+        # Pose estimation for the selected person
+        poses = PoseSequence.empty(len(frames), 0)
+        for i in range(0, len(images), batch_size):
+            batch_golfers = golfers[i:i + batch_size]
+            results = estimate(images[i:i + batch_size], [box for box, _ in batch_golfers])
+            poses = _store_poses(poses, i, results, batch_golfers, on_progress)
+        return poses
+
+    def _estimate_normalized(self, frames, detect: Callable, estimate: Callable, batch_size: int,
+                             on_progress: Optional[Callable[[int, Optional[dict]], None]] = None) -> PoseSequence:
+        """
+        Normalize each batch of frames once into a reused buffer and feed the
+        same arrays to the detector and to the pose model's person crops.
+        """
+        buffer = None
+        poses = PoseSequence.empty(len(frames), 0)
+        for i in range(0, len(frames), batch_size):
+            batch = frames[i:i + batch_size]
+            if any(frame.shape != batch[0].shape for frame in batch):
+                pixels = [normalize_frames([frame])[0] for frame in batch]
             else:
-                # If no person detected, use the whole frame
-                person_boxes = np.array([[0, 0, image.width, image.height]])
-
-            # Pose estimation for the selected person
-            inputs = self.processor(image, boxes=[person_boxes], return_tensors="pt").to(self.device)
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-            pose_results_list = self.processor.post_process_pose_estimation(outputs, boxes=[person_boxes])
-            
-            for person_data in pose_results_list:
-                for data in person_data:
-                    pose_result = PoseResult(
-                        keypoints=data['keypoints'],
-                        scores=data['scores'],
-                        labels=data['labels'],
-                        bbox=data['bbox']
-                    )
-                    pose_results.append(pose_result)
-        return pose_results
+                buffer = pixels = normalize_frames(batch, out=buffer)
+            golfers = [
+                select_golfer(person_boxes, scores, image.shape[2], image.shape[1])
+                for image, (person_boxes, scores) in zip(pixels, detect(list(pixels)))
+            ]
+            results = estimate(list(pixels), [box for box, _ in golfers])
+            poses = _store_poses(poses, i, results, golfers, on_progress)
+        return poses
+
+def _store_poses(poses: PoseSequence, start: int, results, golfers,
+                 on_progress: Optional[Callable[[int, Optional[dict]], None]] = None) -> PoseSequence:
+    """Write a batch of pose results into the sequence, allocating its keypoints on the first pose."""
+    for offset, (data, (_, person_score)) in enumerate(zip(results, golfers)):
+        if on_progress is not None:
+            on_progress(start + offset, data)
+        if data is None:
+            continue
+        keypoints = _to_numpy(data['keypoints'])
+        if poses.num_keypoints == 0:
+            poses = PoseSequence.empty(len(poses), len(keypoints))
+        poses.set_frame(
+            start + offset,
+            keypoints,
+            _to_numpy(data['scores']),
+            _to_numpy(data['bbox']),
+            score=person_score
+        )
+    return poses
+
+def select_golfer(person_boxes: np.ndarray, scores: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, float]:
+    """
+    Pick the golfer among detected people.
+    Returns the golfer's box as a (1, 4) x, y, w, h array and its detection score;
+    the whole frame with a score of 0 if nobody was detected.
+    """
+    if len(person_boxes) == 0:
+        # If no person detected, use the whole frame
+        return np.array([[0, 0, width, height]], dtype=np.float32), 0.0
+
+    # Convert boxes format
+    person_boxes_xywh = person_boxes.copy()
+    person_boxes_xywh[:, 2] = person_boxes_xywh[:, 2] - person_boxes_xywh[:, 0]  # width
+    person_boxes_xywh[:, 3] = person_boxes_xywh[:, 3] - person_boxes_xywh[:, 1]  # height
+
+    # Calculate center points
+    centers = person_boxes_xywh[:, :2] + person_boxes_xywh[:, 2:] / 2
+    
+    # Score each person based on:
+    # 1. Distance from center of frame
+    # 2. Size of bounding box (golfer usually takes up more space)
+    # 3. Original detection confidence
+    frame_center = np.array([width/2, height/2])
+    center_distances = np.linalg.norm(centers - frame_center, axis=1)
+    box_sizes = person_boxes_xywh[:, 2] * person_boxes_xywh[:, 3]
+    
+    # Normalize scores (lower distance is better)
+    center_scores = 1 - (center_distances / max(np.max(center_distances), 1e-6))
+    size_scores = box_sizes / np.max(box_sizes)
+    
+    # Combine scores (equal weights)
+    combined_scores = 0.4 * center_scores + 0.3 * size_scores + 0.3 * scores
+    
+    # Select the person with highest score (likely the golfer)
+    golfer_idx = np.argmax(combined_scores)
+    return person_boxes_xywh[golfer_idx:golfer_idx+1], float(scores[golfer_idx])
+
+def _to_numpy(value) -> np.ndarray:
+    """Convert a tensor or nested list returned by a HuggingFace processor to a NumPy array."""
+    if isinstance(value, torch.Tensor):
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
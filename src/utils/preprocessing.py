@@ -0,0 +1,88 @@
+from typing import Optional, Sequence, Tuple
+import cv2
+import numpy as np
+
+# ImageNet statistics, used by both the DETR and VitPose image processors
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+def working_size(width: int, height: int, short_side: int, long_side: int) -> Tuple[int, int]:
+    """
+    Largest size, as width and height, that keeps the aspect ratio and fits
+    within `short_side` and `long_side`. Frames are never upscaled.
+    """
+    scale = min(1.0, short_side / min(width, height), long_side / max(width, height))
+    if scale >= 1.0:
+        return width, height
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+def resize_to_working(frame: np.ndarray, short_side: Optional[int], long_side: Optional[int]) -> np.ndarray:
+    """Downsample a frame to the working resolution; frames already small enough are returned as is."""
+    if not short_side or not long_side:
+        return frame
+    height, width = frame.shape[:2]
+    size = working_size(width, height, short_side, long_side)
+    if size == (width, height):
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def normalize_frames(frames: Sequence[np.ndarray], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Convert BGR uint8 frames of one size into a (frames, 3, height, width)
+    float32 array of RGB values normalized with the ImageNet statistics.
+
+    :param frames: BGR frames as NumPy arrays, all the same size.
+    :param out: Buffer to write into, reused across batches; allocated when
+        missing or too small.
+    :return: View of the buffer holding exactly the given frames.
+    """
+    height, width = frames[0].shape[:2]
+    shape = (len(frames), 3, height, width)
+    if out is None or out.shape[0] < len(frames) or out.shape[1:] != shape[1:]:
+        out = np.empty(shape, dtype=np.float32)
+    pixels = out[:len(frames)]
+    scale = 1.0 / (255.0 * IMAGE_STD)
+    offset = -IMAGE_MEAN / IMAGE_STD
+    for target, frame in zip(pixels, frames):
+        # BGR to RGB by reversing the channel axis, one fused multiply-add per channel
+        for channel in range(3):
+            np.multiply(frame[:, :, 2 - channel], scale[channel], out=target[channel], casting="unsafe")
+            target[channel] += offset[channel]
+    return pixels
+
+def crop_person(pixels: np.ndarray, box, size: Tuple[int, int], padding: float = 1.25) -> np.ndarray:
+    """
+    Cut the person box out of a normalized (3, height, width) frame and warp it
+    to the pose model's input size, the way the VitPose image processor does:
+    the box is centred, widened to the model's aspect ratio and padded.
+
+    :param pixels: One frame from normalize_frames.
+    :param box: Person box as x, y, width, height.
+    :param size: Model input size as width and height.
+    :return: (3, size height, size width) float32 array.
+    """
+    x, y, box_width, box_height = [float(v) for v in np.asarray(box, dtype=np.float32).reshape(-1)[:4]]
+    out_width, out_height = size
+    aspect_ratio = out_width / out_height
+    center_x, center_y = x + box_width * 0.5, y + box_height * 0.5
+    if box_width > aspect_ratio * box_height:
+        box_height = box_width / aspect_ratio
+    elif box_width < aspect_ratio * box_height:
+        box_width = box_height * aspect_ratio
+    box_width *= padding
+    box_height *= padding
+
+    scale_x = (out_width - 1.0) / box_width
+    scale_y = (out_height - 1.0) / box_height
+    matrix = np.array([
+        [scale_x, 0.0, scale_x * (0.5 * box_width - center_x)],
+        [0.0, scale_y, scale_y * (0.5 * box_height - center_y)],
+    ], dtype=np.float32)
+
+    crop = np.empty((3, out_height, out_width), dtype=np.float32)
+    # Outside the frame is black, which is -mean / std once normalized
+    border = -IMAGE_MEAN / IMAGE_STD
+    for channel in range(3):
+        cv2.warpAffine(pixels[channel], matrix, (out_width, out_height), dst=crop[channel],
+                       flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=float(border[channel]))
+    return crop
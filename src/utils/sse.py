@@ -0,0 +1,33 @@
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
+import json
+
+# Comment line that keeps idle connections open through proxies
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+def format_sse(event: str, data, event_id=None) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@lru_cache
+def _stream_limiter():
+    from anyio import CapacityLimiter
+    from src.config import SSE_STREAM_THREADS
+
+    return CapacityLimiter(SSE_STREAM_THREADS)
+
+async def iterate_in_stream_threads(iterator: Iterator[str]) -> AsyncIterator[str]:
+    """
+    Step a blocking iterator on threads of its own limiter. StreamingResponse
+    would step it on the pool that also runs sync endpoints, so long streams
+    could starve health checks and every other request.
+    """
+    from anyio import to_thread
+
+    done = object()
+    while True:
+        message = await to_thread.run_sync(next, iterator, done, limiter=_stream_limiter())
+        if message is done:
+            return
+        yield message
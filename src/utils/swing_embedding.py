@@ -0,0 +1,133 @@
+from typing import Optional
+import warnings
+import numpy as np
+from src.models.pose_sequence import PoseSequence
+from src.utils.swing_metrics import NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, \
+    LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE, \
+    NUM_COCO_KEYPOINTS, find_top, masked_xy
+
+# Body keypoints compared between swings; the face is left out apart from the nose
+BODY_KEYPOINTS = [NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                  LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE]
+SEQUENCE_LENGTH = 64  # Time steps of a normalized sequence
+EMBEDDING_STEPS = 16  # Time steps pooled into the embedding
+EMBEDDING_DIM = EMBEDDING_STEPS * len(BODY_KEYPOINTS) * 2
+TOP_POSITION = 0.5  # Share of the normalized time axis before the top of the backswing
+
+def _interpolate_missing(values: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Fill NaNs in each column of a (frames, n) array linearly over time; columns never seen become 0."""
+    filled = values.copy()
+    for column in range(values.shape[1]):
+        finite = np.isfinite(values[:, column])
+        if not finite.any():
+            filled[:, column] = 0.0
+        elif not finite.all():
+            filled[:, column] = np.interp(times, times[finite], values[finite, column])
+    return filled
+
+def normalize_pose_sequence(poses: PoseSequence, timestamps=None, fps: float = 30.0,
+                            min_confidence: float = 0.3, length: int = SEQUENCE_LENGTH) -> Optional[np.ndarray]:
+    """
+    Normalize a swing's keypoints for comparison with other swings.
+
+    Position: keypoints are relative to the mid-hip point of each frame.
+    Scale: distances are in torso lengths, the clip's median shoulder-to-hip
+    distance. Tempo: time is warped piecewise linearly so the top of the
+    backswing, where the hands are highest before they move fastest, lands at
+    TOP_POSITION, then resampled to `length` steps. Gaps are interpolated over time.
+
+    :return: (length, len(BODY_KEYPOINTS), 2) float32 array, or None if the
+        clip has too few usable frames.
+    """
+    if len(poses) == 0 or poses.num_keypoints < NUM_COCO_KEYPOINTS:
+        return None
+    xy = masked_xy(poses, min_confidence)[:, BODY_KEYPOINTS]
+    times = np.asarray(timestamps, dtype=np.float64) if timestamps is not None else np.arange(len(poses)) / fps
+
+    # Keep the span between the first and last frame with most of the body visible
+    usable = np.flatnonzero(np.isfinite(xy[..., 0]).mean(axis=1) >= 0.5)
+    if len(usable) < 4:
+        return None
+    xy = xy[usable[0]:usable[-1] + 1]
+    times = times[usable[0]:usable[-1] + 1]
+
+    hips = [BODY_KEYPOINTS.index(LEFT_HIP), BODY_KEYPOINTS.index(RIGHT_HIP)]
+    shoulders = [BODY_KEYPOINTS.index(LEFT_SHOULDER), BODY_KEYPOINTS.index(RIGHT_SHOULDER)]
+    wrists = [BODY_KEYPOINTS.index(LEFT_WRIST), BODY_KEYPOINTS.index(RIGHT_WRIST)]
+    with warnings.catch_warnings():
+        # Frames missing both points of a pair stay NaN and are interpolated below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        center = np.nanmean(xy[:, hips], axis=1)
+        torso = np.linalg.norm(np.nanmean(xy[:, shoulders], axis=1) - center, axis=-1)
+        hands = np.nanmean(xy[:, wrists], axis=1)
+    center = _interpolate_missing(center, times)
+    if not np.isfinite(torso).any():
+        return None
+    scale = float(np.nanmedian(torso)) or 1.0
+
+    flat = ((xy - center[:, None, :]) / scale).reshape(len(xy), -1)
+    flat = _interpolate_missing(flat, times)
+
+    # Piecewise linear time warp anchored at the top of the backswing
+    start, end = times[0], times[-1]
+    if end <= start:
+        return None
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hand_speed = np.linalg.norm(np.gradient(hands, times, axis=0), axis=-1)
+    top = find_top(hands[:, 1], hand_speed)
+    if top is not None and start < times[top] < end:
+        warped = np.where(
+            times <= times[top],
+            TOP_POSITION * (times - start) / (times[top] - start),
+            TOP_POSITION + (1.0 - TOP_POSITION) * (times - times[top]) / (end - times[top])
+        )
+    else:
+        warped = (times - start) / (end - start)
+
+    grid = np.linspace(0.0, 1.0, length)
+    resampled = np.stack([np.interp(grid, warped, flat[:, column]) for column in range(flat.shape[1])], axis=1)
+    return resampled.reshape(length, len(BODY_KEYPOINTS), 2).astype(np.float32)
+
+def embed_sequence(sequence: np.ndarray, steps: int = EMBEDDING_STEPS) -> np.ndarray:
+    """
+    Fixed-size, unit-length embedding of a normalized sequence: the poses
+    average pooled to `steps` time steps and flattened, so cosine similarity
+    compares whole swings.
+    """
+    pooled = sequence.reshape(steps, len(sequence) // steps, -1).mean(axis=1).ravel()
+    norm = np.linalg.norm(pooled)
+    return (pooled / norm if norm > 0 else pooled).astype(np.float32)
+
+def dtw_distances(query: np.ndarray, candidates: np.ndarray, window: float = 0.1) -> np.ndarray:
+    """
+    Dynamic time warping distance between one normalized sequence and many.
+
+    The dynamic program runs over all candidates at once, one anti-diagonal
+    of the cost matrix per NumPy step, within a Sakoe-Chiba band of
+    `window` times the sequence length. Distances are divided by twice the
+    sequence length, the longest possible warping path.
+
+    :param query: (steps, keypoints, 2) normalized sequence.
+    :param candidates: (n, steps, keypoints, 2) normalized sequences.
+    :return: (n,) distances in torso lengths per keypoint.
+    """
+    n, length = len(candidates), len(query)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    band = max(1, int(round(window * length)))
+    total = np.full((n, length + 1, length + 1), np.inf)
+    total[:, 0, 0] = 0.0
+    # Cells on anti-diagonal i + j = d only depend on the two previous diagonals
+    for d in range(2, 2 * length + 1):
+        i = np.arange(max(1, d - length), min(length, d - 1) + 1)
+        j = d - i
+        inside = np.abs(i - j) <= band
+        i, j = i[inside], j[inside]
+        if not len(i):
+            continue
+        # Mean keypoint distance between query step i and candidate step j, only inside the band
+        delta = query[i - 1] - candidates[:, j - 1]
+        cost = np.sqrt(np.einsum("nckd,nckd->nck", delta, delta)).mean(axis=-1)
+        best = np.minimum(np.minimum(total[:, i - 1, j - 1], total[:, i - 1, j]), total[:, i, j - 1])
+        total[:, i, j] = best + cost
+    return (total[:, length, length] / (2 * length)).astype(np.float32)
@@ -0,0 +1,218 @@
+from typing import Dict, Optional
+import warnings
+import numpy as np
+from src.models.pose_sequence import PoseSequence
+
+# COCO keypoint indices, as returned by VitPose
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 5, 6
+LEFT_ELBOW, RIGHT_ELBOW = 7, 8
+LEFT_WRIST, RIGHT_WRIST = 9, 10
+LEFT_HIP, RIGHT_HIP = 11, 12
+LEFT_KNEE, RIGHT_KNEE = 13, 14
+LEFT_ANKLE, RIGHT_ANKLE = 15, 16
+NUM_COCO_KEYPOINTS = 17
+
+def masked_xy(poses: PoseSequence, min_confidence: float = 0.3) -> np.ndarray:
+    """(frames, keypoints, 2) float64 coordinates with NaN where a keypoint is missing or unreliable."""
+    xy = poses.xy.astype(np.float64)
+    missing = (poses.confidence < min_confidence) | ~poses.valid[:, None]
+    xy[missing] = np.nan
+    return xy
+
+def joint_angles(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Angle at b in degrees between b->a and b->c, for (frames, 2) point arrays."""
+    ba = a - b
+    bc = c - b
+    cosine = np.sum(ba * bc, axis=-1) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1))
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+def line_angles(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Angle in degrees of the line a->b against the horizontal, image y pointing down."""
+    delta = b - a
+    return np.degrees(np.arctan2(-delta[..., 1], delta[..., 0]))
+
+def apparent_rotation(width: np.ndarray, reference: float) -> np.ndarray:
+    """
+    Rotation in degrees of a body segment away from the camera, estimated from
+    how much its projected width shrank compared to the reference width.
+    """
+    if not np.isfinite(reference) or reference <= 0:
+        return np.full_like(width, np.nan)
+    return np.degrees(np.arccos(np.clip(width / reference, 0.0, 1.0)))
+
+def _first_finite(values: np.ndarray, default: float = np.nan) -> float:
+    finite = np.flatnonzero(np.isfinite(values))
+    return float(values[finite[0]]) if len(finite) else default
+
+def _nanargmax(values: np.ndarray) -> Optional[int]:
+    return int(np.nanargmax(values)) if np.isfinite(values).any() else None
+
+def _nanargmin(values: np.ndarray) -> Optional[int]:
+    return int(np.nanargmin(values)) if np.isfinite(values).any() else None
+
+def find_top(hands_y: np.ndarray, hand_speed: np.ndarray) -> Optional[int]:
+    """
+    Frame of the top of the backswing: where the hands are highest before they
+    move fastest. Over the whole clip a high finish would win instead.
+    """
+    peak = _nanargmax(hand_speed)
+    if peak is not None and peak > 0:
+        top = _nanargmin(hands_y[:peak])
+        if top is not None:
+            return top
+    return _nanargmin(hands_y)
+
+def _at(values: np.ndarray, index: Optional[int]) -> Optional[float]:
+    if index is None or not np.isfinite(values[index]):
+        return None
+    return float(values[index])
+
+def _round(value, digits: int = 2):
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+def _series(values: np.ndarray, digits: int = 2) -> list:
+    """Round a per-frame series for JSON, with None for missing values."""
+    return np.where(np.isfinite(values), np.round(values, digits), None).tolist()
+
+def compute_swing_metrics(poses: PoseSequence, timestamps=None, fps: float = 30.0,
+                          lead_side: str = "left", min_confidence: float = 0.3) -> Dict:
+    """
+    Compute swing kinematics for a whole clip at once.
+
+    Works on the full (frames, keypoints) arrays; frames or keypoints below
+    `min_confidence` become NaN and are ignored by the summaries. Angles
+    are in degrees in the image plane, distances are normalized by torso
+    length so they compare across camera distances, and rotations are
+    estimated from the shrinking projected shoulder and hip widths, which
+    assumes a face-on camera.
+
+    :param poses: COCO keypoints of the clip.
+    :param timestamps: Time in seconds of each frame; defaults to frame index / fps.
+    :param fps: Frame rate used when no timestamps are given.
+    :param lead_side: "left" for a right-handed golfer, "right" for a left-handed one.
+    :param min_confidence: Keypoint confidence below which a keypoint counts as missing.
+    :return: Dict with "summary" scalars, "keyframes" indices and per-frame "series".
+    """
+    num_frames = len(poses)
+    if num_frames == 0 or poses.num_keypoints < NUM_COCO_KEYPOINTS or not poses.valid.any():
+        return {"summary": {}, "keyframes": {}, "series": {}}
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _compute(poses, timestamps, fps, lead_side, min_confidence)
+
+def _compute(poses: PoseSequence, timestamps, fps: float, lead_side: str, min_confidence: float) -> Dict:
+    num_frames = len(poses)
+    xy = masked_xy(poses, min_confidence)
+    times = np.asarray(timestamps, dtype=np.float64) if timestamps is not None else np.arange(num_frames) / fps
+
+    if lead_side == "left":
+        lead = (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST)
+        trail = (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST)
+    else:
+        lead = (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST)
+        trail = (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST)
+
+    mid_shoulder = (xy[:, LEFT_SHOULDER] + xy[:, RIGHT_SHOULDER]) / 2
+    mid_hip = (xy[:, LEFT_HIP] + xy[:, RIGHT_HIP]) / 2
+    with warnings.catch_warnings():
+        # Frames where both wrists are missing stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        hands = np.nanmean(xy[:, [LEFT_WRIST, RIGHT_WRIST]], axis=1)
+
+    # Body scale: median torso length, so metrics don't depend on camera distance
+    torso = np.linalg.norm(mid_shoulder - mid_hip, axis=-1)
+    scale = float(np.nanmedian(torso)) if np.isfinite(torso).any() else np.nan
+
+    # Joint angles
+    lead_elbow = joint_angles(xy[:, lead[0]], xy[:, lead[1]], xy[:, lead[2]])
+    trail_elbow = joint_angles(xy[:, trail[0]], xy[:, trail[1]], xy[:, trail[2]])
+    left_knee = joint_angles(xy[:, LEFT_HIP], xy[:, LEFT_KNEE], xy[:, LEFT_ANKLE])
+    right_knee = joint_angles(xy[:, RIGHT_HIP], xy[:, RIGHT_KNEE], xy[:, RIGHT_ANKLE])
+
+    # Spine tilt from vertical, positive when leaning toward the image's right
+    spine = mid_shoulder - mid_hip
+    spine_tilt = np.degrees(np.arctan2(spine[:, 0], -spine[:, 1]))
+
+    # Shoulder and hip lines: tilt in the image plane and rotation away from the camera
+    shoulder_tilt = line_angles(xy[:, RIGHT_SHOULDER], xy[:, LEFT_SHOULDER])
+    hip_tilt = line_angles(xy[:, RIGHT_HIP], xy[:, LEFT_HIP])
+    shoulder_width = np.linalg.norm(xy[:, LEFT_SHOULDER] - xy[:, RIGHT_SHOULDER], axis=-1)
+    hip_width = np.linalg.norm(xy[:, LEFT_HIP] - xy[:, RIGHT_HIP], axis=-1)
+    shoulder_rotation = apparent_rotation(shoulder_width, _first_finite(shoulder_width))
+    hip_rotation = apparent_rotation(hip_width, _first_finite(hip_width))
+    x_factor = shoulder_rotation - hip_rotation
+
+    # Head sway relative to address, in torso lengths
+    head_x = xy[:, NOSE, 0]
+    head_sway = (head_x - _first_finite(head_x)) / scale
+
+    # Hand path and speed with central finite differences over time
+    if num_frames > 1:
+        velocity = np.gradient(hands, times, axis=0)
+        hand_speed = np.linalg.norm(velocity, axis=-1) / scale
+    else:
+        hand_speed = np.full(num_frames, np.nan)
+
+    # Keyframes: address is the first valid frame, the top is where the hands
+    # are highest before their fastest movement, impact is the fastest hand movement after the top
+    address = int(np.flatnonzero(poses.valid)[0])
+    top = find_top(hands[:, 1], hand_speed)
+    impact = None
+    if top is not None and top + 1 < num_frames:
+        after_top = _nanargmax(hand_speed[top + 1:])
+        impact = top + 1 + after_top if after_top is not None else None
+
+    # Tempo: backswing from takeaway to the top over downswing from the top to impact
+    tempo_ratio = backswing = downswing = None
+    if top is not None and impact is not None:
+        hand_travel = np.linalg.norm(hands - hands[address], axis=-1) / scale
+        moved = np.flatnonzero(hand_travel[:top + 1] > 0.1)
+        takeaway = int(moved[0]) if len(moved) else address
+        backswing = times[top] - times[takeaway]
+        downswing = times[impact] - times[top]
+        if downswing > 0:
+            tempo_ratio = backswing / downswing
+
+    summary = {
+        "max_shoulder_rotation": _round(np.nanmax(shoulder_rotation) if np.isfinite(shoulder_rotation).any() else None),
+        "max_hip_rotation": _round(np.nanmax(hip_rotation) if np.isfinite(hip_rotation).any() else None),
+        "x_factor_at_top": _round(_at(x_factor, top)),
+        "max_x_factor": _round(np.nanmax(x_factor) if np.isfinite(x_factor).any() else None),
+        "spine_tilt_at_address": _round(_at(spine_tilt, address)),
+        "spine_tilt_at_impact": _round(_at(spine_tilt, impact)),
+        "spine_angle_change": _round(abs(spine_tilt[impact] - spine_tilt[address]) if impact is not None else None),
+        "lead_arm_bend_at_top": _round(180.0 - _at(lead_elbow, top) if _at(lead_elbow, top) is not None else None),
+        "trail_elbow_at_top": _round(_at(trail_elbow, top)),
+        "lead_knee_flex_at_address": _round(
+            180.0 - _at(left_knee if lead_side == "left" else right_knee, address)
+            if _at(left_knee if lead_side == "left" else right_knee, address) is not None else None
+        ),
+        "head_sway": _round(np.nanmax(np.abs(head_sway)) if np.isfinite(head_sway).any() else None, 3),
+        "max_hand_speed": _round(np.nanmax(hand_speed) if np.isfinite(hand_speed).any() else None),
+        "hand_speed_at_impact": _round(_at(hand_speed, impact)),
+        "backswing_time": _round(backswing, 3),
+        "downswing_time": _round(downswing, 3),
+        "tempo_ratio": _round(tempo_ratio),
+    }
+
+    return {
+        "summary": summary,
+        "keyframes": {"address": address, "top": top, "impact": impact},
+        "series": {
+            "lead_elbow": _series(lead_elbow, 1),
+            "trail_elbow": _series(trail_elbow, 1),
+            "left_knee": _series(left_knee, 1),
+            "right_knee": _series(right_knee, 1),
+            "spine_tilt": _series(spine_tilt, 1),
+            "shoulder_tilt": _series(shoulder_tilt, 1),
+            "hip_tilt": _series(hip_tilt, 1),
+            "shoulder_rotation": _series(shoulder_rotation, 1),
+            "hip_rotation": _series(hip_rotation, 1),
+            "x_factor": _series(x_factor, 1),
+            "head_sway": _series(head_sway, 3),
+            "hand_speed": _series(hand_speed, 2),
+        },
+    }
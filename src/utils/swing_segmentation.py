@@ -0,0 +1,66 @@
+import numpy as np
+from typing import List, Tuple
+
+def smooth_signal(signal, width):
+    """Moving average of a 1D signal, keeping its length."""
+    width = max(1, int(width))
+    if width == 1:
+        return np.asarray(signal, dtype=np.float64)
+    return np.convolve(signal, np.ones(width) / width, mode="same")
+
+def find_active_runs(active):
+    """
+    Find runs of True values in a boolean array.
+
+    :param active: 1D boolean NumPy array.
+    :return: (starts, ends) NumPy arrays, with exclusive ends.
+    """
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def find_swing_windows(energy, fps, threshold=4.0, min_duration=0.8, max_duration=4.0,
+                       padding=0.75, merge_gap=0.5) -> List[Tuple[int, int]]:
+    """
+    Find short bursts of motion that look like individual swings.
+
+    The smoothed motion energy is compared against a robust noise floor
+    (median plus `threshold` times the median absolute deviation). Bursts
+    separated by less than `merge_gap` seconds are merged, and bursts shorter
+    than `min_duration` or longer than `max_duration` are dropped, which
+    filters out camera bumps as well as walking and teeing up.
+
+    :param energy: Per-frame motion energy, see compute_motion_energy.
+    :param fps: Frame rate of the video.
+    :param threshold: Activity threshold in median absolute deviations above the median.
+    :param min_duration: Minimum burst length in seconds.
+    :param max_duration: Maximum burst length in seconds.
+    :param padding: Seconds of context added before and after each burst.
+    :param merge_gap: Bursts closer than this many seconds are merged.
+    :return: List of (start_frame, end_frame) windows with exclusive ends.
+    """
+    energy = np.asarray(energy, dtype=np.float64)
+    if len(energy) == 0:
+        return []
+
+    smoothed = smooth_signal(energy, round(0.2 * fps))
+    median = np.median(smoothed)
+    mad = np.median(np.abs(smoothed - median))
+    # Guard against a perfectly still video giving a zero noise floor
+    level = median + threshold * max(mad, 1e-3 * max(median, 1.0))
+    starts, ends = find_active_runs(smoothed > level)
+    if len(starts) == 0:
+        return []
+
+    # Merge bursts separated by short gaps
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate([[True], gaps > merge_gap * fps])
+    starts = starts[keep]
+    ends = ends[np.concatenate([keep[1:], [True]])]
+
+    durations = (ends - starts) / fps
+    valid = (durations >= min_duration) & (durations <= max_duration)
+    pad = int(round(padding * fps))
+    starts = np.maximum(starts[valid] - pad, 0)
+    ends = np.minimum(ends[valid] + pad, len(energy))
+
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
@@ -0,0 +1,270 @@
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+import math
+import struct
+
+# Containers parsed by the probe, keyed by the ftyp major brand
+CONTAINER_BRANDS = {
+    b"qt  ": "quicktime",
+    b"isom": "mp4",
+    b"iso2": "mp4",
+    b"iso4": "mp4",
+    b"iso5": "mp4",
+    b"iso6": "mp4",
+    b"mp41": "mp4",
+    b"mp42": "mp4",
+    b"avc1": "mp4",
+    b"M4V ": "mp4",
+    b"3gp4": "mp4",
+    b"3gp5": "mp4",
+    b"3g2a": "mp4",
+}
+
+# Boxes whose children are parsed when looking for track metadata
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+class ProbeError(Exception):
+    """
+    Raised when a video is rejected by the probe.
+    `status_code` is the HTTP status the upload should be answered with.
+    """
+
+    def __init__(self, message: str, status_code: int = 422):
+        super().__init__(message)
+        self.status_code = status_code
+
+@dataclass
+class VideoMetadata:
+    container: Optional[str] = None
+    duration: Optional[float] = None  # Seconds
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    codec: Optional[str] = None
+    rotation: int = 0  # Degrees clockwise, as stored in the track matrix
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+@dataclass
+class ProbeLimits:
+    max_bytes: int
+    max_duration: float
+    max_dimension: int
+    allowed_codecs: List[str]
+    max_header_bytes: int = 16 * 1024 * 1024
+
+class IngestProbe:
+    """
+    Incremental MP4/QuickTime header parser.
+
+    Chunks of the upload are fed in as they arrive. Only top-level box headers
+    and the `moov` box are kept; media data is skipped without buffering.
+    Limits are enforced as soon as the information needed for them is known,
+    so bad input is rejected before the rest of the body is read. When the
+    `moov` box sits after the media data (no "fast start"), metadata only
+    becomes available at the end of the stream.
+    """
+
+    def __init__(self, limits: ProbeLimits):
+        self.limits = limits
+        self.metadata = VideoMetadata()
+        self.bytes_received = 0
+        self._buffer = bytearray()
+        self._skip = 0  # Bytes of the current box still to be skipped
+        self._box_count = 0
+        self._moov_parsed = False
+
+    @property
+    def complete(self) -> bool:
+        """True once the moov box has been parsed and all limits checked."""
+        return self._moov_parsed
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the upload, raising ProbeError on bad input."""
+        self.bytes_received += len(chunk)
+        if self.bytes_received > self.limits.max_bytes:
+            raise ProbeError(f"File exceeds the maximum size of {self.limits.max_bytes} bytes", status_code=413)
+
+        view = memoryview(chunk)
+        if self._skip:
+            skipped = min(self._skip, len(view))
+            self._skip -= skipped
+            view = view[skipped:]
+        if not view:
+            return
+        self._buffer.extend(view)
+        self._parse_top_level()
+
+    def finish(self) -> VideoMetadata:
+        """Signal the end of the stream and return the probed metadata."""
+        if not self._moov_parsed:
+            raise ProbeError("Video has no readable metadata (missing moov box)")
+        return self.metadata
+
+    def _parse_top_level(self) -> None:
+        while not self._skip:
+            header = self._read_box_header(self._buffer, 0)
+            if header is None:
+                return
+            box_type, header_size, box_size = header
+
+            if self._box_count == 0:
+                self._check_ftyp(box_type)
+            self._box_count += 1
+
+            if box_type == b"moov":
+                if box_size > self.limits.max_header_bytes:
+                    raise ProbeError("Video metadata is too large", status_code=413)
+                if len(self._buffer) < box_size:
+                    return  # Wait for the whole moov box
+                try:
+                    self._parse_moov(bytes(self._buffer[header_size:box_size]))
+                except (struct.error, TypeError, IndexError):
+                    raise ProbeError("Corrupt video: unreadable metadata")
+                del self._buffer[:box_size]
+            elif box_type == b"ftyp":
+                if len(self._buffer) < box_size:
+                    return
+                self._parse_ftyp(bytes(self._buffer[header_size:box_size]))
+                del self._buffer[:box_size]
+            else:
+                # mdat, free, etc. Skip the payload without buffering it
+                if box_size == 0:
+                    # Box extends to the end of the file
+                    self._skip = math.inf
+                    self._buffer.clear()
+                    return
+                buffered = min(box_size, len(self._buffer))
+                del self._buffer[:buffered]
+                self._skip = box_size - buffered
+
+    def _check_ftyp(self, box_type: bytes) -> None:
+        if box_type != b"ftyp":
+            raise ProbeError("Unsupported or corrupt container: expected an MP4 or QuickTime file", status_code=415)
+
+    def _parse_ftyp(self, payload: bytes) -> None:
+        brand = payload[:4]
+        container = CONTAINER_BRANDS.get(brand)
+        if container is None:
+            compatible = [payload[i:i + 4] for i in range(8, len(payload) - 3, 4)]
+            container = next((CONTAINER_BRANDS[b] for b in compatible if b in CONTAINER_BRANDS), None)
+        if container is None:
+            raise ProbeError(f"Unsupported container brand {brand.decode('latin-1')!r}", status_code=415)
+        self.metadata.container = container
+
+    @staticmethod
+    def _read_box_header(data, offset: int):
+        """Return (type, header_size, box_size) or None if more data is needed."""
+        if len(data) - offset < 8:
+            return None
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            if len(data) - offset < 16:
+                return None
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        if size != 0 and size < header_size:
+            raise ProbeError("Corrupt video: invalid box size")
+        return bytes(box_type), header_size, size
+
+    def _iter_boxes(self, data: bytes):
+        offset = 0
+        while offset + 8 <= len(data):
+            box_type, header_size, size = self._read_box_header(data, offset)
+            if size == 0:
+                size = len(data) - offset
+            yield box_type, data[offset + header_size:offset + size]
+            offset += size
+
+    def _parse_moov(self, payload: bytes) -> None:
+        movie_duration = None
+        for box_type, box in self._iter_boxes(payload):
+            if box_type == b"mvhd":
+                timescale, duration = self._parse_time_header(box)
+                if timescale:
+                    movie_duration = duration / timescale
+            elif box_type == b"trak":
+                track = self._parse_trak(box)
+                if track is not None and self.metadata.codec is None:
+                    self.metadata.width, self.metadata.height, self.metadata.rotation, \
+                        self.metadata.codec, self.metadata.fps, track_duration = track
+                    if track_duration:
+                        movie_duration = movie_duration or track_duration
+
+        self.metadata.duration = movie_duration
+        if self.metadata.codec is None:
+            raise ProbeError("Video has no video track", status_code=415)
+        self._moov_parsed = True
+        self._check_limits()
+
+    @staticmethod
+    def _parse_time_header(box: bytes):
+        """Parse the timescale and duration of an mvhd or mdhd box."""
+        version = box[0]
+        if version == 1:
+            timescale, duration = struct.unpack_from(">IQ", box, 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", box, 12)
+        return timescale, duration
+
+    def _parse_trak(self, payload: bytes):
+        width = height = None
+        rotation = 0
+        handler = codec = None
+        timescale = media_duration = None
+        sample_count = 0
+
+        stack = [payload]
+        while stack:
+            for box_type, box in self._iter_boxes(stack.pop()):
+                if box_type in CONTAINER_BOXES:
+                    stack.append(box)
+                elif box_type == b"tkhd":
+                    width, height, rotation = self._parse_tkhd(box)
+                elif box_type == b"mdhd":
+                    timescale, media_duration = self._parse_time_header(box)
+                elif box_type == b"hdlr":
+                    handler = box[8:12]
+                elif box_type == b"stsd" and len(box) >= 16:
+                    codec = box[12:16].decode("latin-1")
+                elif box_type == b"stts":
+                    entries = struct.unpack_from(">I", box, 4)[0]
+                    counts = struct.unpack_from(f">{2 * entries}I", box, 8)[0::2] if entries else ()
+                    sample_count = sum(counts)
+
+        if handler != b"vide":
+            return None
+
+        duration = media_duration / timescale if timescale else None
+        fps = sample_count / duration if duration and sample_count else None
+        return width, height, rotation, codec, fps, duration
+
+    @staticmethod
+    def _parse_tkhd(box: bytes):
+        version = box[0]
+        # The matrix and dimensions follow a version dependent header
+        matrix_offset = 40 + (12 if version == 1 else 0)
+        a, b = struct.unpack_from(">ii", box, matrix_offset)
+        width, height = struct.unpack_from(">II", box, matrix_offset + 36)
+        rotation = int(round(math.degrees(math.atan2(b, a)))) % 360
+        return width >> 16, height >> 16, rotation
+
+    def _check_limits(self) -> None:
+        metadata = self.metadata
+        if metadata.duration is not None and metadata.duration > self.limits.max_duration:
+            raise ProbeError(
+                f"Video is {metadata.duration:.1f}s long, the maximum is {self.limits.max_duration:.0f}s",
+                status_code=413
+            )
+        if metadata.width and metadata.height and max(metadata.width, metadata.height) > self.limits.max_dimension:
+            raise ProbeError(
+                f"Resolution {metadata.width}x{metadata.height} exceeds the maximum of {self.limits.max_dimension}px",
+                status_code=413
+            )
+        if metadata.codec not in self.limits.allowed_codecs:
+            raise ProbeError(
+                f"Codec {metadata.codec} not supported. Must be one of: {self.limits.allowed_codecs}",
+                status_code=415
+            )
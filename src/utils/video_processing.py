@@ -1,6 +1,8 @@
 import cv2
+import numpy as np
+from src.utils.preprocessing import resize_to_working
 
-def extract_frames(video_path, fps=30):
+def extract_frames(video_path, fps=30, short_side=None, long_side=None):
     cap = cv2.VideoCapture(video_path)
     frames = []
 
@@ -18,9 +20,279 @@ def extract_frames(video_path, fps=30):
             break
         # Extract frames at the specified frame rate
         if frame_count % frame_interval == 0:
-            frames.append(frame)
+            frames.append(resize_to_working(frame, short_side, long_side))
         frame_count += 1
 
     cap.release()
 
-    return frames
\ No newline at end of file
+    return frames
+
+def compute_motion_energy(video_path, scale_width=160):
+    """
+    Compute a cheap per-frame motion signal for a video.
+
+    Each frame is downscaled to `scale_width` pixels wide and converted to
+    grayscale; the energy of a frame is the mean absolute difference to the
+    previous one.
+
+    :param video_path: Path to the video file.
+    :param scale_width: Width of the downscaled frames used for the signal.
+    :return: Tuple of (energy as a float32 NumPy array with one value per frame, video frame rate).
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_rate = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    energy = []
+    previous = None
+
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            height, width = frame.shape[:2]
+            scale_height = max(1, int(round(height * scale_width / width)))
+            small = cv2.resize(frame, (scale_width, scale_height), interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            if previous is None:
+                energy.append(0.0)
+            else:
+                energy.append(float(cv2.absdiff(gray, previous).mean()))
+            previous = gray
+    finally:
+        cap.release()
+
+    return np.asarray(energy, dtype=np.float32), frame_rate
+
+def select_adaptive_indices(energy, budget, idle_fraction=0.15, smoothing=5):
+    """
+    Choose which frames to sample so that sampling density follows motion.
+
+    A share of `idle_fraction` of the budget is spread uniformly so idle
+    segments are still covered sparsely; the rest is distributed in
+    proportion to the smoothed motion energy.
+
+    :param energy: Per-frame motion energy, see compute_motion_energy.
+    :param budget: Maximum number of frames to select.
+    :param idle_fraction: Share of the budget spread uniformly over the video.
+    :param smoothing: Width in frames of the moving average applied to the energy.
+    :return: Sorted NumPy array of frame indices.
+    """
+    energy = np.asarray(energy, dtype=np.float64)
+    num_frames = len(energy)
+    if num_frames <= budget:
+        return np.arange(num_frames)
+
+    if smoothing > 1:
+        energy = np.convolve(energy, np.ones(smoothing) / smoothing, mode="same")
+
+    total_energy = energy.sum()
+    motion = energy / total_energy if total_energy > 0 else np.full(num_frames, 1.0 / num_frames)
+    weights = (1.0 - idle_fraction) * motion + idle_fraction / num_frames
+
+    # Inverse CDF sampling: evenly spaced quantiles of the cumulative weights
+    cdf = np.cumsum(weights)
+    targets = (np.arange(budget) + 0.5) / budget * cdf[-1]
+    indices = np.unique(np.searchsorted(cdf, targets))
+
+    # Frames heavier than one quantile are picked once; spend the rest of the
+    # budget on the highest weighted frames not yet selected
+    missing = budget - len(indices)
+    if missing > 0:
+        remaining = np.setdiff1d(np.arange(num_frames), indices, assume_unique=True)
+        extra = remaining[np.argsort(weights[remaining])[::-1][:missing]]
+        indices = np.sort(np.concatenate([indices, extra]))
+
+    return indices
+
+def extract_frames_at(video_path, indices, short_side=None, long_side=None):
+    """
+    Decode only the frames at the given indices.
+
+    :param video_path: Path to the video file.
+    :param indices: Sorted frame indices to extract.
+    :param short_side: Downsample frames right after decoding to at most this many pixels
+        on the short side and `long_side` on the long side; None keeps the full resolution.
+    :param long_side: See `short_side`.
+    :return: Tuple of the frames as NumPy arrays and the indices actually decoded,
+        both in the order of `indices`. Frames that fail to decode are left out of both.
+    """
+    wanted = set(int(i) for i in indices)
+    if not wanted:
+        return [], np.zeros(0, dtype=np.int64)
+    first, last = min(wanted), max(wanted)
+    cap = cv2.VideoCapture(video_path)
+    frames, decoded = [], []
+    frame_count = 0
+    if first > 0 and cap.set(cv2.CAP_PROP_POS_FRAMES, first):
+        # Seek past the leading frames instead of decoding them
+        frame_count = first
+
+    try:
+        while frame_count <= last:
+            # grab() skips the conversion of frames that are not kept
+            if not cap.grab():
+                break
+            if frame_count in wanted:
+                success, frame = cap.retrieve()
+                if success:
+                    frames.append(resize_to_working(frame, short_side, long_side))
+                    decoded.append(frame_count)
+            frame_count += 1
+    finally:
+        cap.release()
+
+    return frames, np.array(decoded, dtype=np.int64)
+
+class EncodedVideoWriter:
+    """
+    Stream BGR frames into a single encoded video file.
+
+    Codecs are tried in order of preference; H.264 and MPEG-4 go into an .mp4
+    container, MJPEG falls back to .avi since most OpenCV builds cannot mux it
+    into mp4. The final path and content type are available after the first
+    frame has been written.
+    """
+    CODECS = [
+        ("avc1", ".mp4", "video/mp4"),
+        ("mp4v", ".mp4", "video/mp4"),
+        ("MJPG", ".avi", "video/x-msvideo"),
+    ]
+
+    def __init__(self, base_path, fps=10):
+        self.base_path = str(base_path)
+        self.fps = fps
+        self.path = None
+        self.content_type = None
+        self.frame_size = None
+        self.frame_count = 0
+        self._writer = None
+
+    def _open(self, frame_size):
+        for fourcc, extension, content_type in self.CODECS:
+            path = self.base_path + extension
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), self.fps, frame_size)
+            if writer.isOpened():
+                self._writer = writer
+                self.path = path
+                self.content_type = content_type
+                self.frame_size = frame_size
+                return
+            writer.release()
+        raise RuntimeError("No usable video codec available for annotated output")
+
+    def write(self, frame):
+        height, width = frame.shape[:2]
+        if self._writer is None:
+            self._open((width, height))
+        elif (width, height) != self.frame_size:
+            # Every frame of an encoded stream must share the same size
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        self._writer.write(frame)
+        self.frame_count += 1
+
+    def release(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+def build_sprite_sheet(frames, columns=5, thumb_width=160):
+    """
+    Tile frames into a single sprite sheet image.
+
+    :param frames: List of BGR frames as NumPy arrays.
+    :param columns: Number of thumbnails per row.
+    :param thumb_width: Width of each thumbnail in pixels; height keeps the aspect ratio of the first frame.
+    :return: The sprite sheet as a BGR NumPy array, or None if there are no frames.
+    """
+    if not frames:
+        return None
+
+    height, width = frames[0].shape[:2]
+    thumb_height = max(1, int(round(height * thumb_width / width)))
+    rows = (len(frames) + columns - 1) // columns
+
+    sheet = np.zeros((rows * thumb_height, columns * thumb_width, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        row, col = divmod(i, columns)
+        thumb = cv2.resize(frame, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        sheet[row * thumb_height:(row + 1) * thumb_height, col * thumb_width:(col + 1) * thumb_width] = thumb
+
+    return sheet
+
+def generate_thumbnail(video_path, max_width=320, position=0.1):
+    """
+    Grab a poster frame from a video.
+
+    :param video_path: Path to the video file.
+    :param max_width: Maximum width of the thumbnail; smaller frames are not upscaled.
+    :param position: Relative position in the video to take the frame from (0.0 - 1.0).
+    :return: The thumbnail as JPEG bytes, or None if no frame could be read.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * position))
+        success, frame = cap.read()
+        if not success:
+            # Seeking is unreliable for some containers, fall back to the first frame
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = cap.read()
+    finally:
+        cap.release()
+
+    if not success:
+        return None
+
+    frame = _resize_to_width(frame, max_width)
+    success, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return encoded.tobytes() if success else None
+
+def generate_proxy(video_path, output_base, max_width=480, fps=15):
+    """
+    Transcode a video into a small, low frame rate proxy clip for browsing.
+
+    :param video_path: Path to the source video file.
+    :param output_base: Output path without extension; the extension depends on the codec used.
+    :param max_width: Maximum width of the proxy; smaller videos are not upscaled.
+    :param fps: Frame rate of the proxy.
+    :return: The EncodedVideoWriter used, giving the output path and content type,
+        or None if the source has no readable frames.
+    """
+    cap = cv2.VideoCapture(video_path)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    frame_interval = max(1, int(round(source_fps / fps)))
+
+    # Label the proxy with the rate of the frames actually kept, so it plays at the source speed
+    writer = EncodedVideoWriter(output_base, fps=source_fps / frame_interval)
+    frame_count = 0
+    try:
+        with writer:
+            while True:
+                # grab() skips decoding into a full frame for frames we drop
+                if not cap.grab():
+                    break
+                if frame_count % frame_interval == 0:
+                    success, frame = cap.retrieve()
+                    if success:
+                        writer.write(_resize_to_width(frame, max_width))
+                frame_count += 1
+    finally:
+        cap.release()
+
+    return writer if writer.frame_count else None
+
+def _resize_to_width(frame, max_width):
+    height, width = frame.shape[:2]
+    if width <= max_width:
+        return frame
+    new_height = int(round(height * max_width / width))
+    # Even dimensions keep H.264 encoders happy
+    new_height -= new_height % 2
+    return cv2.resize(frame, (max_width - max_width % 2, new_height), interpolation=cv2.INTER_AREA)
@@ -2,7 +2,6 @@ import cv2
 import numpy as np
 import math
 from typing import List
-from src.schemas import PoseResult
 import logging
 
 # Define keypoint connections for golf pose
@@ -132,8 +131,8 @@ def draw_pose_on_image(image, pose_results, keypoint_edges, keypoint_colors, lin
 
         for pose_result in pose_results:
             try:
-                keypoints = np.array(pose_result.keypoints)
-                scores = np.array(pose_result.scores)
+                keypoints = np.asarray(pose_result.keypoints)
+                scores = np.asarray(pose_result.scores)
 
                 # Draw keypoints and links
                 draw_points(image_cv, keypoints, scores, keypoint_colors, threshold, radius=4, show_keypoint_weight=False)